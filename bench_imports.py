@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Tuple
+
+REPO_PATH = os.path.dirname(os.path.abspath(__file__))
+BUDGET_PATH = os.path.join(REPO_PATH, "bench_imports_budget.json")
+
+# entry points and exporter modules whose import time is measured
+MODULES = [
+    "gen_report",
+    "gen_emails",
+    "gen_documents",
+    "jenkins_export",
+    "jira_export",
+    "confluence_export",
+    "wiki_export",
+]
+
+# heavy or platform-specific dependencies which must be imported at the point of use only
+LAZY_MODULES = ["atlassian", "win32com", "pythoncom"]
+
+# budgets are relative to the import time of this dependency of all entry points measured
+# by the same run, so they don't depend on the machine speed
+REFERENCE_MODULE = "requests"
+
+# new budget is the measured relative time with this headroom (runs differ)
+BUDGET_HEADROOM = 1.5
+
+REPEAT = 5
+
+# credentials are only read on import, requests are made on first use
+PLACEHOLDER_ENV = {
+    "CONFLUENCE_TOKEN": "placeholder",
+    "JENKINS_USERNAME": "placeholder",
+    "JENKINS_TOKEN": "placeholder",
+    "LUXOFT_JIRA_TOKEN": "placeholder",
+}
+
+
+def parse_importtime(output: str) -> Dict[str, Tuple[int, int]]:
+    # `python -X importtime` report: module -> (self, cumulative) time in microseconds
+    modules = {}
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_time), int(cumulative))
+
+    return modules
+
+
+def import_module(module: str) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    # module is imported in a fresh interpreter: import time (seconds) and all imported modules
+    env = {**PLACEHOLDER_ENV, **os.environ}
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_PATH,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(f"ERROR: '{module}' can't be imported:")
+        print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "")
+        exit(-1)
+
+    modules = parse_importtime(result.stderr)
+
+    return modules[module][1] / 1_000_000, modules
+
+
+def get_lazy_imports(modules: Dict[str, Tuple[int, int]]) -> List[str]:
+    return sorted(name for name in modules if name.split(".")[0] in LAZY_MODULES)
+
+
+def get_slowest_imports(modules: Dict[str, Tuple[int, int]], count: int = 5) -> List[str]:
+    # imported modules with the largest own time
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:count]
+
+    return [f"{name} ({times[0] / 1000:.1f} ms)" for name, times in slowest]
+
+
+def measure(module: str, repeat: int) -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    # best of `repeat` imports
+    best, modules = None, None
+    for _ in range(repeat):
+        elapsed, imported = import_module(module)
+        if best is None or elapsed < best:
+            best, modules = elapsed, imported
+
+    return best, modules
+
+
+def run_benchmarks(
+    selected: List[str] = None, repeat: int = REPEAT
+) -> Tuple[Dict[str, float], List[str]]:
+    # import times of the modules relative to the reference import
+    # and modules which import lazy dependencies on load
+    results = {}
+    lazy_imports = {}
+
+    reference, _ = measure(REFERENCE_MODULE, repeat)
+    print(f"{REFERENCE_MODULE + ' (reference)':<24} {reference * 1000:>10.2f} ms")
+
+    for module in MODULES:
+        if selected and not any(module.startswith(s) for s in selected):
+            continue
+
+        best, modules = measure(module, repeat)
+
+        results[module] = best / reference
+        print(
+            f"{module:<24} {best * 1000:>10.2f} ms {results[module]:>6.2f}x   "
+            f"slowest: {', '.join(get_slowest_imports(modules))}"
+        )
+
+        names = get_lazy_imports(modules)
+        if names:
+            lazy_imports[module] = names
+
+    for module, names in lazy_imports.items():
+        print(f"ERROR: '{module}' imports lazy dependencies on load: {', '.join(names)}")
+
+    return results, list(lazy_imports)
+
+
+def load_budget() -> Dict[str, float]:
+    if not os.path.exists(BUDGET_PATH):
+        return {}
+
+    with open(BUDGET_PATH, "r") as file:
+        return json.load(file)
+
+
+def save_budget(results: Dict[str, float]):
+    budget = load_budget()
+    budget.update(
+        {module: round(relative * BUDGET_HEADROOM, 2) for module, relative in results.items()}
+    )
+
+    with open(BUDGET_PATH, "w") as file:
+        json.dump(budget, file, indent=4, sort_keys=True)
+        file.write("\n")
+
+
+def compare_with_budget(results: Dict[str, float], budget: Dict[str, float]) -> List[str]:
+    regressions = []
+
+    print(f"\nComparison with budget (import time of {REFERENCE_MODULE} = 1x):")
+    for module, relative in results.items():
+        if module not in budget:
+            print(f"{module:<24} {'no budget':>10}")
+            continue
+
+        mark = ""
+        if relative > budget[module]:
+            mark = " <- OVER BUDGET"
+            regressions.append(module)
+
+        print(f"{module:<24} {relative:>6.2f}x / {budget[module]:.2f}x{mark}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Import time of the entry points and exporter modules (fresh interpreter per import)"
+    )
+    parser.add_argument("--only", nargs="*", help="measure only modules with specified name prefixes")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="imports per module, the best is taken")
+    parser.add_argument(
+        "--save-budget",
+        action="store_true",
+        help=f"store measured times with {BUDGET_HEADROOM}x headroom as a new budget",
+    )
+    parser.add_argument("--check", action="store_true", help="exit with error code if budget is exceeded")
+    args = parser.parse_args()
+
+    results, lazy_imports = run_benchmarks(args.only, args.repeat)
+
+    if args.save_budget:
+        save_budget(results)
+        print(f"\nBudget saved to '{BUDGET_PATH}'")
+        return
+
+    regressions = compare_with_budget(results, load_budget())
+
+    if (regressions or lazy_imports) and args.check:
+        print(f"\n{len(regressions) + len(lazy_imports)} regression(s) found!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
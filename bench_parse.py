@@ -0,0 +1,131 @@
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import report_parser
+
+SCALES = {
+    "small": {"reports": 16, "machines": 4, "groups": 50, "cases": 20, "repeat": 3},
+    "full": {"reports": 40, "machines": 6, "groups": 100, "cases": 30, "repeat": 3},
+}
+
+# number of I/O threads handing downloaded reports to the parser
+IO_WORKERS = 8
+
+
+def create_synthetic_report(machines: int, groups: int, cases: int) -> bytes:
+    # summary_report.json: machine -> summary and groups with per case results
+    report = {}
+
+    for machine in range(machines):
+        results = {}
+        for group in range(groups):
+            results[f"Group_{group}"] = {
+                "": {
+                    "total": cases,
+                    "passed": cases - 3,
+                    "failed": 1,
+                    "error": 0,
+                    "skipped": 1,
+                    "observed": 1,
+                    "machine_info": {
+                        "reporting_date": "05/0{day}/2023 1{hour}:00:00".format(
+                            day=1 + group % 9, hour=group % 10
+                        ),
+                        "host": f"host-{machine}",
+                        "os": "Windows 10(64bit)",
+                        "driver_version": "23.5.1",
+                    },
+                },
+                **{
+                    f"SDK_{group}_{case:03}": {
+                        "status": "passed",
+                        "execution_time": 12.5,
+                        "message": ["Frame rate is fine", "Latency is fine"],
+                        "screens": [f"screen_{case}_{screen}.jpg" for screen in range(5)],
+                    }
+                    for case in range(cases)
+                },
+            }
+
+        report[f"AMD Radeon RX {7900 - machine * 100} XT-Windows 10(64bit)"] = {
+            "summary": {
+                "total": groups * cases,
+                "passed": groups * (cases - 3),
+                "failed": groups,
+                "error": 0,
+                "skipped": groups,
+                "observed": groups,
+                "execution_time": 3600.0,
+                "duration": 3700.0,
+            },
+            "results": results,
+        }
+
+    return json.dumps(report).encode("utf-8")
+
+
+def parse_all(contents: List[bytes], executor: str):
+    report_parser.set_executor(executor)
+
+    if executor == "inline":
+        for content in contents:
+            report_parser.parse_report(content)
+        return
+
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as pool:
+        list(pool.map(report_parser.parse_report, contents))
+
+
+def run_benchmarks(scale: str, executors: List[str]) -> Dict[str, float]:
+    config = SCALES[scale]
+
+    content = create_synthetic_report(config["machines"], config["groups"], config["cases"])
+    contents = [content] * config["reports"]
+
+    print(
+        "{reports} reports x {size:.1f} MB".format(
+            reports=len(contents), size=len(content) / 1024 / 1024
+        )
+    )
+
+    results = {}
+    for executor in executors:
+        # process pool start isn't measured
+        if executor == "process":
+            parse_all(contents[:1], executor)
+
+        timings = []
+        for _ in range(config["repeat"]):
+            start = time.perf_counter()
+            parse_all(contents, executor)
+            timings.append(time.perf_counter() - start)
+
+        results[executor] = min(timings)
+        print(f"{executor:<10} {results[executor] * 1000:10.1f} ms")
+
+    report_parser.shutdown()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Decoding of JSON reports with inline, thread and process executors"
+    )
+    parser.add_argument("--scale", choices=SCALES.keys(), default="small")
+    parser.add_argument(
+        "--executors",
+        nargs="*",
+        choices=report_parser.EXECUTORS,
+        default=report_parser.EXECUTORS,
+    )
+    args = parser.parse_args()
+
+    run_benchmarks(args.scale, args.executors)
+
+
+if __name__ == "__main__":
+    main()
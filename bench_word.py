@@ -0,0 +1,314 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import warnings
+import zipfile
+import tempfile
+from typing import Callable, Dict, List
+from lxml import etree
+
+import word
+from common import WORKING_DIR_PATH
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_word_baseline.json")
+
+# relative slowdown (current / baseline) reported as a regression
+REGRESSION_THRESHOLD = 1.5
+
+BENCH_TABLE_ID = "BENCH_TABLE"
+BENCH_LIST_ID = "BENCH_LIST"
+BENCH_LAST_ID = "BENCH_LAST"
+
+SCALES = {
+    "small": {
+        "rows": [1000, 5000],
+        "links": [200, 500],
+        "bullets": [1000],
+        "repeat": 3,
+    },
+    "full": {
+        "rows": [1000, 10000, 50000],
+        "links": [500, 2000],
+        "bullets": [1000, 10000],
+        "repeat": 3,
+    },
+}
+
+EMPTY_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships"/>'
+)
+
+
+def create_synthetic_document(rows: int) -> etree._ElementTree:
+    # <w:document><w:body>
+    #   <w:p id="BENCH_LIST"/>          - anchor for bullet lists
+    #   <w:tbl id="BENCH_TABLE">...</w:tbl> - header row + one data row, grown to `rows`
+    #   <w:p id="BENCH_LAST"/>          - last element (worst case for id lookups)
+    # </w:body></w:document>
+    document = etree.Element(etree.QName(word.W_NS, "document"), nsmap={"w": word.W_NS, "r": word.R_NS})
+    body = etree.SubElement(document, etree.QName(word.W_NS, "body"))
+
+    etree.SubElement(body, etree.QName(word.W_NS, "p"), {"id": BENCH_LIST_ID})
+
+    table = etree.SubElement(body, etree.QName(word.W_NS, "tbl"), {"id": BENCH_TABLE_ID})
+    for _ in range(2):
+        row = etree.SubElement(table, etree.QName(word.W_NS, "tr"))
+        for _ in range(4):
+            cell = etree.SubElement(row, etree.QName(word.W_NS, "tc"))
+            paragraph = etree.SubElement(cell, etree.QName(word.W_NS, "p"))
+            etree.SubElement(paragraph, etree.QName(word.W_NS, "pPr"))
+
+    word.table_add_rows(table, max(rows - 1, 0))
+
+    etree.SubElement(body, etree.QName(word.W_NS, "p"), {"id": BENCH_LAST_ID})
+
+    return etree.ElementTree(document)
+
+
+def prepare_working_directory():
+    # word.py works with relative paths inside of WORKING_DIR_PATH,
+    # relationships are edited in memory
+    if os.path.exists(WORKING_DIR_PATH):
+        shutil.rmtree(WORKING_DIR_PATH)
+
+    os.makedirs(os.path.dirname(word.DOCUMENT_PATH))
+    word.open_relationships(etree.ElementTree(etree.fromstring(EMPTY_RELS.encode("utf-8"))))
+
+
+def measure(func: Callable, repeat: int, setup: Callable = None) -> float:
+    # best of `repeat` runs, setup is excluded from the measurement
+    best = None
+    for _ in range(repeat):
+        args = (setup() if setup is not None else None) or ()
+
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def bench_find_by_id(rows: int, repeat: int) -> float:
+    tree = create_synthetic_document(rows)
+
+    return measure(lambda: word.find_by_id(tree, BENCH_LAST_ID), repeat)
+
+
+def bench_table_add_rows(rows: int, repeat: int) -> float:
+    def setup():
+        tree = create_synthetic_document(1)
+        return (word.find_by_id(tree, BENCH_TABLE_ID),)
+
+    return measure(lambda table: word.table_add_rows(table, rows - 1), repeat, setup)
+
+
+def bench_fill_table(rows: int, repeat: int) -> float:
+    # fill every cell of the table the same way gen_report fills issues table
+    def setup():
+        tree = create_synthetic_document(rows)
+        return (word.find_by_id(tree, BENCH_TABLE_ID),)
+
+    def fill(table):
+        for row in table.findall("./{*}tr")[1:]:
+            cells = row.findall("./{*}tc")
+            word.set_table_cell_value(cells[0], "KEY-1")
+            word.set_table_cell_value(cells[1], word.Text(text="summary", bold=True, hex_color="#C00000"))
+            word.set_table_cell_value(cells[2], "01/Jan/23")
+            word.set_table_cell_value(cells[3], ["Critical", " "])
+
+    return measure(fill, repeat, setup)
+
+
+def bench_create_relationship(links: int, repeat: int) -> float:
+    def create():
+        for i in range(links):
+            word.create_relationship(f"https://example.com/browse/ISSUE-{i}")
+
+    return measure(create, repeat, prepare_working_directory)
+
+
+def bench_append_content_links(links: int, repeat: int) -> float:
+    def append():
+        paragraph = word.create_paragraph()
+        word.append_content(
+            paragraph,
+            [word.Link(url=f"https://example.com/browse/ISSUE-{i}", text=f"ISSUE-{i}") for i in range(links)],
+        )
+
+    return measure(append, repeat, prepare_working_directory)
+
+
+def bench_bullet_list(bullets: int, repeat: int) -> float:
+    # same insertion pattern as gen_report.fill_task_list
+    def setup():
+        tree = create_synthetic_document(1000)
+        return (word.find_by_id(tree, BENCH_LIST_ID),)
+
+    def fill(element):
+        tasks = [f"Task number {i}" for i in range(bullets)]
+        word.append_elements_after(
+            word.create_bullets(list_id=1, lvl=0, contents=tasks), after=element
+        )
+
+    return measure(fill, repeat, setup)
+
+
+def bench_write_xml(rows: int, repeat: int) -> float:
+    tree = create_synthetic_document(rows)
+
+    return measure(lambda: word.write_xml(tree, word.DOCUMENT_PATH), repeat)
+
+
+def bench_write_part(rows: int, repeat: int) -> float:
+    # same serialization as gen_report.finalize_report
+    tree = create_synthetic_document(rows)
+
+    def write():
+        with zipfile.ZipFile("bench.docx", "w", zipfile.ZIP_DEFLATED) as archive:
+            word.write_part(archive, "word/document.xml", tree)
+
+    return measure(write, repeat)
+
+
+def bench_load_write(rows: int, repeat: int, lazy: bool) -> float:
+    # parse + write of the template document as gen_report does it, the table isn't edited,
+    # so the lazy mode (template_snapshot) passes it through as raw bytes
+    content = etree.tostring(create_synthetic_document(rows), xml_declaration=True, encoding="UTF-8")
+
+    raw_spans = None
+    if lazy:
+        content, raw_spans = word.split_body(content, {BENCH_LIST_ID, BENCH_LAST_ID})
+
+    def load_write():
+        tree = etree.fromstring(content).getroottree()
+        with zipfile.ZipFile("bench.docx", "w", zipfile.ZIP_DEFLATED) as archive:
+            word.write_part(archive, "word/document.xml", tree, raw_spans)
+
+    return measure(load_write, repeat)
+
+
+def bench_load_write_full(rows: int, repeat: int) -> float:
+    return bench_load_write(rows, repeat, lazy=False)
+
+
+def bench_load_write_lazy(rows: int, repeat: int) -> float:
+    return bench_load_write(rows, repeat, lazy=True)
+
+
+def bench_serialize(rows: int, repeat: int) -> float:
+    tree = create_synthetic_document(rows)
+
+    return measure(lambda: etree.tostring(tree, xml_declaration=True, encoding="ascii"), repeat)
+
+
+def run_benchmarks(scale: str, selected: List[str] = None) -> Dict[str, float]:
+    params = SCALES[scale]
+    repeat = params["repeat"]
+
+    cases = []
+    for rows in params["rows"]:
+        cases.append((f"find_by_id[rows={rows}]", bench_find_by_id, rows))
+        cases.append((f"table_add_rows[rows={rows}]", bench_table_add_rows, rows))
+        cases.append((f"fill_table[rows={rows}]", bench_fill_table, rows))
+        cases.append((f"write_xml[rows={rows}]", bench_write_xml, rows))
+        cases.append((f"write_part[rows={rows}]", bench_write_part, rows))
+        cases.append((f"serialize_document[rows={rows}]", bench_serialize, rows))
+        cases.append((f"load_write_full[rows={rows}]", bench_load_write_full, rows))
+        cases.append((f"load_write_lazy[rows={rows}]", bench_load_write_lazy, rows))
+    for links in params["links"]:
+        cases.append((f"create_relationship[links={links}]", bench_create_relationship, links))
+        cases.append((f"append_content_links[links={links}]", bench_append_content_links, links))
+    for bullets in params["bullets"]:
+        cases.append((f"bullet_list[bullets={bullets}]", bench_bullet_list, bullets))
+
+    results = {}
+    for name, bench, size in cases:
+        if selected and not any(name.startswith(s) for s in selected):
+            continue
+
+        prepare_working_directory()
+        results[name] = bench(size, repeat)
+        print(f"{name:<40} {results[name] * 1000:>12.2f} ms")
+
+    return results
+
+
+def load_baseline() -> Dict[str, float]:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+
+    with open(BASELINE_PATH, "r") as file:
+        return json.load(file)
+
+
+def save_baseline(results: Dict[str, float]):
+    baseline = load_baseline()
+    baseline.update(results)
+
+    with open(BASELINE_PATH, "w") as file:
+        json.dump(baseline, file, indent=4, sort_keys=True)
+        file.write("\n")
+
+
+def compare_with_baseline(results: Dict[str, float], baseline: Dict[str, float]) -> List[str]:
+    regressions = []
+
+    print("\nComparison with baseline:")
+    for name, elapsed in results.items():
+        if name not in baseline:
+            print(f"{name:<40} {'no baseline':>12}")
+            continue
+
+        ratio = elapsed / baseline[name] if baseline[name] > 0 else float("inf")
+        mark = ""
+        if ratio > REGRESSION_THRESHOLD:
+            mark = " <- REGRESSION"
+            regressions.append(name)
+
+        print(f"{name:<40} {ratio:>11.2f}x{mark}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="word.py micro-benchmarks on synthetic documents")
+    parser.add_argument("--scale", choices=SCALES.keys(), default="small")
+    parser.add_argument("--only", nargs="*", help="run only cases with specified name prefixes")
+    parser.add_argument("--save-baseline", action="store_true", help="store results as a new baseline")
+    parser.add_argument("--check", action="store_true", help="exit with error code on regressions")
+    args = parser.parse_args()
+
+    # word.find_by_id searches with "//" from the tree, lxml warns about it on every call
+    warnings.filterwarnings("ignore", category=FutureWarning)
+
+    # run inside of temporary directory to keep working directory untouched
+    cwd = os.getcwd()
+    bench_dir = tempfile.mkdtemp(prefix="bench_word_")
+    os.chdir(bench_dir)
+
+    try:
+        results = run_benchmarks(args.scale, args.only)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(bench_dir)
+
+    if args.save_baseline:
+        save_baseline(results)
+        print(f"\nBaseline saved to '{BASELINE_PATH}'")
+        return
+
+    regressions = compare_with_baseline(results, load_baseline())
+
+    if regressions and args.check:
+        print(f"\n{len(regressions)} regression(s) found!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
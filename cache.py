@@ -0,0 +1,99 @@
+import time
+import inspect
+import threading
+import functools
+from typing import Callable, Optional
+
+import instrumentation
+
+# registry of all memoized functions to clear them at once
+_caches = {}
+
+
+def memoize(name: str, ttl: Optional[float] = None) -> Callable:
+    # process wide memoization of function results shared between threads:
+    # - concurrent calls with the same arguments wait for the single request
+    # - entries older than `ttl` seconds are refetched (never expire if `ttl` is None)
+
+    def decorator(func: Callable) -> Callable:
+        entries = {}
+        lock = threading.Lock()
+        key_locks = {}
+        signature = inspect.signature(func)
+
+        def make_key(args, kwargs) -> tuple:
+            # arguments are bound to the signature, so `f()`, `f(None)` and `f(at=None)`
+            # share one entry if None is the default value
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+
+            return bound.args, tuple(sorted(bound.kwargs.items()))
+
+        def is_fresh(entry) -> bool:
+            return entry is not None and (ttl is None or time.monotonic() - entry[0] < ttl)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+
+            with lock:
+                entry = entries.get(key)
+                if not is_fresh(entry):
+                    key_lock = key_locks.setdefault(key, threading.Lock())
+
+            if is_fresh(entry):
+                instrumentation.record_cache(name, hit=True)
+                return entry[1]
+
+            with key_lock:
+                # value could be fetched by another thread while waiting for the lock
+                with lock:
+                    entry = entries.get(key)
+
+                if is_fresh(entry):
+                    instrumentation.record_cache(name, hit=True)
+                    return entry[1]
+
+                instrumentation.record_cache(name, hit=False)
+                value = func(*args, **kwargs)
+
+                with lock:
+                    entries[key] = (time.monotonic(), value)
+
+            return value
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        def cache_invalidate(*args, **kwargs):
+            with lock:
+                entries.pop(make_key(args, kwargs), None)
+
+        def cache_refresh(*args, **kwargs):
+            # refetch value in place, readers get the previous value until it's fetched
+            value = func(*args, **kwargs)
+
+            with lock:
+                entries[make_key(args, kwargs)] = (time.monotonic(), value)
+
+            return value
+
+        def cache_contains(*args, **kwargs) -> bool:
+            with lock:
+                return is_fresh(entries.get(make_key(args, kwargs)))
+
+        wrapper.cache_clear = cache_clear
+        wrapper.cache_invalidate = cache_invalidate
+        wrapper.cache_refresh = cache_refresh
+        wrapper.cache_contains = cache_contains
+        _caches[name] = wrapper
+
+        return wrapper
+
+    return decorator
+
+
+def clear_all():
+    for wrapper in _caches.values():
+        wrapper.cache_clear()
@@ -1,36 +1,15 @@
-from enum import Enum
 from dataclasses import dataclass
 
+import registry
+
 TEMPLATE_PATH = "./template/"
 WORKING_DIR_PATH = "./tmp_template/"
 REPORT_FILE_PATH = "./report.docx"
 
 
-class Jobs(Enum):
-    Full_Samples = 1
-    Win_Full = 2
-    Win_APU = 3
-    Win_Latency = 4
-    Android_Full = 5
-    Ubuntu_Full = 6
-    AMD_Full = 7
-    Win_Long_Term = 9
-    Android_Xiaomi_TV = 10
-    Android_Chromecast_TV = 11
-
-
-class Reports(Enum):
-    summary = 1
-    PUBG = 2
-    Dota2_DX11 = 3
-    Dota2_Vulkan = 4
-    LoL = 5
-    Heaven_Benchmark_DX9 = 6
-    Valley_Benchmark_DX9 = 7
-    Heaven_Benchmark_DX11 = 8
-    Valley_Benchmark_DX11 = 9
-    Heaven_Benchmark_OpenGL = 10
-    Valley_Benchmark_OpenGL = 11
+# jobs and reports are described in the registry
+Jobs = registry.Jobs
+Reports = registry.Reports
 
 
 @dataclass
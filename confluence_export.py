@@ -1,18 +1,25 @@
 import os
-import requests
+import threading
 from datetime import datetime, timedelta
 from lxml import html
 import json
+import fetch
+import cache
+import http_cache
+import instrumentation
 
 CONFLUENCE_TOKEN = os.environ["CONFLUENCE_TOKEN"]
 
+_token_validated = False
+_lock = threading.Lock()
+
 def validate_token():
     headers = {
         "Accept": "application/json",
         "Authorization": f"Bearer {CONFLUENCE_TOKEN}",
     }
 
-    response = requests.get(
+    response = fetch.get(
         "https://luxproject.luxoft.com/confluence/rest/api/user/current",
         headers=headers,
     )
@@ -22,45 +29,66 @@ def validate_token():
         exit(-1)
 
 
-# validate token on module's load
-validate_token()
+def _ensure_token_validated():
+    # token is validated before the first request, not on module's load
+    global _token_validated
 
+    with _lock:
+        if not _token_validated:
+            validate_token()
+            _token_validated = True
 
-def _request_confluence_report(report_date: datetime) -> html.Element:
-    url = "https://luxproject.luxoft.com/confluence/rest/api/content"
 
-    confluence_report_date = report_date + timedelta(days=1) 
+@cache.memoize("confluence pages")
+def _request_status_pages(title_date: str) -> dict:
+    _ensure_token_validated()
+
+    url = "https://luxproject.luxoft.com/confluence/rest/api/content"
 
     headers = {
         "Accept": "application/json",
         "Authorization": f"Bearer {CONFLUENCE_TOKEN}",
     }
 
-    response = requests.get(
-        f"{url}/?title=Status Report - {confluence_report_date.strftime('%Y-%m-%d')}&expand=body.storage",
-        headers=headers,
+    query = f"{url}/?title=Status Report - {title_date}"
+
+    # page body is requested only if the page version was changed since the previous run
+    pages = fetch.get(f"{query}&expand=version", headers=headers).json()
+    if pages["size"] == 0:
+        return pages
+
+    return http_cache.get_versioned(
+        ["confluence status pages", title_date],
+        [page["version"]["number"] for page in pages["results"]],
+        lambda: fetch.get(
+            f"{query}&expand=body.storage,version", headers=headers
+        ).json(),
     )
 
+
+def _request_confluence_report(report_date: datetime) -> html.Element:
+    confluence_report_date = report_date + timedelta(days=1) 
+
+    pages = _request_status_pages(confluence_report_date.strftime('%Y-%m-%d'))
+
     # Taking lates available report
     days = 0
-    while response.json()["size"] == 0 and days < 7:
+    while pages["size"] == 0 and days < 7:
         days += 1
         date = confluence_report_date - timedelta(days=days)
-        response = requests.get(
-            f"{url}/?title=Status Report - {date.strftime('%Y-%m-%d')}&expand=body.storage",
-            headers=headers,
-        )
+        pages = _request_status_pages(date.strftime('%Y-%m-%d'))
     
     if days >= 7:
         print("ERROR: Confluence token is invalid!")
         exit(-1)
 
-    page_content = response.json()["results"][0]["body"]["storage"]["value"]
+    page_content = pages["results"][0]["body"]["storage"]["value"]
     return html.fromstring(page_content)
 
 
 def get_project_status(report_date: datetime):
-    page = _request_confluence_report(report_date)
+    with instrumentation.span("confluence: status report", "fetch"):
+        page = _request_confluence_report(report_date)
 
     summary = []
     planned = []
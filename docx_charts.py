@@ -0,0 +1,192 @@
+import os
+import threading
+from dataclasses import asdict
+from typing import Dict, Optional, Tuple
+from lxml import etree
+
+import instrumentation
+from word import A_NS, C_NS, R_NS
+from report_cache import REPORT_CACHE_DIR, fingerprint
+from report_model import Chart
+
+# Native DrawingML chart parts (word/charts/chart_<hash>.xml) of the report. Chart XML is
+# generated once per chart data: parts are named by the data hash and kept in
+# ./.report_cache/charts/, so unchanged charts are taken from there by the next runs.
+
+CHART_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.drawingml.chart+xml"
+CHARTS_CACHE_DIR = os.path.join(REPORT_CACHE_DIR, "charts")
+
+# colors of the series (passed - green, failed - red, error - orange)
+SERIES_COLORS = {"Passed": "70AD47", "Failed": "C00000", "Error": "ED7D31"}
+DEFAULT_COLOR = "A5A5A5"
+
+CATEGORY_AXIS_ID = "111111111"
+VALUE_AXIS_ID = "222222222"
+
+# chart XML: hash -> bytes
+_charts: Dict[str, bytes] = {}
+_lock = threading.Lock()
+
+
+def _element(parent: etree.Element, ns: str, tag: str, val: Optional[str] = None, **attributes):
+    if val is not None:
+        attributes["val"] = val
+
+    return etree.SubElement(parent, etree.QName(ns, tag), attributes)
+
+
+def _add_text(parent: etree.Element, text: str):
+    # <c:rich><a:bodyPr/><a:p><a:r><a:t>text</a:t></a:r></a:p></c:rich>
+    rich = _element(parent, C_NS, "rich")
+    _element(rich, A_NS, "bodyPr")
+    paragraph = _element(rich, A_NS, "p")
+    record = _element(paragraph, A_NS, "r")
+    _element(record, A_NS, "t").text = text
+
+
+def _add_series(bar_chart: etree.Element, index: int, name: str, categories, values):
+    series = _element(bar_chart, C_NS, "ser")
+    _element(series, C_NS, "idx", str(index))
+    _element(series, C_NS, "order", str(index))
+
+    _element(_element(series, C_NS, "tx"), C_NS, "v").text = name
+
+    shape = _element(series, C_NS, "spPr")
+    _element(_element(shape, A_NS, "solidFill"), A_NS, "srgbClr", SERIES_COLORS.get(name, DEFAULT_COLOR))
+
+    _element(series, C_NS, "invertIfNegative", "0")
+
+    # values are stored in the chart itself (literals), there is no embedded workbook
+    literal = _element(_element(series, C_NS, "cat"), C_NS, "strLit")
+    _element(literal, C_NS, "ptCount", str(len(categories)))
+    for point, category in enumerate(categories):
+        _element(_element(literal, C_NS, "pt", idx=str(point)), C_NS, "v").text = category
+
+    literal = _element(_element(series, C_NS, "val"), C_NS, "numLit")
+    _element(literal, C_NS, "formatCode").text = "General"
+    _element(literal, C_NS, "ptCount", str(len(values)))
+    for point, value in enumerate(values):
+        _element(_element(literal, C_NS, "pt", idx=str(point)), C_NS, "v").text = str(value)
+
+
+def _add_axis(plot_area: etree.Element, tag: str, id: str, cross_id: str, position: str):
+    axis = _element(plot_area, C_NS, tag)
+    _element(axis, C_NS, "axId", id)
+    _element(_element(axis, C_NS, "scaling"), C_NS, "orientation", "minMax")
+    _element(axis, C_NS, "delete", "0")
+    _element(axis, C_NS, "axPos", position)
+    if tag == "valAx":
+        _element(axis, C_NS, "majorGridlines")
+    _element(axis, C_NS, "numFmt", formatCode="General", sourceLinked="0")
+    _element(axis, C_NS, "tickLblPos", "nextTo")
+    _element(axis, C_NS, "crossAx", cross_id)
+    _element(axis, C_NS, "crosses", "autoZero")
+    if tag == "catAx":
+        _element(axis, C_NS, "auto", "1")
+        _element(axis, C_NS, "lblAlgn", "ctr")
+        _element(axis, C_NS, "lblOffset", "100")
+    else:
+        _element(axis, C_NS, "crossBetween", "between")
+
+
+def build_chart_xml(chart: Chart) -> bytes:
+    # stacked column chart: one column per category, one colored part per series
+    chart_space = etree.Element(
+        etree.QName(C_NS, "chartSpace"), nsmap={"c": C_NS, "a": A_NS, "r": R_NS}
+    )
+    _element(chart_space, C_NS, "roundedCorners", "0")
+
+    chart_element = _element(chart_space, C_NS, "chart")
+
+    title = _element(chart_element, C_NS, "title")
+    _add_text(_element(title, C_NS, "tx"), chart.title)
+    _element(title, C_NS, "overlay", "0")
+    _element(chart_element, C_NS, "autoTitleDeleted", "0")
+
+    plot_area = _element(chart_element, C_NS, "plotArea")
+    _element(plot_area, C_NS, "layout")
+
+    bar_chart = _element(plot_area, C_NS, "barChart")
+    _element(bar_chart, C_NS, "barDir", "col")
+    _element(bar_chart, C_NS, "grouping", "stacked")
+    _element(bar_chart, C_NS, "varyColors", "0")
+    for index, (name, values) in enumerate(chart.series.items()):
+        _add_series(bar_chart, index, name, chart.categories, values)
+    _element(bar_chart, C_NS, "gapWidth", "150")
+    _element(bar_chart, C_NS, "overlap", "100")
+    _element(bar_chart, C_NS, "axId", CATEGORY_AXIS_ID)
+    _element(bar_chart, C_NS, "axId", VALUE_AXIS_ID)
+
+    _add_axis(plot_area, "catAx", CATEGORY_AXIS_ID, VALUE_AXIS_ID, "b")
+    _add_axis(plot_area, "valAx", VALUE_AXIS_ID, CATEGORY_AXIS_ID, "l")
+
+    legend = _element(chart_element, C_NS, "legend")
+    _element(legend, C_NS, "legendPos", "b")
+    _element(legend, C_NS, "overlay", "0")
+
+    _element(chart_element, C_NS, "plotVisOnly", "1")
+    _element(chart_element, C_NS, "dispBlanksAs", "gap")
+
+    return etree.tostring(
+        chart_space, xml_declaration=True, encoding="UTF-8", standalone=True
+    )
+
+
+def chart_target(hash: str) -> str:
+    # chart part relative to word/document.xml
+    return f"charts/chart_{hash}.xml"
+
+
+def chart_hash(target: str) -> Optional[str]:
+    # hash of the chart part created by `chart_target`
+    file_name = os.path.basename(target)
+    if not file_name.startswith("chart_") or not file_name.endswith(".xml"):
+        return None
+
+    return file_name[len("chart_") : -len(".xml")]
+
+
+def _cache_path(hash: str) -> str:
+    return os.path.join(CHARTS_CACHE_DIR, f"chart_{hash}.xml")
+
+
+def load_chart_xml(hash: str) -> Optional[bytes]:
+    # chart XML generated by this or a previous run
+    with _lock:
+        if hash in _charts:
+            return _charts[hash]
+
+    if not os.path.exists(_cache_path(hash)):
+        return None
+
+    with open(_cache_path(hash), "rb") as file:
+        content = file.read()
+
+    with _lock:
+        _charts[hash] = content
+
+    return content
+
+
+def get_chart_xml(chart: Chart) -> Tuple[str, bytes]:
+    # returns hash of the chart data and chart XML, XML is generated only for the new data
+    hash = fingerprint(asdict(chart))
+
+    content = load_chart_xml(hash)
+    instrumentation.record_cache("chart", hit=content is not None)
+    if content is not None:
+        return hash, content
+
+    with instrumentation.span("generate chart", title=chart.title):
+        content = build_chart_xml(chart)
+
+    os.makedirs(CHARTS_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_cache_path(hash)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(content)
+    os.replace(tmp_path, _cache_path(hash))
+
+    with _lock:
+        _charts[hash] = content
+
+    return hash, content
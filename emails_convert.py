@@ -1,4 +1,11 @@
-import win32com.client
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import oft_writer
+
+# "native" - pure Python writer, "outlook" - Outlook automation (Windows with Outlook only)
+OFT_BACKEND = os.getenv("OFT_BACKEND", "native")
 
 
 def html2oft(
@@ -8,23 +15,71 @@ def html2oft(
     recipients_cc: str = "",
     message_subject: str = "",
 ):
-    olMailItem = 0x0
-    obj = win32com.client.Dispatch("Outlook.Application")
+    if OFT_BACKEND == "outlook":
+        html2oft_outlook(
+            html_file_path,
+            otf_file_path,
+            recipients_to=recipients_to,
+            recipients_cc=recipients_cc,
+            message_subject=message_subject,
+        )
+        return
+
+    with open(html_file_path, "rb") as file:
+        html = file.read()
+
+    oft_writer.write_oft(
+        otf_file_path,
+        html,
+        subject=message_subject,
+        recipients_to=recipients_to,
+        recipients_cc=recipients_cc,
+    )
 
-    msg = obj.CreateItem(olMailItem)
-    msg.Subject = message_subject
-    msg.To = recipients_to
-    msg.Cc = recipients_cc
-    # olFormatHTML https://msdn.microsoft.com/en-us/library/office/aa219371(v=office.11).aspx
-    msg.BodyFormat = 2
-    msg.HTMLBody = open(html_file_path).read()
-    # newMail.display()
-    save_format = 2  # olTemplate	2	Microsoft Outlook template (.oft)
-    msg.SaveAs(otf_file_path, save_format)
+
+def html2oft_many(conversions: List[dict], workers: int = 4):
+    # converts several letters at once, each item holds html2oft arguments
+    if OFT_BACKEND == "outlook":
+        # Outlook application is automated from a single thread
+        workers = 1
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(html2oft, **kwargs) for kwargs in conversions]:
+            future.result()
+
+
+def html2oft_outlook(
+    html_file_path: str,
+    otf_file_path: str,
+    recipients_to: str = "",
+    recipients_cc: str = "",
+    message_subject: str = "",
+):
+    import pythoncom
+    import win32com.client
+
+    # COM must be initialized in each thread using it, letters are converted
+    # in worker threads (html2oft_many, gen_documents renderers)
+    pythoncom.CoInitialize()
+    try:
+        olMailItem = 0x0
+        obj = win32com.client.Dispatch("Outlook.Application")
+
+        msg = obj.CreateItem(olMailItem)
+        msg.Subject = message_subject
+        msg.To = recipients_to
+        msg.Cc = recipients_cc
+        # olFormatHTML https://msdn.microsoft.com/en-us/library/office/aa219371(v=office.11).aspx
+        msg.BodyFormat = 2
+        msg.HTMLBody = open(html_file_path).read()
+        # newMail.display()
+        save_format = 2  # olTemplate	2	Microsoft Outlook template (.oft)
+        msg.SaveAs(otf_file_path, save_format)
+    finally:
+        pythoncom.CoUninitialize()
 
 
 if __name__ == "__main__":
-    import os
     from datetime import datetime
 
     recipients_to = os.getenv("STREAMING_SDK_EMAIL_RECIPIENTS_TO", "")
@@ -33,30 +88,26 @@ if __name__ == "__main__":
 
     dir = os.getcwd()
 
-    # convert second letter
-    first_html_letter = os.path.join(dir, "Letter_1.html")
-    if os.path.exists(first_html_letter):
-        oft_file = os.path.join(dir, "Letter_1.oft")
-        html2oft(
-            first_html_letter,
-            oft_file,
-            message_subject="Streaming SDK Report",
-            recipients_to=recipients_to,
-            recipients_cc=recipients_cc,
-        )
-    else:
-        print(f"Letter_1.html not found in '{dir}' dir")
-
-    # convert second letter
-    second_html_letter = os.path.join(dir, "Letter_2.html")
-    if os.path.exists(second_html_letter):
-        oft_file = os.path.join(dir, "Letter_2.oft")
-        html2oft(
-            second_html_letter,
-            oft_file,
-            message_subject="Weekly QA Report " + report_date.strftime("%d-%b-%Y"),
-            recipients_to=recipients_to,
-            recipients_cc=recipients_cc,
+    letters = [
+        ("Letter_1", "Streaming SDK Report"),
+        ("Letter_2", "Weekly QA Report " + report_date.strftime("%d-%b-%Y")),
+    ]
+
+    conversions = []
+    for letter, subject in letters:
+        html_letter = os.path.join(dir, letter + ".html")
+        if not os.path.exists(html_letter):
+            print(f"{letter}.html not found in '{dir}' dir")
+            continue
+
+        conversions.append(
+            {
+                "html_file_path": html_letter,
+                "otf_file_path": os.path.join(dir, letter + ".oft"),
+                "message_subject": subject,
+                "recipients_to": recipients_to,
+                "recipients_cc": recipients_cc,
+            }
         )
-    else:
-        print(f"Letter_2.html not found in '{dir}' dir")
+
+    html2oft_many(conversions)
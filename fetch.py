@@ -0,0 +1,58 @@
+import os
+import requests
+from urllib3.util.retry import Retry
+
+import instrumentation
+from http_cache import RevalidatingAdapter
+
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "3"))
+
+
+def _record_response(response: requests.Response, *args, **kwargs):
+    retries = 0
+    history = getattr(getattr(response.raw, "retries", None), "history", None)
+    if history:
+        retries = len(history)
+
+    # body of revalidated response is taken from the disk cache
+    from_cache = getattr(response, "from_cache", False)
+
+    instrumentation.record_request(
+        method=response.request.method,
+        url=response.url,
+        status=response.status_code,
+        size=0 if from_cache else len(response.content),
+        elapsed=response.elapsed.total_seconds(),
+        retries=retries,
+        cache_hit=from_cache,
+    )
+
+
+def create_session() -> requests.Session:
+    # pooled session with instrumented responses, retries of transient failures
+    # and conditional requests of the previously received resources
+    session = requests.Session()
+
+    retry = Retry(
+        total=FETCH_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=["GET", "HEAD"],
+        raise_on_status=False,
+    )
+    adapter = RevalidatingAdapter(max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    session.hooks["response"].append(_record_response)
+
+    return session
+
+
+# shared session for Jenkins and Confluence requests
+# (Jira client configures its own session with token header)
+session = create_session()
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return session.get(url, **kwargs)
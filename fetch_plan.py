@@ -0,0 +1,74 @@
+from typing import Dict, Iterable, List, Optional
+
+from common import Jobs
+import registry
+
+# Remote requests needed by the report sections and letters. Only the data of the
+# selected sections is fetched, requests shared by several sections are made once.
+
+CONFLUENCE_STATUS_PAGE = ["confluence: status page version", "confluence: status page body"]
+JIRA_ISSUES = ["jira: issues"]
+
+
+def jenkins_builds(jobs: Iterable[Jobs]) -> List[str]:
+    # latest build number (or builds list for a past date) of each job
+    return [f"jenkins: builds of {registry.jobs_names[job]}" for job in jobs]
+
+
+def jenkins_reports(jobs: Iterable[Jobs], representative: bool = False) -> List[str]:
+    # reports of the jobs' latest builds (only representative reports if `representative`)
+    requests = []
+
+    for job in jobs:
+        if representative:
+            reports = [registry.jobs_representative_reports[job]]
+        else:
+            reports = registry.jobs_reports[job]
+
+        requests += [
+            f"jenkins: {registry.reports_names[report]} report of {registry.jobs_names[job]}"
+            for report in reports
+        ]
+
+    return requests
+
+
+def select_sections(
+    names: Iterable[str],
+    only: Optional[Iterable[str]] = None,
+    skip: Optional[Iterable[str]] = None,
+) -> List[str]:
+    # sections in their order, all of them if nothing is selected
+    only = set(only or names)
+    skip = set(skip or [])
+
+    return [name for name in names if name in only and name not in skip]
+
+
+def plan_requests(section_requests: Dict[str, List[str]], sections: Iterable[str]) -> List[str]:
+    return list(
+        dict.fromkeys(request for name in sections for request in section_requests[name])
+    )
+
+
+def print_plan(section_requests: Dict[str, List[str]], sections: Iterable[str]):
+    planned = plan_requests(section_requests, sections)
+    total = plan_requests(section_requests, section_requests)
+
+    print(
+        "Remote requests: {planned} of {total} ({avoided} avoided)".format(
+            planned=len(planned), total=len(total), avoided=len(total) - len(planned)
+        )
+    )
+
+
+def cli_name(name: str) -> str:
+    # section names are used in command line without spaces ("task list" -> "task-list")
+    return name.replace(" ", "-")
+
+
+def from_cli_names(names: Optional[Iterable[str]]) -> Optional[List[str]]:
+    if names is None:
+        return None
+
+    return [name.replace("-", " ") for name in names]
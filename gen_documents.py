@@ -0,0 +1,152 @@
+import os
+import pickle
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List
+
+from common import REPORT_FILE_PATH
+from gen_emails import LetterFormat, RECIPIENTS_TO, RECIPIENTS_CC
+import gen_emails
+import gen_report
+import instrumentation
+import report_model
+import report_parser
+import wiki_export
+from report_cache import REPORT_CACHE_DIR
+from report_model import WeeklyDocument
+
+# documents rendered from the one document model
+RENDERERS = ["docx", "letters", "markdown", "html"]
+
+# collected document model of the last run (preview.py renders it again)
+DATASET_PATH = os.path.join(REPORT_CACHE_DIR, "document.pickle")
+
+
+def collect_document(report_date: datetime, renderers: List[str]) -> WeeklyDocument:
+    # report data and letter tables are collected in parallel with shared caches,
+    # results tables are collected only if they are rendered
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        data = executor.submit(gen_report.collect_report_data, report_date)
+
+        results = None
+        if renderers != ["docx"]:
+            results = executor.submit(lambda: list(gen_emails.collect_results_tables()))
+
+        return report_model.build_document(
+            data.result(), results.result() if results else None
+        )
+
+
+def save_dataset(document: WeeklyDocument, dataset_path: str = DATASET_PATH):
+    os.makedirs(os.path.dirname(dataset_path), exist_ok=True)
+
+    tmp_path = f"{dataset_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(document, file)
+    os.replace(tmp_path, dataset_path)
+
+
+def load_dataset(dataset_path: str = DATASET_PATH) -> WeeklyDocument:
+    if not os.path.exists(dataset_path):
+        print(f"ERROR: dataset '{dataset_path}' isn't found, collect it with gen_documents.py")
+        exit(-1)
+
+    with open(dataset_path, "rb") as file:
+        return pickle.load(file)
+
+
+def render_documents(
+    document: WeeklyDocument,
+    renderers: List[str],
+    letters_format: LetterFormat = LetterFormat.HTML,
+):
+    # renderers work with own files, so they are executed concurrently
+    tasks = {
+        "docx": lambda: gen_report.render_report(document, REPORT_FILE_PATH),
+        "letters": lambda: render_letters(document, letters_format),
+        "markdown": lambda: wiki_export.write_markdown(document),
+        "html": lambda: wiki_export.write_html(document),
+    }
+
+    def render(renderer: str):
+        with instrumentation.span("render " + renderer):
+            tasks[renderer]()
+
+    with ThreadPoolExecutor(max_workers=len(renderers)) as executor:
+        futures = [executor.submit(render, renderer) for renderer in renderers]
+
+        # errors of renderers are raised here
+        for future in futures:
+            future.result()
+
+
+def render_letters(document: WeeklyDocument, letters_format: LetterFormat):
+    gen_emails.generate_first_letter(
+        format=letters_format,
+        recipients_to=RECIPIENTS_TO,
+        recipients_cc=RECIPIENTS_CC,
+        tables=document.results,
+    )
+    gen_emails.generate_second_letter(
+        report_date=document.report_date,
+        format=letters_format,
+        recipients_to=RECIPIENTS_TO,
+        recipients_cc=RECIPIENTS_CC,
+        issues=document.issues,
+    )
+
+
+def main(renderers: List[str] = RENDERERS, letters_format: LetterFormat = LetterFormat.HTML):
+    if "docx" in renderers:
+        gen_report.check_template()
+
+    with instrumentation.span("collect document"):
+        document = collect_document(datetime.today(), renderers)
+    save_dataset(document)
+
+    with instrumentation.span("render documents"):
+        render_documents(document, renderers, letters_format)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate report docx, letters and wiki pages from one data collection"
+    )
+    parser.add_argument(
+        "--renderers",
+        nargs="+",
+        choices=RENDERERS,
+        default=RENDERERS,
+        help="documents to generate (all by default)",
+    )
+    parser.add_argument(
+        "--letters-format",
+        choices=[f.name.lower() for f in LetterFormat],
+        default=LetterFormat.HTML.name.lower(),
+        help="letters format: html, oft (Outlook template) or both",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=report_parser.EXECUTORS,
+        default=report_parser.REPORT_EXECUTOR,
+        help="where downloaded reports are decoded: inline (one by one), "
+        "thread (in download threads) or process (in process pool)",
+    )
+    parser.add_argument(
+        "--trace", help="write run timings and HTTP metrics to the JSON (Chrome trace) file"
+    )
+    args = parser.parse_args()
+
+    report_parser.set_executor(args.executor)
+
+    try:
+        with instrumentation.span("gen_documents"):
+            main(args.renderers, LetterFormat[args.letters_format.upper()])
+    finally:
+        report_parser.shutdown()
+
+        if args.trace:
+            instrumentation.write_trace(args.trace)
+            instrumentation.print_summary()
+            print(f"Trace '{args.trace}' saved!")
@@ -1,13 +1,24 @@
 import os
-from common import Reports, Jobs
-from jenkins_export import get_latest_report, get_report_link
+import re
+import argparse
 from jira_export import get_issues
+from jenkins_export import plan_report_requests, prefetch_reports
 from datetime import timedelta, datetime
 import lxml.html as lh
 from copy import deepcopy
-import urllib
 from enum import Enum
+from typing import Collection, Iterable, Iterator, List, Optional
 from emails_convert import html2oft
+import instrumentation
+import profiling
+import report_parser
+import letter_templates
+import letter_writer
+import registry
+import report_model
+import fetch_plan
+from report_model import Cell, ResultsTable
+from summaries import WeekSummaries
 
 
 class LetterFormat(Enum):
@@ -16,203 +27,121 @@ class LetterFormat(Enum):
     ALL = 3
 
 
-reports_titles = {
-    Reports.PUBG: "PUBG Report",
-    Reports.Dota2_DX11: "Dota 2 DX11 Report",
-    Reports.Dota2_Vulkan: "Dota 2 Vulkan Report",
-    Reports.LoL: "League of Legends Report",
-    Reports.Heaven_Benchmark_DX9: "Heaven Benchmark DX9 Report",
-    Reports.Valley_Benchmark_DX9: "Valley Benchmark DX9 Report",
-    Reports.Heaven_Benchmark_DX11: "Heaven Benchmark DX11 Report",
-    Reports.Valley_Benchmark_DX11: "Valley Benchmark DX11 Report",
-    Reports.Heaven_Benchmark_OpenGL: "Heaven Benchmark OpenGL Report",
-    Reports.Valley_Benchmark_OpenGL: "Valley Benchmark OpenGL Report",
-}
+LETTER2_HTML_TABLE = letter_templates.LETTER2_HTML_TABLE
 
-jobs_titles = {
-    Jobs.Full_Samples: "Full Samples Streaming SDK autotests",
-    Jobs.Win_Full: "Remote Samples Streaming SDK autotests",
-    Jobs.Win_APU: "Remote Samples Streaming SDK autotests",
-    Jobs.Ubuntu_Full: "Linux Streaming SDK autotests",
-    Jobs.Android_Full: "Android Streaming SDK autotests",
-    Jobs.Android_Xiaomi_TV: "Android XiaomiTVStick TV Box Streaming SDK autotests",
-    Jobs.Android_Chromecast_TV: "Android Chromecast TV Box Streaming SDK autotests",
-    Jobs.AMD_Full: "AMD Link autotests",
-}
+RECIPIENTS_TO = os.getenv("STREAMING_SDK_EMAIL_RECIPIENTS_TO", "")
+RECIPIENTS_CC = os.getenv("STREAMING_SDK_EMAIL_RECIPIENTS_CC", "")
 
-client_parts = {
-    Jobs.Full_Samples: "RX 6600XT Windows 10 (64bit)",
-    Jobs.Win_Full: "RX 6600XT Windows 10 (64bit)",
-    Jobs.Win_APU: "APU, Ryzen 7000 Windows 10 (64bit)",
-    Jobs.Ubuntu_Full: "RX 6600XT Windows 10 (64bit)",
-    Jobs.Android_Full: "Adreno 619 Android (REALME 9 Pro)",
-    Jobs.Android_Xiaomi_TV: "XiaomiTVStick TV Box",
-    Jobs.Android_Chromecast_TV: "Chromecast TV Box",
-    Jobs.AMD_Full: "RX 6600XT Windows 10 (64bit)",
+LETTERS = ["letter 1", "letter 2"]
+
+# remote requests needed by each letter
+LETTER_REQUESTS = {
+    "letter 1": fetch_plan.jenkins_builds(registry.letter_jobs)
+    + fetch_plan.jenkins_reports(registry.letter_jobs),
+    "letter 2": fetch_plan.JIRA_ISSUES,
 }
 
-LETTER2_HTML_TABLE = "ISSUES_TABLE"
 
-RECIPIENTS_TO = os.getenv("STREAMING_SDK_EMAIL_RECIPIENTS_TO", "")
-RECIPIENTS_CC = os.getenv("STREAMING_SDK_EMAIL_RECIPIENTS_CC", "")
+def set_cell_text(column: lh.Element, cell: Cell):
+    if cell.url:
+        column.find("./p/span/a").set("href", cell.url)
+        column.find("./p/span/a/span").text = cell.text
+        return
 
+    span = column.find("./p/span")
+    span.text = cell.text
 
-def load_xml(file_path: str):
-    tree = None
-    with open(file_path, "r") as file:
-        tree = lh.parse(file)
+    if cell.alert:
+        # templates' styles are written both as "color:black" and "color: black"
+        span.attrib["style"] = re.sub(r"color:\s*black", "color:#C00000", span.attrib["style"])
 
-    return tree
 
+def create_row(row_template: lh.Element, cells: List[Cell]) -> lh.Element:
+    row = deepcopy(row_template)
 
-def write_xml(tree, file_path: str):
-    tree.write(file_path, xml_declaration=True, encoding="ascii")
+    for column, cell in zip(row.findall("./td"), cells):
+        set_cell_text(column, cell)
 
+    return row
 
-def append_row_to_summary_table(
-    tbody: lh.Element, report_type: Reports, report: dict, row_template: lh.Element
-):
-    # append new row
-    row = deepcopy(row_template)
-    tbody.append(row)
 
-    columns = row.findall("./td")
+def collect_results_tables(week: WeekSummaries = None) -> Iterator[ResultsTable]:
+    # yields report tables of the first letter (per job's machine)
+    # as soon as reports of the job are collected into `week` summaries
+    if week is None:
+        week = WeekSummaries()
 
-    columns[0].find("./p/span/a").set("href", report["url"])
-    columns[0].find("./p/span/a/span").text = reports_titles[report_type]
+    # latest builds' reports of all jobs are requested in parallel at once
+    prefetch_reports(plan_report_requests(registry.letter_jobs))
 
-    columns[1].find("./p/span").text = str(
-        report["total"] - report["skipped"] - report["observed"]
+    since_date = (datetime.today() - timedelta(weeks=1) + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
     )
-    columns[2].find("./p/span").text = str(report["passed"])
-    columns[3].find("./p/span").text = str(report["failed"])
-    columns[4].find("./p/span").text = str(report["error"])
 
-    timestamp = []
-    h, m, s = [
-        int(x) for x in str(timedelta(seconds=int(report["execution_time"]))).split(":")
-    ]
-    if h > 0:
-        timestamp.append("{}h".format(int(h)))
-    timestamp.append("{}m".format(int(m)))
-    timestamp.append("{}s".format(int(s)))
-
-    columns[5].find("./p/span").text = " ".join(timestamp)
+    yield from report_model.build_results_tables(
+        week, registry.letter_jobs, newer_than=since_date
+    )
 
 
-def generate_first_letter(
-    format: LetterFormat, recipients_to: str = "", recipients_cc: str = ""
-):
-    html = load_xml("letters_templates/Letter1.html")
+def generate_report_tables(
+    section: letter_templates.ReportSection,
+    spacer: lh.Element,
+    tables: Iterable[ResultsTable],
+) -> Iterator[lh.Element]:
+    # yields elements of the first letter (title and report table per job's machine)
+    for table in tables:
+        section_body, title_element, tbody = section.clone()
 
-    tables_insertion_position = html.find("//div[@id='TABLES_PLACEHOLDER']")
-    parent_elem = tables_insertion_position.getparent()
-    insertion_index = parent_elem.index(tables_insertion_position)
-
-    for job in [
-        Jobs.Full_Samples,
-        Jobs.Win_Full,
-        Jobs.Win_APU,
-        Jobs.Android_Full,
-        Jobs.Android_Xiaomi_TV,
-        Jobs.Android_Chromecast_TV,
-        Jobs.Ubuntu_Full,
-        Jobs.AMD_Full,
-    ]:
-        # collects info from json reports into dict
-        reports_data: dict[str, dict[Reports, dict[str, str]]] = {}
-
-        for report in Reports:
-            if report is Reports.summary:
-                continue
-
-            since_date = (
-                datetime.today() - timedelta(weeks=1) + timedelta(days=1)
-            ).replace(hour=0, minute=0, second=0, microsecond=0)
-
-            latest_report = get_latest_report(job, report, newer_than=since_date)
-
-            if latest_report is None:
-                continue
-
-            report_url = get_report_link(
-                job, latest_report["version"], report, json=False
-            )
+        title_element.text = table.title
 
-            json_report = latest_report["report"]
+        for row in table.rows:
+            tbody.append(create_row(section.row, row))
 
-            for machine_name in json_report:
-                if reports_data.get(machine_name) is None:
-                    reports_data[machine_name] = {}
+        yield from section_body
 
-                reports_data[machine_name][report] = json_report[machine_name][
-                    "summary"
-                ]
+        for _ in range(len(table.rows)):
+            yield letter_templates.clone(spacer)
 
-                reports_data[machine_name][report]["url"] = (
-                    report_url + "#" + urllib.parse.quote(machine_name)
-                )
 
-        # fill html letter template
-        for machine_name in reports_data:
-            table_section = load_xml("letters_templates/report_table.html")
+def generate_first_letter(
+    format: LetterFormat,
+    recipients_to: str = "",
+    recipients_cc: str = "",
+    output_dir: str = None,
+    tables: Optional[Iterable[ResultsTable]] = None,
+):
+    # `tables` - results tables of the document model, they are collected if not passed
+    if tables is None:
+        tables = collect_results_tables()
 
-            title_element = table_section.find("//p/span")
-            title_element.text = "{report_name} Server part — {server_part}, Client part — {client_part}:".format(
-                report_name=jobs_titles[job],
-                server_part=machine_name.replace("AMD Radeon ", "")
-                .replace("Android", "Windows 10 (64 bit)")
-                .replace("10(", "10 ("),
-                client_part=client_parts[job],
-            )
+    html = letter_templates.get_first_letter()
+    section = letter_templates.get_report_section()
+    spacer = letter_templates.get_spacer()
 
-            table = table_section.find("//table")
-
-            tbody = table.find("./tbody")
-
-            # copy teplate row and remove it from table
-            row = tbody.findall("./tr")[1]
-            row_template = deepcopy(row)
-            tbody.remove(row)
-
-            for report in reports_data[machine_name]:
-                append_row_to_summary_table(
-                    tbody=tbody,
-                    report_type=report,
-                    report=reports_data[machine_name][report],
-                    row_template=row_template,
-                )
-
-            for element in table_section.find("//body"):
-                insertion_index += 1
-                parent_elem.insert(insertion_index, element)
-
-            for _ in range(len(reports_data[machine_name])):
-                insertion_index += 1
-                enter_element = lh.fromstring(
-                    """
-                    <p class="MsoNormal">
-                        <span style="font-size: 9pt; font-family: 'Open Sans', sans-serif">
-                            <o:p>&nbsp;</o:p>
-                        </span>
-                    </p>
-                    """
-                )
-                parent_elem.insert(insertion_index, enter_element)
+    tables_insertion_position = html.find("//div[@id='TABLES_PLACEHOLDER']")
 
-    dir = os.getcwd()
+    dir = output_dir or os.getcwd()
     html_file = os.path.join(dir, "Letter_1.html")
-    write_xml(html, html_file)
 
-    if format in [LetterFormat.OFT, LetterFormat.ALL]:
-        oft_file = os.path.join(dir, "Letter_1.oft")
-        html2oft(
+    # tables are written to the file one by one while reports are collected
+    with instrumentation.span("letter 1: stream html"), profiling.phase("letter 1"):
+        letter_writer.write_streamed(
+            html,
+            tables_insertion_position,
+            generate_report_tables(section, spacer, tables),
             html_file,
-            oft_file,
-            message_subject="Streaming SDK Report",
-            recipients_to=recipients_to,
-            recipients_cc=recipients_cc,
         )
+
+    if format in [LetterFormat.OFT, LetterFormat.ALL]:
+        oft_file = os.path.join(dir, "Letter_1.oft")
+        with instrumentation.span("letter 1: convert to oft"):
+            html2oft(
+                html_file,
+                oft_file,
+                message_subject="Streaming SDK Report",
+                recipients_to=recipients_to,
+                recipients_cc=recipients_cc,
+            )
         if format == LetterFormat.OFT:
             os.remove(html_file)
 
@@ -222,91 +151,143 @@ def generate_second_letter(
     format: LetterFormat,
     recipients_to: str = "",
     recipients_cc: str = "",
+    output_dir: str = None,
+    issues: Optional[List[List[Cell]]] = None,
 ):
-    html = load_xml("letters_templates/Letter2.html")
-
-    table = html.find("//table[@id='{id}']".format(id=LETTER2_HTML_TABLE))
-    tbody = table.find("./tbody")
-    row = tbody.findall("./tr")[0]
-
-    # copy row and remove it from table
-    row_template = deepcopy(row)
-    tbody.remove(row)
+    # `issues` - issues backlog rows of the document model, they are collected if not passed
+    if issues is None:
+        issues = report_model.build_issue_rows(get_issues())
 
-    issues = get_issues()
-    for issue in issues:
-        # append new row
-        row = deepcopy(row_template)
-        tbody.append(row)
+    letter = letter_templates.get_issues_letter()
+    html, tbody = letter.clone()
 
-        columns = row.findall("./td")
-
-        columns[0].find("./p/span/a").set("href", issue.url)
-        columns[0].find("./p/span/a/span").text = issue.key
-        columns[1].find("./p/span").text = issue.summary
-
-        columns[2].find("./p/span").text = issue.created_at
-        if datetime.strptime(issue.created_at, "%d/%b/%y").year == 2021:
-            span = columns[2].find("./p/span")
-            span.attrib["style"] = span.attrib["style"].replace(
-                "color:black", "color:#C00000"
-            )
-
-        columns[3].find("./p/span").text = issue.severity
-        if issue.severity.lower() in ["blocker", "critical"]:
-            span = columns[3].find("./p/span")
-            span.attrib["style"] = span.attrib["style"].replace(
-                "color:black", "color:#C00000"
-            )
-
-    dir = os.getcwd()
+    dir = output_dir or os.getcwd()
     html_file = os.path.join(dir, "Letter_2.html")
-    write_xml(html, html_file)
 
-    if format in [LetterFormat.OFT, LetterFormat.ALL]:
-        oft_file = os.path.join(dir, "Letter_2.oft")
-        html2oft(
+    # issue rows are written to the file one by one
+    with instrumentation.span(
+        "letter 2: stream html", issues=len(issues)
+    ), profiling.phase("letter 2"):
+        letter_writer.write_streamed(
+            html,
+            tbody,
+            (create_row(letter.row, issue) for issue in issues),
             html_file,
-            oft_file,
-            message_subject="Weekly QA Report " + report_date.strftime("%d-%b-%Y"),
-            recipients_to=recipients_to,
-            recipients_cc=recipients_cc,
+            inside=True,
         )
+
+    if format in [LetterFormat.OFT, LetterFormat.ALL]:
+        oft_file = os.path.join(dir, "Letter_2.oft")
+        with instrumentation.span("letter 2: convert to oft"):
+            html2oft(
+                html_file,
+                oft_file,
+                message_subject="Weekly QA Report " + report_date.strftime("%d-%b-%Y"),
+                recipients_to=recipients_to,
+                recipients_cc=recipients_cc,
+            )
         if format == LetterFormat.OFT:
             os.remove(html_file)
 
 
-if __name__ == "__main__":
-    # clean old files
+def main(format: LetterFormat = LetterFormat.HTML, letters: Collection[str] = LETTERS):
+    # `letters` - letters to generate, only their data is fetched,
+    # files of other letters are left as is
+    selected = [name for name in LETTERS if name in letters]
+    fetch_plan.print_plan(LETTER_REQUESTS, selected)
+
+    # clean old files, HTML letters are replaced only when they're written completely
     dir = os.getcwd()
-    files = [
-        os.path.join(dir, "Letter_1.oft"),
-        os.path.join(dir, "Letter_2.oft"),
-        os.path.join(dir, "Letter_1.html"),
-        os.path.join(dir, "Letter_2.html"),
-    ]
+    files = []
+    if "letter 1" in selected:
+        files += [os.path.join(dir, "Letter_1.oft")]
+    if "letter 2" in selected:
+        files += [os.path.join(dir, "Letter_2.oft")]
 
     for file in files:
         if os.path.exists(file):
             os.remove(file)
 
-    # # generate first letter
-    # generate_first_letter(
-    #     format=LetterFormat.ALL,
-    #     recipients_to=RECIPIENTS_TO,
-    #     recipients_cc=RECIPIENTS_CC,
-    # )
-
-    # generate second letter
-    # report_date = datetime.today()
-
-    # generate_second_letter(
-    #     report_date=report_date,
-    #     format=LetterFormat.ALL,
-    #     recipients_to=RECIPIENTS_TO,
-    #     recipients_cc=RECIPIENTS_CC,
-    # )
-
-    generate_first_letter(format=LetterFormat.HTML)
-    report_date = datetime.today()
-    generate_second_letter(report_date=report_date, format=LetterFormat.HTML)
+    if "letter 1" in selected:
+        with instrumentation.span("letter 1"):
+            generate_first_letter(
+                format=format,
+                recipients_to=RECIPIENTS_TO,
+                recipients_cc=RECIPIENTS_CC,
+            )
+
+    if "letter 2" in selected:
+        report_date = datetime.today()
+        with instrumentation.span("letter 2"):
+            generate_second_letter(
+                report_date=report_date,
+                format=format,
+                recipients_to=RECIPIENTS_TO,
+                recipients_cc=RECIPIENTS_CC,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate weekly report letters")
+    parser.add_argument(
+        "--format",
+        choices=[f.name.lower() for f in LetterFormat],
+        default=LetterFormat.HTML.name.lower(),
+        help="letters format: html, oft (Outlook template) or both",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=[fetch_plan.cli_name(name) for name in LETTERS],
+        help="generate only these letters (only their data is fetched)",
+    )
+    parser.add_argument(
+        "--skip",
+        nargs="+",
+        choices=[fetch_plan.cli_name(name) for name in LETTERS],
+        help="don't generate these letters, their files are left as is",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=report_parser.EXECUTORS,
+        default=report_parser.REPORT_EXECUTOR,
+        help="where downloaded reports are decoded: inline (one by one), "
+        "thread (in download threads) or process (in process pool)",
+    )
+    parser.add_argument(
+        "--trace", help="write run timings and HTTP metrics to the JSON (Chrome trace) file"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile",
+        metavar="DIR",
+        help="write CPU and memory profiles of rendering phases to the directory (default: ./profile)",
+    )
+    parser.add_argument(
+        "--profile-mode", choices=profiling.CPU_MODES, default="deterministic"
+    )
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable(args.profile, args.profile_mode)
+
+    report_parser.set_executor(args.executor)
+
+    letters = fetch_plan.select_sections(
+        LETTERS, fetch_plan.from_cli_names(args.only), fetch_plan.from_cli_names(args.skip)
+    )
+    if not letters:
+        print("ERROR: all letters are skipped!")
+        exit(-1)
+
+    try:
+        with instrumentation.span("gen_emails"):
+            main(LetterFormat[args.format.upper()], letters)
+    finally:
+        report_parser.shutdown()
+
+        if args.trace:
+            instrumentation.write_trace(args.trace)
+            instrumentation.print_summary()
+            print(f"Trace '{args.trace}' saved!")
@@ -1,99 +1,155 @@
 import os
-import shutil
+import zipfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict, field
 from datetime import datetime, timedelta
-from typing import List, Dict
-from common import Jobs, WORKING_DIR_PATH, REPORT_FILE_PATH, TEMPLATE_PATH, Issue
+from typing import Any, Collection, List, Dict, Optional, Tuple
+from common import Jobs, Reports, REPORT_FILE_PATH, TEMPLATE_PATH, Issue
 from jira_export import get_issues
 from jenkins_export import (
-    get_latest_build_number,
-    get_build_link,
-    get_skipped_or_observed_per_group,
+    get_build_number,
+    get_latest_report,
+    get_skipped_or_observed_deltas,
+    get_skipped_or_observed_flakiness,
+    plan_report_requests,
+    prefetch_reports,
 )
 from confluence_export import get_project_status
 import word
 import ids
+import registry
+import instrumentation
+import profiling
+import report_parser
+import report_cache
+import report_model
+import fetch_plan
+import history
+import template_snapshot
+import docx_charts
+from template_snapshot import DOCUMENT_PART, FOOTER_PART, RELS_PART, CONTENT_TYPES_PART
+from report_model import Cell, Chart, MachineColumns, WeeklyDocument
+from summaries import GroupMatrix, WeekSummaries, collect_group_matrix, collect_job_summaries
 from lxml import etree
 
-jobs_link_title = {
-    Jobs.Full_Samples: "FullSamples-Weekly #{num}",
-    Jobs.Win_Full: "StreamingSDK-Windows-WeeklyFull #{num}",
-    Jobs.Win_APU: "StreamingSDK-APU-WeeklyFull #{num}",
-    Jobs.Android_Full: "StreamingSDK-Android-Weekly #{num}",
-    Jobs.Android_Xiaomi_TV: "StreamingSDK-XiaomiTVStick-Weekly #{num}",
-    Jobs.Android_Chromecast_TV: "StreamingSDK-Chromecast-Weekly #{num}",
-    Jobs.Ubuntu_Full: "StreamingSDK-Ubuntu-WeeklyFull #{num}",
-    Jobs.AMD_Full: "AMDLink-Windows-WeeklyFull #{num}",
-    Jobs.Win_Latency: "StreamingSDK-LatencyTests #{num}",
-    Jobs.Win_Long_Term: "StreamingSDK-LongTermTests #{num}",
-}
-
-
-def template_validation(tree) -> bool:
-    # validate presence of all ids in template
-    for id in ids.IDS:
-        if word.find_by_id(tree, id) is None:
-            return False
+# report file name in backfill mode
+BACKFILL_REPORT_FILE_PATH = "./report_{date}.docx"
+BACKFILL_WORKERS = 4
 
-    return True
+# ids of the chart drawings in the document (template drawings use smaller ids)
+CHART_DRAWING_ID = 1000
 
+# part of the description column taken by the machine columns of skipped/observed tables
+SKIP_OBS_COLUMNS_SHARE = 0.6
+# part of the description column taken by the flakiness column of skipped/observed tables
+SKIP_OBS_FLAKINESS_SHARE = 0.2
 
-def prepare_working_directory():
-    # remove tmp dir if exists
-    if os.path.exists(WORKING_DIR_PATH):
-        shutil.rmtree(WORKING_DIR_PATH)
 
-    # remove report if exists
-    if os.path.exists(REPORT_FILE_PATH):
-        os.remove(REPORT_FILE_PATH)
-
-    # copy template to the working directory
-    shutil.copytree(TEMPLATE_PATH, WORKING_DIR_PATH)
+# report sections rendered from the collected data and their anchors in the template
+SECTIONS = {
+    "links": list(ids.REPORT_LINKS.values()),
+    "task list": [ids.SUMMARY_TASK_LIST, ids.PLANNED_TASK_LIST],
+    "issues": [ids.ISSUES_BACKLOG_TABLE],
+    "skipped and observed": list(ids.SKIP_OBS_CASES_TABLE.values()),
+    "charts": [ids.RESULTS_CHARTS],
+}
 
+# remote requests needed by each section
+SECTION_REQUESTS = {
+    "links": fetch_plan.jenkins_builds(Jobs),
+    "task list": fetch_plan.CONFLUENCE_STATUS_PAGE,
+    "issues": fetch_plan.JIRA_ISSUES,
+    "skipped and observed": fetch_plan.jenkins_builds(ids.SKIP_OBS_CASES_TABLE)
+    + fetch_plan.jenkins_reports(ids.SKIP_OBS_CASES_TABLE, representative=True),
+    "charts": fetch_plan.jenkins_builds(registry.letter_jobs)
+    + fetch_plan.jenkins_reports(registry.letter_jobs),
+}
 
-def clean_working_dir():
-    # remove tmp directories
-    shutil.rmtree(WORKING_DIR_PATH)
+# sections whose data is collected only if the reports of their jobs' builds were changed
+BUILD_SECTIONS = {
+    "skipped and observed": list(ids.SKIP_OBS_CASES_TABLE),
+    "charts": registry.letter_jobs,
+}
 
+# reports the build sections are rendered from: section -> job -> reports
+REPORT_SECTIONS = {
+    "skipped and observed": {
+        job: [registry.jobs_representative_reports[job]] for job in ids.SKIP_OBS_CASES_TABLE
+    },
+    "charts": {job: registry.jobs_reports[job] for job in registry.letter_jobs},
+}
 
-def finalize_report():
-    # archive directory
-    shutil.make_archive(
-        "report",
-        "zip",
-        WORKING_DIR_PATH,
-    )
-    # and change it extension to ".docx"
-    os.rename("report.zip", REPORT_FILE_PATH)
 
+@dataclass
+class ReportData:
+    report_date: datetime
+    # runs of the jobs whose links or skipped/observed tables are rendered
+    builds: Dict[Jobs, Optional[int]]
+    # data of the sections which aren't rendered isn't collected
+    summary: Optional[List[str]]
+    planned: Optional[List[str]]
+    issues: Optional[List[Issue]]
+    # skipped/observed cases of all machines, they aren't collected if the section isn't rendered
+    skipped_or_observed: Optional[Dict[Jobs, GroupMatrix]]
+    # changes of skipped/observed cases per group since the previous build (machine -> group -> delta)
+    skipped_or_observed_deltas: Optional[Dict[Jobs, Dict[str, Dict[str, int]]]]
+    # summaries of the letter jobs' latest reports for the charts
+    summaries: Optional[WeekSummaries] = None
+    # flakiness scores of the skipped/observed groups (machine -> group -> score)
+    skipped_or_observed_flakiness: Optional[Dict[Jobs, Dict[str, Dict[str, float]]]] = None
+    # builds of the latest available reports (the latest build can have no report yet)
+    report_versions: Dict[Jobs, Dict[Reports, Optional[int]]] = field(default_factory=dict)
+
+
+def finalize_report(
+    parts: Dict[str, Any],
+    report_file_path: str = REPORT_FILE_PATH,
+    raw_spans: Optional[Dict[str, List[bytes]]] = None,
+    new_parts: Optional[Dict[str, bytes]] = None,
+):
+    # `parts` - edited parts (part name -> tree), they are serialized straight into
+    # the archive with not parsed `raw_spans` of the lazy parts, other template files
+    # are copied as is, `new_parts` (part name -> content) are added after them
+    raw_spans = raw_spans or {}
+    tmp_path = f"{report_file_path}.{os.getpid()}.tmp"
 
-def append_bullet_list_element_after(
-    element: etree.Element, content: str, list_id
-) -> etree.Element:
-    bullet = word.create_bullet(list_id=list_id, lvl=0, content=content)
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for root, dirs, files in os.walk(TEMPLATE_PATH):
+            dirs.sort()
+            for file_name in sorted(files):
+                file_path = os.path.join(root, file_name)
+                name = os.path.relpath(file_path, TEMPLATE_PATH).replace(os.sep, "/")
 
-    # append this bullet element after specified
-    word.append_element_after(new_el=bullet, after=element)
+                if name in parts:
+                    word.write_part(archive, name, parts[name], raw_spans.get(name))
+                else:
+                    archive.write(file_path, name)
 
-    # return new bullet element
-    return bullet
+        for name, content in (new_parts or {}).items():
+            archive.writestr(name, content)
 
+    # the previous report is replaced only by the complete one
+    os.replace(tmp_path, report_file_path)
 
-def fill_task_list(tree: etree.Element, task_list_id: str, tasks: List):
-    task_list_header = word.find_by_id(tree, task_list_id)
 
+def fill_task_list(task_list_header: etree.Element, tasks: List):
     # fill completed tasks list
     if tasks:  # fill list with tasks
-        element = task_list_header
-        for task in tasks:
-            element = append_bullet_list_element_after(element, task, list_id=1)
+        bullets = word.create_bullets(list_id=1, lvl=0, contents=tasks)
+        word.append_elements_after(bullets, after=task_list_header)
     else:  # remove empty list header
         word.remove_element(task_list_header)
 
 
-def fill_issues_table(tree: etree.Element, issues: List[Issue]):
-    # find table by id
-    table = word.find_by_id(tree, ids.ISSUES_BACKLOG_TABLE)
+def cell_value(cell: Cell):
+    if cell.url:
+        return word.Link(url=cell.url, text=cell.text)
+
+    return cell.text
+
 
+def fill_issues_table(table: etree.Element, issues: List[List[Cell]]):
     # add rows to the table accordingly to data rows amount
     rows_number = len(issues)
     if rows_number > 1:
@@ -104,123 +160,610 @@ def fill_issues_table(tree: etree.Element, issues: List[Issue]):
     for row, issue in enumerate(issues):
         cells = table_rows[row].findall("./{*}tc")
 
-        word.set_table_cell_value(cells[0], word.Link(url=issue.url, text=issue.key))
-        word.set_table_cell_value(cells[1], issue.summary)
-        word.set_table_cell_value(cells[2], issue.created_at)
-        word.set_table_cell_value(cells[3], issue.severity)
+        for cell, value in zip(cells, issue):
+            word.set_table_cell_value(cell, cell_value(value))
 
 
 def fill_skipped_or_observed_table(
-    tree: etree.Element, table_id: str, skip_or_obs_cases_per_group: Dict[str, int]
+    table: etree.Element,
+    groups: List[str],
+    columns: Optional[MachineColumns] = None,
+    flakiness: Optional[List[str]] = None,
 ):
-    # find table by id
-    table = word.find_by_id(tree, table_id)
+    # `columns` - cases per machine, they are placed after the group column,
+    # `flakiness` - flakiness of the groups, it's placed after the cases
+    machines_number = len(columns.machines) if columns is not None else 0
+
+    # a job without a report in the window has no machines
+    if columns is not None and columns.machines:
+        word.table_insert_columns(
+            table, 0, len(columns.machines), share=SKIP_OBS_COLUMNS_SHARE
+        )
+
+        header_cells = table.find("./{*}tr").findall("./{*}tc")
+        for cell, machine in zip(header_cells[1:], columns.machines):
+            word.clear_table_cell(cell)
+            word.set_table_cell_value(cell, machine)
+
+    if flakiness is not None:
+        word.table_insert_columns(
+            table, machines_number, 1, share=SKIP_OBS_FLAKINESS_SHARE
+        )
+
+        header_cell = table.find("./{*}tr").findall("./{*}tc")[machines_number + 1]
+        word.clear_table_cell(header_cell)
+        word.set_table_cell_value(header_cell, "Flakiness")
 
     # add rows to the table accordingly to data rows amount
-    rows_number = len(skip_or_obs_cases_per_group)
+    rows_number = len(groups)
     if rows_number > 1:
         word.table_add_rows(table, rows_number - 1)
 
     # copy data to the table
     table_rows = table.findall("./{*}tr")[1:]  # find all rows (skip header row)
-    for row, group in enumerate(skip_or_obs_cases_per_group):
+    for row, group in enumerate(groups):
         cells = table_rows[row].findall("./{*}tc")
 
-        word.set_table_cell_value(
-            cells[0],
-            "{group} ({cases} cases)".format(
-                group=group, cases=skip_or_obs_cases_per_group[group]
-            ),
-        )
+        word.set_table_cell_value(cells[0], group)
 
+        if columns is not None:
+            for cell, cases in zip(cells[1:], columns.rows[row]):
+                word.set_table_cell_value(cell, cases)
 
-def main():
-    prepare_working_directory()
+        if flakiness is not None:
+            word.set_table_cell_value(cells[machines_number + 1], flakiness[row])
 
-    # eval report dates
-    report_date = datetime.today()
 
-    # load document.xml (main xml file)
-    tree = word.load_xml(word.DOCUMENT_PATH)
+def fill_charts(charts_header: etree.Element, charts: Dict[Jobs, Chart]):
+    # chart parts are taken from the charts cache if their data wasn't changed
+    paragraphs = []
 
-    # validate template
-    if not template_validation(tree):
+    for index, chart in enumerate(charts.values()):
+        hash, _ = docx_charts.get_chart_xml(chart)
+        rel_id = word.create_chart_relationship(docx_charts.chart_target(hash))
+        paragraphs.append(word.create_chart(rel_id, CHART_DRAWING_ID + index, chart.title))
+
+    word.append_elements_after(paragraphs, after=charts_header)
+
+
+def get_chart_parts(content_types) -> Dict[str, bytes]:
+    # chart parts of the rendered (or reused) charts, they are registered in the content types
+    chart_parts = {}
+
+    for target in word.get_chart_targets():
+        name = "word/" + target
+        content = docx_charts.load_chart_xml(docx_charts.chart_hash(target))
+        if content is None:
+            print(f"ERROR: chart part '{name}' isn't found in '{docx_charts.CHARTS_CACHE_DIR}'")
+            print("Render charts again with --force")
+            exit(-1)
+
+        chart_parts[name] = content
+        word.add_content_type(content_types, "/" + name, docx_charts.CHART_CONTENT_TYPE)
+
+    return chart_parts
+
+
+def check_template():
+    # validate template before any data fetching (it's validated once, when it's compiled)
+    snapshot = template_snapshot.load_snapshot()
+
+    if snapshot.missing:
         print("Template is invalid! Some IDs are missing!")
         exit()
 
+
+def collect_skipped_or_observed(
+    at: Optional[datetime] = None,
+) -> Tuple[
+    Dict[Jobs, GroupMatrix],
+    Dict[Jobs, Dict[str, Dict[str, int]]],
+    Dict[Jobs, Dict[str, Dict[str, float]]],
+]:
+    with instrumentation.span("skipped and observed cases"):
+        skipped_or_observed = {
+            job: collect_group_matrix(job, at=at) for job in ids.SKIP_OBS_CASES_TABLE
+        }
+        skipped_or_observed_deltas = {
+            job: get_skipped_or_observed_deltas(job, at=at)
+            for job in ids.SKIP_OBS_CASES_TABLE
+        }
+        # scores are computed over the history after the latest builds are ingested
+        skipped_or_observed_flakiness = {
+            job: get_skipped_or_observed_flakiness(job, at=at)
+            for job in ids.SKIP_OBS_CASES_TABLE
+        }
+
+    return skipped_or_observed, skipped_or_observed_deltas, skipped_or_observed_flakiness
+
+
+def collect_summaries(at: Optional[datetime] = None) -> WeekSummaries:
+    # latest reports of the letter jobs
+    with instrumentation.span("results charts"):
+        week = WeekSummaries()
+
+        prefetch_reports(plan_report_requests(registry.letter_jobs, at))
+        for job in registry.letter_jobs:
+            collect_job_summaries(week, job, at=at)
+
+    return week
+
+
+def collect_builds(
+    jobs: Collection[Jobs], at: Optional[datetime] = None
+) -> Dict[Jobs, Optional[int]]:
+    with instrumentation.span("jobs' runs"):
+        return {job: get_build_number(job, at) for job in jobs}
+
+
+def collect_report_versions(
+    jobs_reports: Dict[Jobs, List[Reports]], at: Optional[datetime] = None
+) -> Dict[Jobs, Dict[Reports, Optional[int]]]:
+    # builds whose reports are taken: the latest build or an older one if its report isn't uploaded yet
+    with instrumentation.span("jobs' reports"):
+        plan = []
+        for job, reports in jobs_reports.items():
+            build_number = get_build_number(job, at)
+            if build_number is not None:
+                plan += [(job, report, build_number) for report in reports]
+        prefetch_reports(plan)
+
+        return {
+            job: {
+                report: (get_latest_report(job, report, at=at) or {}).get("version")
+                for report in reports
+            }
+            for job, reports in jobs_reports.items()
+        }
+
+
+def collect_report_data(
+    report_date: datetime,
+    at: Optional[datetime] = None,
+    sections: Collection[str] = SECTIONS,
+) -> ReportData:
+    # `at` - moment to take the data at, the latest data is taken if it's None
+    # `sections` - sections to collect the data for
+    builds = {}
+    summary, planned, issues = None, None, None
+    skipped_or_observed, skipped_or_observed_deltas = None, None
+    skipped_or_observed_flakiness = None
+    summaries = None
+
+    with instrumentation.span("collect data", date=report_date.strftime("%Y-%m-%d")):
+        if "links" in sections:
+            builds = collect_builds(Jobs, at)
+        else:
+            jobs = [
+                job
+                for name, section_jobs in BUILD_SECTIONS.items()
+                if name in sections
+                for job in section_jobs
+            ]
+            builds = collect_builds(list(dict.fromkeys(jobs)), at)
+
+        if "task list" in sections:
+            with instrumentation.span("task list"):
+                summary, planned = get_project_status(report_date)
+
+        if "issues" in sections:
+            with instrumentation.span("issues"):
+                issues = get_issues(at)
+
+        if "skipped and observed" in sections:
+            (
+                skipped_or_observed,
+                skipped_or_observed_deltas,
+                skipped_or_observed_flakiness,
+            ) = collect_skipped_or_observed(at)
+
+        if "charts" in sections:
+            summaries = collect_summaries(at)
+
+    return ReportData(
+        report_date=report_date,
+        builds=builds,
+        summary=summary,
+        planned=planned,
+        issues=issues,
+        skipped_or_observed=skipped_or_observed,
+        skipped_or_observed_deltas=skipped_or_observed_deltas,
+        summaries=summaries,
+        skipped_or_observed_flakiness=skipped_or_observed_flakiness,
+    )
+
+
+def get_report_versions(data: ReportData, section: str) -> Dict[str, Dict[str, Optional[int]]]:
+    # builds of the section's reports: job name -> report name -> build
+    return {
+        job.name: {
+            report.name: data.report_versions.get(job, {}).get(report) for report in reports
+        }
+        for job, reports in REPORT_SECTIONS[section].items()
+    }
+
+
+def get_section_inputs(
+    data: ReportData, sections: Collection[str] = SECTIONS
+) -> Dict[str, Any]:
+    # data each section (and the footer) is rendered from
+    inputs = {}
+
+    if "links" in sections:
+        inputs["links"] = {job.name: data.builds[job] for job in Jobs}
+    if "task list" in sections:
+        inputs["task list"] = [data.summary, data.planned]
+    if "issues" in sections:
+        inputs["issues"] = [asdict(issue) for issue in data.issues]
+    if "skipped and observed" in sections:
+        # skipped and observed cases are taken from the jobs' latest reports
+        inputs["skipped and observed"] = {
+            "reports": get_report_versions(data, "skipped and observed"),
+            "machines": report_model.SKIP_OBS_MACHINES,
+            "flakiness": history.FLAKY_WINDOW,
+        }
+    if "charts" in sections:
+        # charts are built from the letter jobs' latest reports
+        inputs["charts"] = get_report_versions(data, "charts")
+
+    inputs["footer"] = data.report_date.strftime("%Y-%m-%d")
+
+    return inputs
+
+
+def render_report(
+    document: WeeklyDocument,
+    report_file_path: str = REPORT_FILE_PATH,
+    reuse: Optional[Dict[str, dict]] = None,
+    sections: Collection[str] = SECTIONS,
+) -> Dict[str, dict]:
+    # `reuse` - rendered sections of the previous run to put into the report as is,
+    # `sections` - sections to render from the document, other sections are left as in the template,
+    # returns rendered XML of all sections
+    reuse = reuse or {}
+
+    # parse document.xml (main xml file) and relationships of the compiled template
+    with instrumentation.span("load template"), profiling.phase("load template"):
+        snapshot = template_snapshot.load_snapshot()
+        tree = snapshot.parse(DOCUMENT_PART)
+        anchors = snapshot.find_anchors(tree, DOCUMENT_PART)
+        word.open_relationships(snapshot.parse(RELS_PART))
+        content_types = snapshot.parse(CONTENT_TYPES_PART)
+
+    # template body elements, sections are rendered in place of them
+    body = tree.getroot().find("./{*}body")
+    originals = list(body)
+    regions = {
+        name: snapshot.body_regions(anchor_ids) for name, anchor_ids in SECTIONS.items()
+    }
+
     ##################################################################
     # Update jobs latest run links
-    print("Step 1/6 - Updating jobs' runs latest links...")
-
-    for job in Jobs:
-        link_el_id = ids.REPORT_LINKS[job]
+    print("Step 1/7 - Updating jobs' runs latest links...")
 
-        run_number = get_latest_build_number(job)
-        if run_number is None:
-            continue
+    with instrumentation.span("Step 1/7 - jobs' runs latest links"), profiling.phase(
+        "links"
+    ):
+        if "links" in reuse:
+            report_cache.restore(originals, reuse["links"])
+        elif "links" in sections:
+            for job in Jobs:
+                link_el_id = ids.REPORT_LINKS[job]
 
-        title = jobs_link_title[job].format(num=run_number)
-        link = get_build_link(job, run_number)
+                run = document.runs[job]
+                if run is None:
+                    continue
 
-        word.update_link(tree, link_id=link_el_id, url=link, text=title)
+                word.update_link_element(anchors[link_el_id], url=run.url, text=run.text)
 
     ##################################################################
     # Update tasks
-    print("Step 2/6 - Constructing task list...")
+    print("Step 2/7 - Constructing task list...")
 
-    summary, planned = get_project_status(report_date)
-
-    fill_task_list(tree, ids.SUMMARY_TASK_LIST, summary)
-    fill_task_list(tree, ids.PLANNED_TASK_LIST, planned)
+    with instrumentation.span("Step 2/7 - task list"), profiling.phase("task list"):
+        if "task list" in reuse:
+            report_cache.restore(originals, reuse["task list"])
+        elif "task list" in sections:
+            fill_task_list(anchors[ids.SUMMARY_TASK_LIST], document.summary_tasks)
+            fill_task_list(anchors[ids.PLANNED_TASK_LIST], document.planned_tasks)
 
     ##################################################################
     # Issues backlog table
-    print("Step 3/6 - Constructing issue table...")
+    print("Step 3/7 - Constructing issue table...")
 
-    issues = get_issues()
-    fill_issues_table(tree, issues)
+    with instrumentation.span("Step 3/7 - issue table"), profiling.phase(
+        "issues table"
+    ):
+        if "issues" in reuse:
+            report_cache.restore(originals, reuse["issues"])
+        elif "issues" in sections:
+            fill_issues_table(anchors[ids.ISSUES_BACKLOG_TABLE], document.issues)
 
     ##################################################################
     # Skipped or observed tables
-    print("Step 4/6 - Constructing skipped and observed tables")
+    print("Step 4/7 - Constructing skipped and observed tables")
+
+    with instrumentation.span(
+        "Step 4/7 - skipped and observed tables"
+    ), profiling.phase("skipped and observed tables"):
+        if "skipped and observed" in reuse:
+            report_cache.restore(originals, reuse["skipped and observed"])
+        elif "skipped and observed" in sections:
+            for job in ids.SKIP_OBS_CASES_TABLE:
+                table_id = ids.SKIP_OBS_CASES_TABLE[job]
+                fill_skipped_or_observed_table(
+                    anchors[table_id],
+                    document.skipped_or_observed[job],
+                    (document.skipped_or_observed_columns or {}).get(job),
+                    (document.skipped_or_observed_flakiness or {}).get(job),
+                )
 
-    for job in ids.SKIP_OBS_CASES_TABLE:
-        table_id = ids.SKIP_OBS_CASES_TABLE[job]
-        skip_or_obs_cases_per_group = get_skipped_or_observed_per_group(job)
-        fill_skipped_or_observed_table(tree, table_id, skip_or_obs_cases_per_group)
+    ##################################################################
+    # Passed, failed and error charts
+    print("Step 5/7 - Constructing results charts...")
+
+    with instrumentation.span("Step 5/7 - results charts"), profiling.phase("charts"):
+        if "charts" in reuse:
+            report_cache.restore(originals, reuse["charts"])
+        elif "charts" in sections:
+            fill_charts(anchors[ids.RESULTS_CHARTS], document.charts)
+
+    # keep rendered sections to reuse them in the next run
+    groups = report_cache.group_body(body, originals)
+    rels = report_cache.get_relationships()
+    rendered = {
+        name: report_cache.capture(groups, regions[name], rels) for name in SECTIONS
+    }
 
     ##################################################################
-    # save report document.xml
+    # update footer
+    print("Step 6/7 - Updating footer...")
+
+    with instrumentation.span("Step 6/7 - footer"):
+        # load footer.xml
+        footer_tree = snapshot.parse(FOOTER_PART)
 
-    word.write_xml(tree, word.DOCUMENT_PATH)
+        report_period_field = snapshot.find_anchors(footer_tree, FOOTER_PART)[
+            ids.REPORT_PERIOD_FIELD_ID
+        ]
+        report_period_field.text = document.period
 
     ##################################################################
-    # update footer
-    print("Step 5/6 - Updating footer...")
+    # write parts into docx
+    print("Step 7/7 - Saving report...")
+
+    with instrumentation.span("Step 7/7 - saving report"), profiling.phase("archive"):
+        finalize_report(
+            {
+                DOCUMENT_PART: tree,
+                FOOTER_PART: footer_tree,
+                RELS_PART: word.get_relationships(),
+                CONTENT_TYPES_PART: content_types,
+            },
+            report_file_path,
+            raw_spans={DOCUMENT_PART: snapshot.get_raw_spans(DOCUMENT_PART)},
+            new_parts=get_chart_parts(content_types),
+        )
+
+    print(f"Report '{report_file_path}' generated!")
 
-    # load footer.xml
-    footer_tree = word.load_xml(word.FOOTER_PATH)
+    return rendered
 
-    report_start_date = report_date - timedelta(weeks=1) + timedelta(days=1)
 
-    report_period_field = word.find_by_id(footer_tree, ids.REPORT_PERIOD_FIELD_ID)
-    report_period_field.text = "{from_date} — {to_date}".format(
-        from_date=report_start_date.strftime("%d-%B-%y"),
-        to_date=report_date.strftime("%d-%B-%y"),
+def main(
+    report_date: Optional[datetime] = None,
+    incremental: bool = True,
+    sections: Collection[str] = SECTIONS,
+):
+    # `sections` - sections to render, only their data is fetched,
+    # other sections are kept as they are in the previous report
+    check_template()
+
+    if report_date is None:
+        # current report with the latest data
+        report_date, at = datetime.today(), None
+    else:
+        at = end_of_day(report_date)
+
+    selected = [name for name in SECTIONS if name in sections]
+    fetch_plan.print_plan(SECTION_REQUESTS, selected)
+
+    if not incremental and len(selected) == len(SECTIONS):
+        render_report(report_model.build_document(collect_report_data(report_date, at)))
+        return
+
+    # sections of the previous run are reused if their inputs weren't changed,
+    # skipped and observed cases and charts are collected only if the builds of the jobs'
+    # latest reports were changed (a report uploaded later to the latest build changes them)
+    state = report_cache.load_state(REPORT_FILE_PATH)
+    previous_fingerprints = state.get("fingerprints", {})
+
+    data = collect_report_data(
+        report_date,
+        at,
+        sections=[name for name in selected if name not in BUILD_SECTIONS],
+    )
+    for name, jobs in BUILD_SECTIONS.items():
+        if name in selected:
+            data.builds.update(collect_builds(jobs, at))
+            for job, versions in collect_report_versions(REPORT_SECTIONS[name], at).items():
+                data.report_versions.setdefault(job, {}).update(versions)
+
+    fingerprints = {
+        name: report_cache.fingerprint(inputs)
+        for name, inputs in get_section_inputs(data, selected).items()
+    }
+    changed = [
+        name
+        for name in fingerprints
+        if not incremental or previous_fingerprints.get(name) != fingerprints[name]
+    ]
+
+    if not changed:
+        print(f"Report '{REPORT_FILE_PATH}' is up to date!")
+        return
+
+    print("Sections to update: " + ", ".join(changed))
+
+    if "skipped and observed" in changed:
+        (
+            data.skipped_or_observed,
+            data.skipped_or_observed_deltas,
+            data.skipped_or_observed_flakiness,
+        ) = collect_skipped_or_observed(at)
+    if "charts" in changed:
+        data.summaries = collect_summaries(at)
+
+    # not selected sections without the previous run are left as in the template
+    reuse = {
+        name: state["sections"][name]
+        for name in SECTIONS
+        if name not in changed and name in previous_fingerprints
+    }
+    untouched = [name for name in SECTIONS if name not in changed and name not in reuse]
+    if untouched:
+        print("WARNING: sections left as in the template: " + ", ".join(untouched))
+
+    rendered = render_report(
+        report_model.build_document(data), REPORT_FILE_PATH, reuse, sections=changed
     )
 
-    word.write_xml(footer_tree, word.FOOTER_PATH)
+    # fingerprints of the reused sections are kept
+    fingerprints = {
+        **{name: previous_fingerprints[name] for name in reuse},
+        **fingerprints,
+    }
 
-    ##################################################################
-    # combine files into docx
-    print("Step 6/6 - Saving report...")
+    report_cache.save_state(
+        REPORT_FILE_PATH, {"fingerprints": fingerprints, "sections": rendered}
+    )
+
+
+def end_of_day(date: datetime) -> datetime:
+    return date.replace(hour=23, minute=59, second=59, microsecond=0)
+
+
+def get_backfill_dates(start_date: datetime, end_date: datetime) -> List[datetime]:
+    # weekly report dates from the end date back to the start date
+    dates = []
+
+    date = end_date
+    while date >= start_date:
+        dates.append(date)
+        date -= timedelta(weeks=1)
+
+    return sorted(dates)
+
+
+def backfill(start_date: datetime, end_date: datetime, workers: int = BACKFILL_WORKERS):
+    # regenerate weekly reports for the period in one process:
+    # data of all weeks is collected in parallel with shared caches and connections,
+    # reports are rendered one by one (rendering is CPU bound)
+    check_template()
 
-    finalize_report()
+    dates = get_backfill_dates(start_date, end_date)
+    print(f"Regenerating {len(dates)} report(s)...")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        collected = executor.map(
+            lambda date: collect_report_data(date, at=end_of_day(date)), dates
+        )
+
+        for data in collected:
+            render_report(
+                report_model.build_document(data),
+                BACKFILL_REPORT_FILE_PATH.format(
+                    date=data.report_date.strftime("%Y-%m-%d")
+                ),
+            )
 
-    print(f"Report '{REPORT_FILE_PATH}' generated!")
 
-    clean_working_dir()
+def parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate weekly report docx")
+    parser.add_argument(
+        "--date",
+        type=parse_date,
+        help="regenerate report for the specified date (YYYY-MM-DD) with the data at that day",
+    )
+    parser.add_argument(
+        "--backfill",
+        nargs=2,
+        type=parse_date,
+        metavar=("START", "END"),
+        help="regenerate weekly reports from END date back to START date (YYYY-MM-DD)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=BACKFILL_WORKERS,
+        help="number of weeks collected in parallel in backfill mode",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="render all sections even if their data wasn't changed since the previous run",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=[fetch_plan.cli_name(name) for name in SECTIONS],
+        help="render only these sections (only their data is fetched), "
+        "other sections are kept as in the previous report",
+    )
+    parser.add_argument(
+        "--skip",
+        nargs="+",
+        choices=[fetch_plan.cli_name(name) for name in SECTIONS],
+        help="keep these sections as in the previous report, their data isn't fetched",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=report_parser.EXECUTORS,
+        default=report_parser.REPORT_EXECUTOR,
+        help="where downloaded reports are decoded: inline (one by one), "
+        "thread (in download threads) or process (in process pool)",
+    )
+    parser.add_argument(
+        "--trace", help="write run timings and HTTP metrics to the JSON (Chrome trace) file"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile",
+        metavar="DIR",
+        help="write CPU and memory profiles of rendering phases to the directory (default: ./profile)",
+    )
+    parser.add_argument(
+        "--profile-mode", choices=profiling.CPU_MODES, default="deterministic"
+    )
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable(args.profile, args.profile_mode)
+
+    report_parser.set_executor(args.executor)
+
+    sections = fetch_plan.select_sections(
+        SECTIONS, fetch_plan.from_cli_names(args.only), fetch_plan.from_cli_names(args.skip)
+    )
+    if not sections:
+        print("ERROR: all sections are skipped!")
+        exit(-1)
+
+    try:
+        with instrumentation.span("gen_report"):
+            if args.backfill:
+                backfill(*args.backfill, workers=args.workers)
+            else:
+                main(args.date, incremental=not args.force, sections=sections)
+    finally:
+        report_parser.shutdown()
+
+        if args.trace:
+            instrumentation.write_trace(args.trace)
+            instrumentation.print_summary()
+            print(f"Trace '{args.trace}' saved!")
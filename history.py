@@ -0,0 +1,327 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from common import Jobs, Reports
+from report_parser import GROUP_FIELDS
+
+# local append-only store of the results of all ingested builds
+HISTORY_PATH = os.getenv("REPORT_HISTORY_PATH", "./history.sqlite3")
+
+# number of the latest status changes of a group the flakiness score is computed over
+FLAKY_WINDOW = os.getenv("FLAKY_WINDOW", "10")
+if not FLAKY_WINDOW.isdigit() or int(FLAKY_WINDOW) < 1:
+    print(f"ERROR: FLAKY_WINDOW must be a positive number of builds, got '{FLAKY_WINDOW}'")
+    exit(-1)
+FLAKY_WINDOW = int(FLAKY_WINDOW)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    job TEXT NOT NULL,
+    report TEXT NOT NULL,
+    build INTEGER NOT NULL,
+    found INTEGER NOT NULL,
+    reporting_date TEXT,
+    PRIMARY KEY (job, report, build)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    job TEXT NOT NULL,
+    report TEXT NOT NULL,
+    build INTEGER NOT NULL,
+    machine TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    error INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    observed INTEGER NOT NULL,
+    execution_time REAL NOT NULL,
+    PRIMARY KEY (job, report, build, machine)
+);
+CREATE TABLE IF NOT EXISTS groups (
+    job TEXT NOT NULL,
+    report TEXT NOT NULL,
+    build INTEGER NOT NULL,
+    machine TEXT NOT NULL,
+    name TEXT NOT NULL,
+    skipped INTEGER NOT NULL,
+    observed INTEGER NOT NULL,
+    PRIMARY KEY (job, report, build, machine, name)
+);
+CREATE TABLE IF NOT EXISTS group_results (
+    job TEXT NOT NULL,
+    report TEXT NOT NULL,
+    build INTEGER NOT NULL,
+    machine TEXT NOT NULL,
+    name TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    error INTEGER NOT NULL,
+    skipped INTEGER NOT NULL,
+    observed INTEGER NOT NULL,
+    PRIMARY KEY (job, report, build, machine, name)
+);
+"""
+
+# differences between each build and the previous ingested build of the same
+# job, report and machine are computed for all rows at once with window functions
+SUMMARY_DELTAS_QUERY = """
+SELECT report, machine, build, executed_delta, passed_delta, failed_delta,
+       error_delta, pass_rate_delta, execution_time_delta
+FROM (
+    SELECT report, machine, build,
+           executed - LAG(executed) OVER w AS executed_delta,
+           passed - LAG(passed) OVER w AS passed_delta,
+           failed - LAG(failed) OVER w AS failed_delta,
+           error - LAG(error) OVER w AS error_delta,
+           pass_rate - LAG(pass_rate) OVER w AS pass_rate_delta,
+           execution_time - LAG(execution_time) OVER w AS execution_time_delta
+    FROM (
+        SELECT report, machine, build, passed, failed, error, execution_time,
+               total - skipped - observed AS executed,
+               CAST(passed AS REAL) / NULLIF(total - skipped - observed, 0) AS pass_rate
+        FROM summaries
+        WHERE job = ?
+    )
+    WINDOW w AS (PARTITION BY report, machine ORDER BY build)
+)
+WHERE executed_delta IS NOT NULL
+"""
+
+GROUP_DELTAS_QUERY = """
+SELECT name, cases - previous_cases
+FROM (
+    SELECT name, build, skipped + observed AS cases,
+           LAG(skipped + observed) OVER (PARTITION BY name ORDER BY build) AS previous_cases
+    FROM groups
+    WHERE job = ? AND report = ? AND machine = ?
+)
+WHERE build = ? AND previous_cases IS NOT NULL
+"""
+
+# flakiness of the groups at the build: share of the status changes (failed/error,
+# observed and skipped cases appear or disappear) among the last FLAKY_WINDOW changes
+# of each machine and group, computed for all groups of the report at once
+FLAKINESS_QUERY = """
+SELECT machine, name, score
+FROM (
+    SELECT machine, name, build,
+           AVG(changed) OVER (
+               PARTITION BY machine, name ORDER BY build
+               ROWS BETWEEN {preceding} PRECEDING AND CURRENT ROW
+           ) AS score
+    FROM (
+        SELECT machine, name, build,
+               CASE
+                   WHEN LAG(status) OVER w IS NULL THEN NULL
+                   WHEN LAG(status) OVER w != status THEN 1
+                   ELSE 0
+               END AS changed
+        FROM (
+            SELECT machine, name, build,
+                   (failed + error > 0) * 4 + (observed > 0) * 2 + (skipped > 0) AS status
+            FROM group_results
+            WHERE job = ? AND report = ? AND build <= ?
+        )
+        WINDOW w AS (PARTITION BY machine, name ORDER BY build)
+    )
+)
+WHERE build = ? AND score IS NOT NULL
+""".format(
+    preceding=FLAKY_WINDOW - 1
+)
+
+_lock = threading.Lock()
+# schema is created by the first connection of the process
+_schema_created = False
+
+
+@dataclass
+class Trend:
+    # changes since the previous ingested build
+    executed: int
+    passed: int
+    failed: int
+    error: int
+    pass_rate: Optional[float]
+    execution_time: float
+
+
+@contextmanager
+def _connect():
+    # store is shared by collecting threads, every operation uses own connection
+    global _schema_created
+
+    with _lock:
+        connection = sqlite3.connect(HISTORY_PATH)
+        try:
+            if not _schema_created:
+                connection.executescript(SCHEMA)
+                _schema_created = True
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+
+def is_ingested(job: Jobs, report: Reports, build_number: int) -> bool:
+    with _connect() as connection:
+        row = connection.execute(
+            "SELECT 1 FROM builds WHERE job = ? AND report = ? AND build = ?",
+            (job.name, report.name, build_number),
+        ).fetchone()
+
+    return row is not None
+
+
+def _reporting_date(json_report: dict) -> Optional[str]:
+    # machines' reporting dates are in ISO format, so they are compared as strings
+    dates = [
+        machine_report["reporting_date"]
+        for machine_report in json_report.values()
+        if machine_report["reporting_date"]
+    ]
+
+    return max(dates) if dates else None
+
+
+def ingest_report(
+    job: Jobs, report: Reports, build_number: int, json_report: Optional[dict]
+):
+    # saves per machine summaries and per group results of the build (the flakiness
+    # index is extended only by the new builds), builds without the report (404, failed
+    # requests aren't passed here) are saved too to not request them again
+    if is_ingested(job, report, build_number):
+        return
+
+    key = (job.name, report.name, build_number)
+
+    with _connect() as connection:
+        if json_report is None:
+            connection.execute(
+                "INSERT OR IGNORE INTO builds VALUES (?, ?, ?, 0, NULL)", key
+            )
+            return
+
+        connection.execute(
+            "INSERT OR IGNORE INTO builds VALUES (?, ?, ?, 1, ?)",
+            key + (_reporting_date(json_report),),
+        )
+
+        connection.executemany(
+            "INSERT OR IGNORE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                key
+                + (
+                    machine_name,
+                    summary["total"],
+                    summary["passed"],
+                    summary["failed"],
+                    summary["error"],
+                    summary["skipped"],
+                    summary["observed"],
+                    summary["execution_time"],
+                )
+                for machine_name, summary in (
+                    (machine_name, machine_report["summary"])
+                    for machine_name, machine_report in json_report.items()
+                )
+            ],
+        )
+
+        connection.executemany(
+            "INSERT OR IGNORE INTO groups VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                key
+                + (
+                    machine_name,
+                    group_name,
+                    group[""]["skipped"],
+                    group[""]["observed"],
+                )
+                for machine_name, machine_report in json_report.items()
+                for group_name, group in machine_report["results"].items()
+            ],
+        )
+
+        connection.executemany(
+            "INSERT OR IGNORE INTO group_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                key
+                + (machine_name, group_name)
+                + tuple(group[""][field] for field in GROUP_FIELDS)
+                for machine_name, machine_report in json_report.items()
+                for group_name, group in machine_report["results"].items()
+            ],
+        )
+
+
+def get_summary_deltas(job: Jobs) -> Dict[Tuple[Reports, str, int], Trend]:
+    # trends of all ingested builds of the job: (report, machine, build) -> trend
+    with _connect() as connection:
+        rows = connection.execute(SUMMARY_DELTAS_QUERY, (job.name,)).fetchall()
+
+    return {
+        (Reports[report], machine, build): Trend(*deltas)
+        for report, machine, build, *deltas in rows
+    }
+
+
+def get_group_deltas(
+    job: Jobs, report: Reports, machine: str, build_number: int
+) -> Dict[str, int]:
+    # changes of skipped and observed cases per group since the previous ingested build
+    with _connect() as connection:
+        rows = connection.execute(
+            GROUP_DELTAS_QUERY, (job.name, report.name, machine, build_number)
+        ).fetchall()
+
+    return dict(rows)
+
+
+def get_group_flakiness(
+    job: Jobs, report: Reports, build_number: int
+) -> Dict[str, Dict[str, float]]:
+    # flakiness scores (0 - stable, 1 - status changes every build) of the groups at the
+    # build on each machine: machine -> group -> score, groups without previous
+    # ingested builds have no score
+    flakiness = {}
+
+    with _connect() as connection:
+        rows = connection.execute(
+            FLAKINESS_QUERY, (job.name, report.name, build_number, build_number)
+        ).fetchall()
+
+    for machine, name, score in rows:
+        flakiness.setdefault(machine, {})[name] = score
+
+    return flakiness
+
+
+def format_delta(value, delta) -> str:
+    # "120 (+3)", value only if there is no change or nothing to compare with
+    if not delta:
+        return str(value)
+
+    return "{value} ({delta:+})".format(value=value, delta=delta)
+
+
+if __name__ == "__main__":
+    import argparse
+    import jenkins_export
+
+    parser = argparse.ArgumentParser(
+        description="Ingest previous builds of all jobs into the results history"
+    )
+    parser.add_argument(
+        "--depth", type=int, default=4, help="number of builds to ingest per job"
+    )
+    args = parser.parse_args()
+
+    for job, report, _ in jenkins_export.plan_report_requests():
+        jenkins_export.ingest_previous_builds(job, report, args.depth)
+
+    print(f"History '{HISTORY_PATH}' updated!")
@@ -0,0 +1,148 @@
+import os
+import json
+import threading
+from hashlib import sha1
+from typing import Any, Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import instrumentation
+
+# responses with validators (ETag, Last-Modified) are stored on disk and
+# requested again conditionally, "304 Not Modified" responses are served from disk
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "./.http_cache/")
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE", "1") != "0"
+
+
+def _entry_path(key: str, suffix: str) -> str:
+    return os.path.join(HTTP_CACHE_DIR, key + suffix)
+
+
+def _request_key(request: requests.PreparedRequest) -> str:
+    # responses are different for different credentials
+    authorization = request.headers.get("Authorization", "")
+
+    return sha1((request.url + "\n" + authorization).encode("utf-8")).hexdigest()
+
+
+def _write_atomic(file_path: str, content: bytes):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    # entries are stored concurrently by threads of the same process
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(content)
+    os.replace(tmp_path, file_path)
+
+
+def _load_entry(key: str) -> Optional[dict]:
+    meta_path = _entry_path(key, ".json")
+    body_path = _entry_path(key, ".body")
+
+    if not os.path.exists(meta_path) or not os.path.exists(body_path):
+        return None
+
+    with open(meta_path, "r") as file:
+        entry = json.load(file)
+
+    entry["body_path"] = body_path
+
+    return entry
+
+
+def _store_entry(key: str, response: requests.Response):
+    meta = {
+        "url": response.url,
+        "headers": dict(response.headers),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+    # body is written first, so metadata always points to the complete body
+    _write_atomic(_entry_path(key, ".body"), response.content)
+    _write_atomic(_entry_path(key, ".json"), json.dumps(meta).encode("utf-8"))
+
+
+def _cached_response(
+    request: requests.PreparedRequest, not_modified: requests.Response, entry: dict
+) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict(entry["headers"])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response.elapsed = not_modified.elapsed
+    response.connection = not_modified.connection
+    response.raw = not_modified.raw
+
+    with open(entry["body_path"], "rb") as file:
+        response._content = file.read()
+
+    # only headers were transferred
+    response.from_cache = True
+
+    return response
+
+
+class RevalidatingAdapter(HTTPAdapter):
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if not HTTP_CACHE_ENABLED or request.method != "GET":
+            return super().send(request, **kwargs)
+
+        key = _request_key(request)
+        entry = _load_entry(key)
+
+        if entry is not None:
+            if entry["etag"]:
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            instrumentation.record_cache("http revalidation", hit=True)
+            return _cached_response(request, response, entry)
+
+        if entry is not None:
+            instrumentation.record_cache("http revalidation", hit=False)
+
+        if response.status_code == 200 and (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        ):
+            _store_entry(key, response)
+
+        return response
+
+
+def get_versioned(key: Any, version: Any, fetch: Callable[[], Any]) -> Any:
+    # for resources without HTTP validators: data stored with its version
+    # (e.g. Confluence page version) is reused while the version is the same
+    if not HTTP_CACHE_ENABLED:
+        return fetch()
+
+    file_path = _entry_path(
+        "versioned/" + sha1(json.dumps(key).encode("utf-8")).hexdigest(), ".json"
+    )
+
+    if os.path.exists(file_path):
+        with open(file_path, "r") as file:
+            entry = json.load(file)
+
+        if entry["version"] == version:
+            instrumentation.record_cache("http revalidation", hit=True)
+            return entry["data"]
+
+        instrumentation.record_cache("http revalidation", hit=False)
+
+    data = fetch()
+    _write_atomic(
+        file_path, json.dumps({"version": version, "data": data}).encode("utf-8")
+    )
+
+    return data
@@ -1,47 +1,22 @@
-from common import Jobs
+import registry
 
-REPORT_LINKS = {
-    Jobs.Full_Samples: "FULL_SAMPLES_WEEKLY_REPORT_LINK",
-    Jobs.Win_Full: "WINDOWS_FULL_REPORT_LINK",
-    Jobs.Win_APU: "APU_CLIENT_REPORT_LINK",
-    Jobs.Win_Latency: "WINDOWS_LATENCY_REPORT_LINK",
-    Jobs.Win_Long_Term: "WINDOWS_LONG_TERM_REPORT_LINK",
-    Jobs.Android_Full: "ANDROID_FULL_REPORT_LINK",
-    Jobs.Android_Xiaomi_TV: "XIAOMI_TV_REPORT_LINK",
-    Jobs.Android_Chromecast_TV: "CHROMECAST_TV_REPORT_LINK",
-    Jobs.Ubuntu_Full: "UBUNTU_FULL_REPORT_LINK",
-    Jobs.AMD_Full: "AMD_FULL_REPORT_LINK",
-}
+# template ids are described in the registry
+REPORT_LINKS = registry.report_links
 
 SUMMARY_TASK_LIST = "SUMMARY_TASK_LIST"
 PLANNED_TASK_LIST = "PLANNED_TASK_LIST"
 ISSUES_BACKLOG_TABLE = "ISSUES_BACKLOG_TABLE"
+RESULTS_CHARTS = "RESULTS_CHARTS"
 
-SKIP_OBS_CASES_TABLE = {
-    Jobs.Win_Full: "SKIPPED_OR_OBSERVED_CASES_WIN_TABLE",
-    Jobs.Android_Full: "SKIPPED_OR_OBSERVED_CASES_ANDROID_TABLE",
-    Jobs.Ubuntu_Full: "SKIPPED_OR_OBSERVED_CASES_LIN_TABLE",
-    Jobs.Full_Samples: "SKIPPED_OR_OBSERVED_CASES_FULL_TABLE",
-}
+SKIP_OBS_CASES_TABLE = registry.skip_obs_cases_tables
 
 IDS = [
-    REPORT_LINKS[Jobs.Full_Samples],
-    REPORT_LINKS[Jobs.Win_Full],
-    REPORT_LINKS[Jobs.Win_APU],
-    REPORT_LINKS[Jobs.Android_Full],
-    REPORT_LINKS[Jobs.Android_Xiaomi_TV],
-    REPORT_LINKS[Jobs.Android_Chromecast_TV],
-    REPORT_LINKS[Jobs.Ubuntu_Full],
-    REPORT_LINKS[Jobs.AMD_Full],
-    REPORT_LINKS[Jobs.Win_Latency],
-    REPORT_LINKS[Jobs.Win_Long_Term],
+    *REPORT_LINKS.values(),
     SUMMARY_TASK_LIST,
     PLANNED_TASK_LIST,
     ISSUES_BACKLOG_TABLE,
-    SKIP_OBS_CASES_TABLE[Jobs.Full_Samples],
-    SKIP_OBS_CASES_TABLE[Jobs.Win_Full],
-    SKIP_OBS_CASES_TABLE[Jobs.Ubuntu_Full],
-    SKIP_OBS_CASES_TABLE[Jobs.Android_Full],
+    *SKIP_OBS_CASES_TABLE.values(),
+    RESULTS_CHARTS,
 ]
 
 # footer ids
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# all timestamps are relative to the module load (microseconds, as expected by chrome://tracing)
+_origin = time.perf_counter()
+_lock = threading.Lock()
+
+_events = []
+_http_stats: Dict[str, dict] = defaultdict(
+    lambda: {
+        "requests": 0,
+        "bytes": 0,
+        "time": 0.0,
+        "retries": 0,
+        "cache_hits": 0,
+        "statuses": Counter(),
+    }
+)
+_cache_stats: Dict[str, Counter] = defaultdict(Counter)
+
+
+def _timestamp(moment: Optional[float] = None) -> float:
+    if moment is None:
+        moment = time.perf_counter()
+
+    return (moment - _origin) * 1_000_000
+
+
+def _add_event(name: str, category: str, start: float, duration: float, args: dict):
+    # chrome trace "complete" event
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": _timestamp(start),
+        "dur": duration * 1_000_000,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+        "args": args,
+    }
+
+    with _lock:
+        _events.append(event)
+
+
+@contextmanager
+def span(name: str, category: str = "step", **args):
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        _add_event(name, category, start, time.perf_counter() - start, args)
+
+
+def record_request(
+    method: str,
+    url: str,
+    status: int,
+    size: int,
+    elapsed: float,
+    retries: int = 0,
+    cache_hit: bool = False,
+):
+    host = urlparse(url).netloc
+
+    with _lock:
+        stats = _http_stats[host]
+        stats["requests"] += 1
+        stats["bytes"] += size
+        stats["time"] += elapsed
+        stats["retries"] += retries
+        stats["cache_hits"] += int(cache_hit)
+        stats["statuses"][status] += 1
+
+    # response is recorded when it's already received, so span is shifted back
+    _add_event(
+        f"{method} {host}",
+        "http",
+        time.perf_counter() - elapsed,
+        elapsed,
+        {
+            "url": url,
+            "status": status,
+            "bytes": size,
+            "retries": retries,
+            "cache_hit": cache_hit,
+        },
+    )
+
+
+def record_cache(cache: str, hit: bool):
+    with _lock:
+        _cache_stats[cache]["hits" if hit else "misses"] += 1
+
+
+def http_stats() -> Dict[str, dict]:
+    with _lock:
+        return {
+            host: dict(stats, statuses=dict(stats["statuses"]))
+            for host, stats in _http_stats.items()
+        }
+
+
+def cache_stats() -> Dict[str, dict]:
+    with _lock:
+        return {cache: dict(stats) for cache, stats in _cache_stats.items()}
+
+
+def reset():
+    global _origin
+
+    with _lock:
+        _origin = time.perf_counter()
+        _events.clear()
+        _http_stats.clear()
+        _cache_stats.clear()
+
+
+def write_trace(file_path: str):
+    with _lock:
+        events = list(_events)
+
+    trace = {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {
+            "http": http_stats(),
+            "caches": cache_stats(),
+        },
+    }
+
+    with open(file_path, "w") as file:
+        json.dump(trace, file, indent=1, default=str)
+
+
+def print_summary():
+    print("HTTP requests per host:")
+    for host, stats in sorted(http_stats().items()):
+        statuses = ", ".join(
+            f"{status}: {count}" for status, count in sorted(stats["statuses"].items())
+        )
+        print(
+            f"  {host}: {stats['requests']} requests, {stats['bytes'] / 1024:.1f} KiB, "
+            f"{stats['time']:.2f}s, retries: {stats['retries']}, "
+            f"cache hits: {stats['cache_hits']} ({statuses})"
+        )
+
+    caches = cache_stats()
+    if caches:
+        print("Caches:")
+        for cache, stats in sorted(caches.items()):
+            print(f"  {cache}: {stats.get('hits', 0)} hits, {stats.get('misses', 0)} misses")
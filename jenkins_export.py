@@ -1,9 +1,15 @@
 import os
-import requests
 import json
 from requests.auth import HTTPBasicAuth
 from common import Jobs, Reports
-from typing import Dict, Optional
+import fetch
+import cache
+import instrumentation
+import history
+import registry
+import report_parser
+from typing import Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from http import HTTPStatus
 
@@ -12,41 +18,21 @@ CIS_HOST = os.getenv("CIS_HOST", "cis.nas.luxoft.com")
 JENKINS_USERNAME = os.environ["JENKINS_USERNAME"]
 JENKINS_TOKEN = os.environ["JENKINS_TOKEN"]
 
+# latest build numbers are reused during this time (seconds)
+LATEST_BUILD_TTL = 60
+# number of reports requested in parallel
+PREFETCH_WORKERS = int(os.getenv("JENKINS_PREFETCH_WORKERS", "8"))
 
-jobs_names = {
-    Jobs.Full_Samples: "FullSamples-Weekly",
-    Jobs.Win_Full: "StreamingSDK-Windows-WeeklyFull",
-    Jobs.Win_APU: "StreamingSDK-APU-WeeklyFull",
-    Jobs.Android_Full: "StreamingSDK-Android-WeeklyFull",
-    Jobs.Android_Xiaomi_TV: "StreamingSDK-XiaomiTVStick-WeeklyFull",
-    Jobs.Android_Chromecast_TV: "StreamingSDK-Chromecast-WeeklyFull",
-    Jobs.Ubuntu_Full: "StreamingSDK-Ubuntu-WeeklyFull",
-    Jobs.AMD_Full: "AMDLink-Weekly",
-    Jobs.Win_Latency: "StreamingSDK-LatencyTests",
-    Jobs.Win_Long_Term: "StreamingSDK-LongTermTests",
-}
-
-
-reports_names = {
-    Reports.summary: "Test_Report",
-    Reports.PUBG: "Test_Report_PUBG",
-    Reports.Dota2_DX11: "Test_Report_Dota2DX11",
-    Reports.Dota2_Vulkan: "Test_Report_Dota2Vulkan",
-    Reports.LoL: "Test_Report_LoL",
-    Reports.Heaven_Benchmark_DX9: "Test_Report_HeavenDX9",
-    Reports.Valley_Benchmark_DX9: "Test_Report_ValleyDX9",
-    Reports.Heaven_Benchmark_DX11: "Test_Report_HeavenDX11",
-    Reports.Valley_Benchmark_DX11: "Test_Report_ValleyDX11",
-    Reports.Heaven_Benchmark_OpenGL: "Test_Report_HeavenOpenGL",
-    Reports.Valley_Benchmark_OpenGL: "Test_Report_ValleyOpenGL",
-}
-
-jobs_representative_reports = {
-    Jobs.Full_Samples: Reports.PUBG,
-    Jobs.Win_Full: Reports.LoL,
-    Jobs.Android_Full: Reports.LoL,
-    Jobs.Ubuntu_Full: Reports.Valley_Benchmark_OpenGL,
-}
+
+class ReportRequestError(Exception):
+    # report request failed with other status than 404 (e.g. 5xx or proxy error), failures
+    # aren't cached, so the report is requested again by the next call
+    pass
+
+
+jobs_names = registry.jobs_names
+reports_names = registry.reports_names
+jobs_representative_reports = registry.jobs_representative_reports
 
 
 def get_build_link(job: Jobs, latest_build_number: int):
@@ -55,11 +41,17 @@ def get_build_link(job: Jobs, latest_build_number: int):
     return f"http://{JENKINS_HOST}/job/{name}/{latest_build_number}/"
 
 
+@cache.memoize("jenkins latest build", ttl=LATEST_BUILD_TTL)
 def get_latest_build_number(job: Jobs) -> Optional[int]:
+    with instrumentation.span("jenkins: latest build", "fetch", job=job.name):
+        return _get_latest_build_number(job)
+
+
+def _get_latest_build_number(job: Jobs) -> Optional[int]:
     name = jobs_names.get(job)
     url = f"http://{JENKINS_HOST}/job/{name}/api/json?tree=lastBuild[id]"
 
-    resp = requests.get(url, auth=HTTPBasicAuth(JENKINS_USERNAME, JENKINS_TOKEN))
+    resp = fetch.get(url, auth=HTTPBasicAuth(JENKINS_USERNAME, JENKINS_TOKEN))
 
     if resp.status_code == HTTPStatus.UNAUTHORIZED:
         print("ERROR: Jenkins token in env var 'JENKINS_TOKEN' is invalid!")
@@ -75,6 +67,39 @@ def get_latest_build_number(job: Jobs) -> Optional[int]:
     return int(id)
 
 
+@cache.memoize("jenkins builds")
+def get_builds(job: Jobs) -> List[Tuple[int, datetime]]:
+    # all builds of the job with their start time, newest first
+    name = jobs_names.get(job)
+    url = f"http://{JENKINS_HOST}/job/{name}/api/json?tree=allBuilds[number,timestamp]"
+
+    with instrumentation.span("jenkins: builds", "fetch", job=job.name):
+        resp = fetch.get(url, auth=HTTPBasicAuth(JENKINS_USERNAME, JENKINS_TOKEN))
+
+    if resp.status_code == HTTPStatus.UNAUTHORIZED:
+        print("ERROR: Jenkins token in env var 'JENKINS_TOKEN' is invalid!")
+        exit(-1)
+
+    builds = [
+        (build["number"], datetime.fromtimestamp(build["timestamp"] / 1000))
+        for build in resp.json().get("allBuilds", [])
+    ]
+
+    return sorted(builds, reverse=True)
+
+
+def get_build_number(job: Jobs, at: Optional[datetime] = None) -> Optional[int]:
+    # latest build started before the specified moment (latest build if it's None)
+    if at is None:
+        return get_latest_build_number(job)
+
+    for number, started_at in get_builds(job):
+        if started_at <= at:
+            return number
+
+    return None
+
+
 def get_report_link(
     job: Jobs, build_number: int, report: Reports, json: bool = True
 ) -> str:
@@ -91,64 +116,183 @@ def get_report_link(
     return report_url
 
 
-def get_latest_report(
-    job: Jobs, report: Reports, newer_than: Optional[datetime] = None
-) -> Optional[dict]:
-    build_number = get_latest_build_number(job)
-    if build_number is None:
-        return None
-
+@cache.memoize("jenkins reports")
+def _fetch_report(job: Jobs, build_number: int, report: Reports) -> Optional[dict]:
     report_url = get_report_link(job, build_number, report)
-    resp = requests.get(report_url, auth=HTTPBasicAuth(JENKINS_USERNAME, JENKINS_TOKEN))
+    resp = fetch.get(report_url, auth=HTTPBasicAuth(JENKINS_USERNAME, JENKINS_TOKEN))
 
     if resp.status_code == HTTPStatus.UNAUTHORIZED:
         print("ERROR: Jenkins token in env var 'JENKINS_TOKEN' is invalid!")
         exit(-1)
 
-    while (resp.status_code != 200) and build_number >= 0:
-        report_url = get_report_link(job, build_number, report)
-        resp = requests.get(
-            report_url, auth=HTTPBasicAuth(JENKINS_USERNAME, JENKINS_TOKEN)
+    # build has no report (yet)
+    if resp.status_code == HTTPStatus.NOT_FOUND:
+        return None
+
+    if resp.status_code != 200:
+        raise ReportRequestError(
+            f"JSON report {report_url} request failed with status {resp.status_code}"
         )
-        build_number -= 1
 
-    if resp is None or resp.status_code != 200:
+    # only the data used by the reports is kept
+    return report_parser.parse_report(resp.content)
+
+
+def _try_fetch_report(job: Jobs, build_number: int, report: Reports) -> Optional[dict]:
+    # failed request is taken as a missing report by this call only
+    try:
+        return _fetch_report(job, build_number, report)
+    except ReportRequestError as e:
+        print(f"WARNING: {e}")
         return None
 
-    json_report = resp.json()
+
+def plan_report_requests(
+    jobs: Optional[Iterable[Jobs]] = None, at: Optional[datetime] = None
+) -> List[Tuple[Jobs, Reports, int]]:
+    # (job, report, build number) requests of the jobs' reports in their latest builds
+    plan = []
+
+    for job in jobs or Jobs:
+        build_number = get_build_number(job, at)
+        if build_number is None:
+            continue
+
+        plan += [(job, report, build_number) for report in registry.jobs_reports[job]]
+
+    return plan
+
+
+def prefetch_reports(
+    plan: List[Tuple[Jobs, Reports, int]], workers: int = PREFETCH_WORKERS
+):
+    # requests planned reports in parallel, they are taken from the cache later
+    if report_parser.get_executor() == "inline":
+        workers = 1
+
+    with instrumentation.span(
+        "jenkins: prefetch reports",
+        "fetch",
+        requests=len(plan),
+        executor=report_parser.get_executor(),
+    ):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(
+                executor.map(
+                    lambda request: _try_fetch_report(request[0], request[2], request[1]),
+                    plan,
+                )
+            )
+
+
+def get_latest_report(
+    job: Jobs,
+    report: Reports,
+    newer_than: Optional[datetime] = None,
+    at: Optional[datetime] = None,
+) -> Optional[dict]:
+    with instrumentation.span(
+        "jenkins: latest report", "fetch", job=job.name, report=report.name
+    ):
+        return _get_latest_report(job, report, newer_than, at)
+
+
+def _get_latest_report(
+    job: Jobs,
+    report: Reports,
+    newer_than: Optional[datetime] = None,
+    at: Optional[datetime] = None,
+) -> Optional[dict]:
+    build_number = get_build_number(job, at)
+    if build_number is None:
+        return None
+
+    # take the latest build which has the report
+    json_report = _try_fetch_report(job, build_number, report)
+    while json_report is None and build_number > 0:
+        build_number -= 1
+        json_report = _try_fetch_report(job, build_number, report)
+
+    report_url = get_report_link(job, build_number, report)
 
     if not json_report:
         print(f"WARNING: JSON report {report_url} is not available!")
         return None
-    
 
-    for machine_report in json_report.values():
-        for report in list(machine_report["results"].values()):
-            if not report[""].get("machine_info"):
-                print(f"ERROR: Report {report_url} is broken!")
-                return None
+    if _is_broken(json_report):
+        print(f"ERROR: Report {report_url} is broken!")
+        return None
 
+    history.ingest_report(job, report, build_number, json_report)
 
     if newer_than is not None:
-        reporting_date = max(
-            [
-                datetime.strptime(reporting_date, "%m/%d/%Y %H:%M:%S")
-                for reporting_date in [
-                    report[""]["machine_info"]["reporting_date"]
-                    for machine_report in json_report.values()
-                    for report in list(machine_report["results"].values())
-                ]
-            ]
-        )
+        # dates are parsed while the report is decoded,
+        # machines without groups have no reporting date
+        reporting_dates = [
+            datetime.fromisoformat(machine_report["reporting_date"])
+            for machine_report in json_report.values()
+            if machine_report["reporting_date"] is not None
+        ]
+
+        if not reporting_dates:
+            print(f"WARNING: JSON report {report_url} has no reporting date!")
+            return None
 
-        if reporting_date < newer_than:
+        if max(reporting_dates) < newer_than:
             return None
 
     return {"version": build_number, "report": json_report}
 
 
+def _is_broken(json_report: dict) -> bool:
+    for machine_report in json_report.values():
+        for report in list(machine_report["results"].values()):
+            if not report[""].get("machine_info"):
+                return True
+
+    return False
+
+
+def ingest_previous_builds(job: Jobs, report: Reports, depth: int):
+    # saves reports of the last `depth` builds into the history,
+    # only builds which aren't ingested yet are requested
+    builds = get_builds(job)[:depth]
+
+    for build_number, _ in builds:
+        if history.is_ingested(job, report, build_number):
+            continue
+
+        # only builds without the report (404) are saved as such, failed requests are
+        # repeated by the next run
+        try:
+            json_report = _fetch_report(job, build_number, report)
+        except ReportRequestError as e:
+            print(f"WARNING: {e}")
+            continue
+
+        # report of the latest build can appear later
+        if json_report is None and build_number == builds[0][0]:
+            continue
+
+        if json_report is not None and _is_broken(json_report):
+            continue
+
+        history.ingest_report(job, report, build_number, json_report)
+
+
+def representative_machine(machines: Iterable[str]) -> str:
+    # report for the AMD 7900 machine prioritized (`machines` - names or machine reports)
+    machines = list(machines)
+
+    machine_name = [machine for machine in machines if "7900" in machine]
+    if machine_name:
+        return machine_name[0]
+
+    return machines[0]
+
+
 def get_skipped_or_observed_per_group(
-    job: Jobs, report: Reports = None
+    job: Jobs, report: Reports = None, at: Optional[datetime] = None
 ) -> Optional[Dict[str, int]]:
     if report is None:
         if job in jobs_representative_reports:
@@ -156,22 +300,16 @@ def get_skipped_or_observed_per_group(
         else:
             return None
 
-    latest_report = get_latest_report(job, report)
+    latest_report = get_latest_report(job, report, at=at)
 
     if latest_report is None:
         return {}
 
     json_report = latest_report["report"]
 
-    machine_name = [machine for machine in json_report.keys() if "7900" in machine]
-    if machine_name:
-        machine_name = machine_name[0]
-    else:
-        machine_name = list(json_report.keys())[0]
+    machine_name = representative_machine(json_report)
 
-    groups_list = json_report[machine_name][
-        "results"
-    ]  # report for the AMD 7900 machine prioritized
+    groups_list = json_report[machine_name]["results"]
     skipped_or_observed_per_group = {
         key: groups_list[key][""]["observed"] + groups_list[key][""]["skipped"]
         for key in groups_list
@@ -184,6 +322,49 @@ def get_skipped_or_observed_per_group(
     }
 
 
+def get_skipped_or_observed_deltas(
+    job: Jobs, report: Reports = None, at: Optional[datetime] = None
+) -> Dict[str, Dict[str, int]]:
+    # changes of skipped and observed cases per group since the previous ingested build
+    # on each machine: machine -> group -> delta
+    if report is None:
+        if job in jobs_representative_reports:
+            report = jobs_representative_reports[job]
+        else:
+            return {}
+
+    latest_report = get_latest_report(job, report, at=at)
+
+    if latest_report is None:
+        return {}
+
+    return {
+        machine_name: history.get_group_deltas(
+            job, report, machine_name, latest_report["version"]
+        )
+        for machine_name in latest_report["report"]
+    }
+
+
+def get_skipped_or_observed_flakiness(
+    job: Jobs, report: Reports = None, at: Optional[datetime] = None
+) -> Dict[str, Dict[str, float]]:
+    # flakiness scores of the groups at the latest build on each machine:
+    # machine -> group -> score
+    if report is None:
+        if job in jobs_representative_reports:
+            report = jobs_representative_reports[job]
+        else:
+            return {}
+
+    latest_report = get_latest_report(job, report, at=at)
+
+    if latest_report is None:
+        return {}
+
+    return history.get_group_flakiness(job, report, latest_report["version"])
+
+
 if __name__ == "__main__":
     print("Runs:")
     for job in Jobs:
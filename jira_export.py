@@ -1,37 +1,65 @@
 import os
+import threading
 from datetime import datetime
-from atlassian import Jira
 from common import Issue
-from typing import List
+from typing import List, Optional
 from urllib.parse import urljoin
+import fetch
+import cache
+import instrumentation
 
 JIRA_URL = "https://luxproject.luxoft.com/jira/"
 JIRA_TOKEN = os.environ["LUXOFT_JIRA_TOKEN"]
 
-jira_instance = Jira(
-    # Url of jira server
-    url=JIRA_URL,
-    # password/token
-    token=JIRA_TOKEN,
-    cloud=False,
-)
+_jira_instance = None
+_lock = threading.Lock()
 
-def validate_token():
+
+def validate_token(jira_instance):
     issues = jira_instance.jql("")
     if issues['total'] == 0:
         print("ERROR: Jira token 'JIRA_TOKEN' is invalid!")
         exit(-1)
 
 
-# validate token on module's load
-validate_token()
+def get_jira_instance():
+    # atlassian client is imported, created and its token is validated on the first
+    # request, so the module is loaded without requests to Jira
+    global _jira_instance
+
+    with _lock:
+        if _jira_instance is None:
+            from atlassian import Jira
+
+            jira_instance = Jira(
+                # Url of jira server
+                url=JIRA_URL,
+                # password/token
+                token=JIRA_TOKEN,
+                cloud=False,
+                # instrumented session with connection pooling
+                session=fetch.create_session(),
+            )
+            validate_token(jira_instance)
+            _jira_instance = jira_instance
 
-def get_issues() -> List[Issue]:
-    jql_request = 'project = STVITT AND issuetype = Defect AND status in (Open, "In Progress", Suspended, Resolved, Deferred) AND labels = StreamingSDK'
+    return _jira_instance
+
+
+@cache.memoize("jira issues")
+def get_issues(at: Optional[datetime] = None) -> List[Issue]:
+    # open issues at the specified moment (currently open issues if it's None)
+    if at is None:
+        jql_request = 'project = STVITT AND issuetype = Defect AND status in (Open, "In Progress", Suspended, Resolved, Deferred) AND labels = StreamingSDK'
+    else:
+        jql_request = 'project = STVITT AND issuetype = Defect AND status was in (Open, "In Progress", Suspended, Resolved, Deferred) ON "{date}" AND created <= "{date}" AND labels = StreamingSDK'.format(
+            date=at.strftime("%Y-%m-%d %H:%M")
+        )
 
-    issues = jira_instance.jql(
-        jql_request, fields="summary,customfield_12094,created"
-    ).get("issues")
+    with instrumentation.span("jira: issues", "fetch"):
+        issues = get_jira_instance().jql(
+            jql_request, fields="summary,customfield_12094,created"
+        ).get("issues")
 
     issues = [
         Issue(
@@ -0,0 +1,117 @@
+import os
+import threading
+from copy import deepcopy
+from typing import Callable
+import lxml.html as lh
+
+import instrumentation
+
+LETTERS_TEMPLATES_PATH = "letters_templates/"
+LETTER1_TEMPLATE_PATH = os.path.join(LETTERS_TEMPLATES_PATH, "Letter1.html")
+LETTER2_TEMPLATE_PATH = os.path.join(LETTERS_TEMPLATES_PATH, "Letter2.html")
+REPORT_TABLE_TEMPLATE_PATH = os.path.join(LETTERS_TEMPLATES_PATH, "report_table.html")
+
+LETTER2_HTML_TABLE = "ISSUES_TABLE"
+
+# empty paragraph placed after each report table of the first letter
+SPACER_HTML = """
+<p class="MsoNormal">
+    <span style="font-size: 9pt; font-family: 'Open Sans', sans-serif">
+        <o:p>&nbsp;</o:p>
+    </span>
+</p>
+"""
+
+# parsed templates and prototypes: (path, kind) -> (file mtime, value)
+_registry = {}
+_lock = threading.Lock()
+
+
+def _parse(file_path: str):
+    with open(file_path, "r") as file:
+        return lh.parse(file)
+
+
+def _cached(file_path: str, kind: str, build: Callable):
+    # value built from the template file once per process, rebuilt when the file is changed
+    mtime = os.stat(file_path).st_mtime_ns if file_path else None
+
+    with _lock:
+        entry = _registry.get((file_path, kind))
+
+    if entry is not None and entry[0] == mtime:
+        instrumentation.record_cache("letter templates", hit=True)
+        return entry[1]
+
+    instrumentation.record_cache("letter templates", hit=False)
+    value = build(_parse(file_path)) if file_path else build(None)
+
+    with _lock:
+        _registry[(file_path, kind)] = (mtime, value)
+
+    return value
+
+
+class ReportSection:
+    # prototypes of the per machine section of the first letter (title and report table)
+
+    def __init__(self, tree):
+        # <body> with title paragraph and table without data rows
+        self.body = deepcopy(tree.find("//body"))
+
+        tbody = self.body.find(".//table/tbody")
+        row = tbody.findall("./tr")[1]
+        tbody.remove(row)
+
+        self.row = row
+
+    def clone(self):
+        # returns copy of the section body, its title element and table body
+        body = deepcopy(self.body)
+
+        return body, body.find(".//p/span"), body.find(".//table/tbody")
+
+
+class IssuesLetter:
+    # second letter with issues table without data rows
+
+    def __init__(self, tree):
+        self.tree = deepcopy(tree)
+
+        tbody = self.tree.find("//table[@id='{id}']/tbody".format(id=LETTER2_HTML_TABLE))
+        row = tbody.findall("./tr")[0]
+        tbody.remove(row)
+
+        self.row = row
+
+    def clone(self):
+        # returns copy of the letter and its issues table body
+        tree = deepcopy(self.tree)
+
+        return tree, tree.find("//table[@id='{id}']/tbody".format(id=LETTER2_HTML_TABLE))
+
+
+def get_first_letter():
+    # copy of the first letter template to fill
+    return deepcopy(_cached(LETTER1_TEMPLATE_PATH, "tree", lambda tree: tree))
+
+
+def get_report_section() -> ReportSection:
+    return _cached(REPORT_TABLE_TEMPLATE_PATH, "section", ReportSection)
+
+
+def get_issues_letter() -> IssuesLetter:
+    return _cached(LETTER2_TEMPLATE_PATH, "letter", IssuesLetter)
+
+
+def get_spacer():
+    return _cached(None, "spacer", lambda _: lh.fromstring(SPACER_HTML))
+
+
+def clone(element):
+    return deepcopy(element)
+
+
+def clear():
+    with _lock:
+        _registry.clear()
@@ -0,0 +1,47 @@
+import os
+import threading
+from typing import Iterable
+from lxml import etree
+
+# comment marking position of the streamed content in the serialized template
+STREAM_MARKER = "STREAMED_CONTENT"
+
+
+def write_streamed(
+    tree, anchor: etree.Element, elements: Iterable, file_path: str, inside: bool = False
+):
+    # Writes letter template to the file with elements produced by `elements` iterable
+    # placed after the `anchor` element (or appended into it if `inside` is True).
+    # Template head is written before the first element is produced and every element
+    # is serialized as soon as it's produced, so the whole letter is never kept in memory.
+    # The output is the same as for the filled tree written with `tree.write(...)`.
+    # Letter is written to a temporary file which replaces `file_path` once it's complete,
+    # so a failed producer leaves the previous letter untouched.
+    marker = etree.Comment(STREAM_MARKER)
+    if inside:
+        anchor.append(marker)
+    else:
+        anchor.addnext(marker)
+
+    try:
+        skeleton = etree.tostring(tree, xml_declaration=True, encoding="ASCII")
+    finally:
+        marker.getparent().remove(marker)
+
+    head, tail = skeleton.split(etree.tostring(marker), 1)
+
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(head)
+            file.flush()
+
+            for element in elements:
+                file.write(etree.tostring(element, encoding="ascii", xml_declaration=False))
+
+            file.write(tail)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, file_path)
@@ -0,0 +1,376 @@
+import math
+import uuid
+import struct
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+# Outlook message template (.oft) writer without Outlook:
+# message is a Compound File Binary (MS-CFB) with MAPI properties layout of MS-OXMSG.
+
+# root storage CLSID of Outlook templates (.msg files use 00020D0B-0000-0000-C000-000000000046)
+OFT_CLSID = uuid.UUID("0006F046-0000-0000-C000-000000000046").bytes_le
+
+##################################################################
+# Compound File Binary format
+
+SECTOR_SIZE = 512
+MINI_SECTOR_SIZE = 64
+MINI_STREAM_CUTOFF = 4096
+DIRECTORY_ENTRY_SIZE = 128
+HEADER_DIFAT_ENTRIES = 109
+
+FREESECT = 0xFFFFFFFF
+ENDOFCHAIN = 0xFFFFFFFE
+FATSECT = 0xFFFFFFFD
+NOSTREAM = 0xFFFFFFFF
+
+STGTY_STORAGE = 1
+STGTY_STREAM = 2
+STGTY_ROOT = 5
+
+COLOR_BLACK = 1
+
+CFB_SIGNATURE = b"\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1"
+
+# storage content: stream name -> bytes, storage name -> nested dict
+Storage = Dict[str, Union[bytes, "Storage"]]
+
+
+class _DirectoryEntry:
+    def __init__(self, name: str, type: int, data: bytes = None, clsid: bytes = bytes(16)):
+        self.name = name
+        self.type = type
+        self.data = data
+        self.clsid = clsid
+        self.children: List["_DirectoryEntry"] = []
+        self.index = 0
+        self.left = NOSTREAM
+        self.right = NOSTREAM
+        self.child = NOSTREAM
+        self.start = ENDOFCHAIN
+        self.size = 0
+
+    def pack(self) -> bytes:
+        # unused entries have empty name with zero length
+        name = (self.name + "\0").encode("utf-16-le") if self.name else b""
+        if len(name) > 64:
+            raise ValueError(f"Compound file entry name '{self.name}' is too long")
+
+        return struct.pack(
+            "<64sHBBIII16sIQQIQ",
+            name,
+            len(name),
+            self.type,
+            COLOR_BLACK,
+            self.left,
+            self.right,
+            self.child,
+            self.clsid,
+            0,  # state bits
+            0,  # creation time
+            0,  # modification time
+            self.start,
+            self.size,
+        )
+
+
+def _collect_entries(parent: _DirectoryEntry, content: Storage, entries: List[_DirectoryEntry]):
+    for name, value in content.items():
+        if isinstance(value, dict):
+            entry = _DirectoryEntry(name, STGTY_STORAGE)
+        else:
+            entry = _DirectoryEntry(name, STGTY_STREAM, data=bytes(value))
+
+        entry.index = len(entries)
+        entries.append(entry)
+        parent.children.append(entry)
+
+        if isinstance(value, dict):
+            _collect_entries(entry, value, entries)
+
+
+def _build_siblings_tree(children: List[_DirectoryEntry]) -> int:
+    # children of storage are kept in a binary search tree ordered by name length and
+    # then by upper case name; balanced tree with all nodes colored black is a valid
+    # red-black tree for CFB readers
+    if not children:
+        return NOSTREAM
+
+    middle = len(children) // 2
+    node = children[middle]
+    node.left = _build_siblings_tree(children[:middle])
+    node.right = _build_siblings_tree(children[middle + 1:])
+
+    return node.index
+
+
+class _SectorAllocator:
+    def __init__(self):
+        self.sectors: List[bytes] = []
+        self.fat: List[int] = []
+
+    def allocate(self, data: bytes, sector_size: int = SECTOR_SIZE) -> int:
+        if not data:
+            return ENDOFCHAIN
+
+        start = len(self.sectors)
+        count = math.ceil(len(data) / sector_size)
+
+        for i in range(count):
+            chunk = data[i * sector_size:(i + 1) * sector_size]
+            self.sectors.append(chunk.ljust(sector_size, b"\0"))
+            self.fat.append(start + i + 1 if i + 1 < count else ENDOFCHAIN)
+
+        return start
+
+
+def _pack_sector_table(values: List[int]) -> bytes:
+    per_sector = SECTOR_SIZE // 4
+    padding = (-len(values)) % per_sector
+
+    return struct.pack(f"<{len(values) + padding}I", *(values + [FREESECT] * padding))
+
+
+def write_compound_file(file_path: str, content: Storage, root_clsid: bytes = bytes(16)):
+    root = _DirectoryEntry("Root Entry", STGTY_ROOT, clsid=root_clsid)
+    entries = [root]
+    _collect_entries(root, content, entries)
+
+    for entry in entries:
+        entry.children.sort(key=lambda e: (len(e.name), e.name.upper()))
+        entry.child = _build_siblings_tree(entry.children)
+
+    sectors = _SectorAllocator()
+    mini_sectors = _SectorAllocator()
+
+    # small streams are stored in the mini stream, others in regular sectors
+    for entry in entries:
+        if entry.type != STGTY_STREAM:
+            continue
+
+        entry.size = len(entry.data)
+        if entry.size < MINI_STREAM_CUTOFF:
+            entry.start = mini_sectors.allocate(entry.data, MINI_SECTOR_SIZE)
+        else:
+            entry.start = sectors.allocate(entry.data)
+
+    mini_stream = b"".join(mini_sectors.sectors)
+    root.start = sectors.allocate(mini_stream)
+    root.size = len(mini_stream)
+
+    mini_fat_start = ENDOFCHAIN
+    mini_fat_sectors = 0
+    if mini_sectors.fat:
+        mini_fat = _pack_sector_table(mini_sectors.fat)
+        mini_fat_start = sectors.allocate(mini_fat)
+        mini_fat_sectors = len(mini_fat) // SECTOR_SIZE
+
+    directory = b"".join(entry.pack() for entry in entries)
+    unused_entry = _DirectoryEntry("", 0)
+    unused_entry.start = 0
+    directory += unused_entry.pack() * ((-len(entries)) % (SECTOR_SIZE // DIRECTORY_ENTRY_SIZE))
+    directory_start = sectors.allocate(directory)
+
+    # FAT describes all sectors including its own ones
+    data_sectors = len(sectors.sectors)
+    fat_sectors = 0
+    while data_sectors + fat_sectors > fat_sectors * (SECTOR_SIZE // 4):
+        fat_sectors += 1
+
+    if fat_sectors > HEADER_DIFAT_ENTRIES:
+        raise ValueError("Message is too large for the compound file without DIFAT sectors")
+
+    fat_locations = list(range(data_sectors, data_sectors + fat_sectors))
+    fat = _pack_sector_table(sectors.fat + [FATSECT] * fat_sectors)
+
+    header = struct.pack(
+        "<8s16sHHHHH6sIIIIIIIII",
+        CFB_SIGNATURE,
+        bytes(16),  # CLSID
+        0x003E,  # minor version
+        0x0003,  # major version (512 bytes sectors)
+        0xFFFE,  # byte order
+        9,  # sector shift
+        6,  # mini sector shift
+        bytes(6),
+        0,  # number of directory sectors (must be 0 for version 3)
+        fat_sectors,
+        directory_start,
+        0,  # transaction signature
+        MINI_STREAM_CUTOFF,
+        mini_fat_start,
+        mini_fat_sectors,
+        ENDOFCHAIN,  # first DIFAT sector
+        0,  # number of DIFAT sectors
+    )
+    difat = fat_locations + [FREESECT] * (HEADER_DIFAT_ENTRIES - fat_sectors)
+    header += struct.pack(f"<{HEADER_DIFAT_ENTRIES}I", *difat)
+
+    with open(file_path, "wb") as file:
+        file.write(header)
+        for sector in sectors.sectors:
+            file.write(sector)
+        file.write(fat)
+
+
+##################################################################
+# MAPI message properties
+
+PT_LONG = 0x0003
+PT_BOOLEAN = 0x000B
+PT_SYSTIME = 0x0040
+PT_UNICODE = 0x001F
+PT_BINARY = 0x0102
+
+PR_MESSAGE_CLASS = (0x001A, PT_UNICODE)
+PR_SUBJECT = (0x0037, PT_UNICODE)
+PR_SUBJECT_PREFIX = (0x003D, PT_UNICODE)
+PR_NORMALIZED_SUBJECT = (0x0E1D, PT_UNICODE)
+PR_DISPLAY_TO = (0x0E04, PT_UNICODE)
+PR_DISPLAY_CC = (0x0E03, PT_UNICODE)
+PR_MESSAGE_FLAGS = (0x0E07, PT_LONG)
+PR_HTML = (0x1013, PT_BINARY)
+PR_NATIVE_BODY_INFO = (0x1016, PT_LONG)
+PR_CREATION_TIME = (0x3007, PT_SYSTIME)
+PR_LAST_MODIFICATION_TIME = (0x3008, PT_SYSTIME)
+PR_STORE_SUPPORT_MASK = (0x340D, PT_LONG)
+PR_INTERNET_CPID = (0x3FDE, PT_LONG)
+PR_MESSAGE_CODEPAGE = (0x3FFD, PT_LONG)
+
+PR_RECIPIENT_TYPE = (0x0C15, PT_LONG)
+PR_OBJECT_TYPE = (0x0FFE, PT_LONG)
+PR_ROWID = (0x3000, PT_LONG)
+PR_DISPLAY_NAME = (0x3001, PT_UNICODE)
+PR_ADDRTYPE = (0x3002, PT_UNICODE)
+PR_EMAIL_ADDRESS = (0x3003, PT_UNICODE)
+PR_DISPLAY_TYPE = (0x3900, PT_LONG)
+PR_SMTP_ADDRESS = (0x39FE, PT_UNICODE)
+PR_RECIPIENT_DISPLAY_NAME = (0x5FF6, PT_UNICODE)
+
+MSGFLAG_UNSENT = 0x00000008
+STORE_UNICODE_OK = 0x00040000
+NATIVE_BODY_HTML = 3
+CODEPAGE_UTF8 = 65001
+MAPI_MAILUSER = 6
+DT_MAILUSER = 0
+MAPI_TO = 1
+MAPI_CC = 2
+
+PROPATTR_READABLE_WRITABLE = 0x00000006
+
+PROPERTIES_STREAM = "__properties_version1.0"
+NAMEID_STORAGE = "__nameid_version1.0"
+RECIPIENT_STORAGE = "__recip_version1.0_#{index:08X}"
+PROPERTY_STREAM = "__substg1.0_{id:04X}{type:04X}"
+
+
+def _filetime(moment: datetime) -> int:
+    # 100-nanosecond intervals since January 1, 1601 (UTC)
+    return int((moment - datetime(1601, 1, 1, tzinfo=timezone.utc)).total_seconds() * 10_000_000)
+
+
+def _properties_storage(properties: dict, header: bytes) -> Storage:
+    # fixed size values are stored in the properties stream,
+    # variable size values in separate streams referenced by size
+    storage = {}
+    entries = []
+
+    for (id, type), value in properties.items():
+        tag = (id << 16) | type
+
+        if type == PT_UNICODE:
+            data = value.encode("utf-16-le")
+            storage[PROPERTY_STREAM.format(id=id, type=type)] = data
+            packed_value = struct.pack("<II", len(data) + 2, 0)
+        elif type == PT_BINARY:
+            storage[PROPERTY_STREAM.format(id=id, type=type)] = value
+            packed_value = struct.pack("<II", len(value), 0)
+        elif type == PT_SYSTIME:
+            packed_value = struct.pack("<Q", value)
+        elif type == PT_BOOLEAN:
+            packed_value = struct.pack("<HHI", int(value), 0, 0)
+        else:
+            packed_value = struct.pack("<II", value, 0)
+
+        entries.append(struct.pack("<II", tag, PROPATTR_READABLE_WRITABLE) + packed_value)
+
+    storage[PROPERTIES_STREAM] = header + b"".join(entries)
+
+    return storage
+
+
+def parse_recipients(recipients: str) -> List[str]:
+    # `;` separated list of addresses
+    return [address.strip() for address in recipients.split(";") if address.strip()]
+
+
+def build_message(
+    html: bytes,
+    subject: str = "",
+    recipients_to: str = "",
+    recipients_cc: str = "",
+) -> Storage:
+    now = _filetime(datetime.now(timezone.utc))
+
+    recipients = [(address, MAPI_TO) for address in parse_recipients(recipients_to)]
+    recipients += [(address, MAPI_CC) for address in parse_recipients(recipients_cc)]
+
+    message = _properties_storage(
+        {
+            PR_MESSAGE_CLASS: "IPM.Note",
+            PR_SUBJECT: subject,
+            PR_SUBJECT_PREFIX: "",
+            PR_NORMALIZED_SUBJECT: subject,
+            PR_DISPLAY_TO: "; ".join(parse_recipients(recipients_to)),
+            PR_DISPLAY_CC: "; ".join(parse_recipients(recipients_cc)),
+            PR_MESSAGE_FLAGS: MSGFLAG_UNSENT,
+            PR_HTML: html,
+            PR_NATIVE_BODY_INFO: NATIVE_BODY_HTML,
+            PR_CREATION_TIME: now,
+            PR_LAST_MODIFICATION_TIME: now,
+            PR_STORE_SUPPORT_MASK: STORE_UNICODE_OK,
+            PR_INTERNET_CPID: CODEPAGE_UTF8,
+            PR_MESSAGE_CODEPAGE: CODEPAGE_UTF8,
+        },
+        # reserved, next recipient id, next attachment id, recipients count, attachments count, reserved
+        struct.pack("<8sIIII8s", bytes(8), len(recipients), 0, len(recipients), 0, bytes(8)),
+    )
+
+    # named properties mapping is required even if it's empty
+    message[NAMEID_STORAGE] = {
+        PROPERTY_STREAM.format(id=0x0002, type=PT_BINARY): b"",
+        PROPERTY_STREAM.format(id=0x0003, type=PT_BINARY): b"",
+        PROPERTY_STREAM.format(id=0x0004, type=PT_BINARY): b"",
+    }
+
+    for index, (address, recipient_type) in enumerate(recipients):
+        message[RECIPIENT_STORAGE.format(index=index)] = _properties_storage(
+            {
+                PR_RECIPIENT_TYPE: recipient_type,
+                PR_OBJECT_TYPE: MAPI_MAILUSER,
+                PR_ROWID: index,
+                PR_DISPLAY_NAME: address,
+                PR_ADDRTYPE: "SMTP",
+                PR_EMAIL_ADDRESS: address,
+                PR_DISPLAY_TYPE: DT_MAILUSER,
+                PR_SMTP_ADDRESS: address,
+                PR_RECIPIENT_DISPLAY_NAME: address,
+            },
+            bytes(8),
+        )
+
+    return message
+
+
+def write_oft(
+    file_path: str,
+    html: Union[bytes, str],
+    subject: str = "",
+    recipients_to: str = "",
+    recipients_cc: str = "",
+):
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+
+    message = build_message(html, subject, recipients_to, recipients_cc)
+    write_compound_file(file_path, message, root_clsid=OFT_CLSID)
@@ -0,0 +1,169 @@
+import os
+import time
+import argparse
+from datetime import datetime
+from typing import Dict, List
+
+import gen_documents
+import gen_emails
+import gen_report
+import template_snapshot
+from common import TEMPLATE_PATH
+from gen_emails import LetterFormat
+from letter_templates import LETTERS_TEMPLATES_PATH
+from report_model import WeeklyDocument
+
+# Preview of the template changes: report and letters are rendered again from the dataset
+# saved by gen_documents.py (./.report_cache/document.pickle) each time files of template/
+# or letters_templates/ are saved. Only local renderers are used, nothing is requested
+# from Jenkins, Jira or Confluence.
+
+PREVIEW_DIR = "./preview/"
+REPORT_PREVIEW_PATH = os.path.join(PREVIEW_DIR, "report.docx")
+
+# how often template files are checked (seconds)
+POLL_INTERVAL = 0.2
+
+
+def get_mtimes(path: str) -> Dict[str, int]:
+    # modification times of all files in the directory
+    mtimes = {}
+
+    for root, dirs, files in os.walk(path):
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            try:
+                mtimes[file_path] = os.stat(file_path).st_mtime_ns
+            except FileNotFoundError:
+                # file is replaced by the editor right now
+                continue
+
+    return mtimes
+
+
+def get_document_sections(document: WeeklyDocument) -> List[str]:
+    # report sections which have data in the dataset
+    content = {
+        "links": document.runs,
+        "task list": document.summary_tasks,
+        "issues": document.issues,
+        "skipped and observed": document.skipped_or_observed,
+        "charts": document.charts,
+    }
+
+    return [name for name in gen_report.SECTIONS if content.get(name) is not None]
+
+
+def render_report(document: WeeklyDocument):
+    snapshot = template_snapshot.load_snapshot()
+    if snapshot.missing:
+        print("ERROR: template is invalid, missing ids: " + ", ".join(snapshot.missing))
+        return
+
+    gen_report.render_report(
+        document, REPORT_PREVIEW_PATH, sections=get_document_sections(document)
+    )
+
+
+def render_letters(document: WeeklyDocument):
+    # letters without data in the dataset aren't rendered (their data isn't requested)
+    if document.results is not None:
+        gen_emails.generate_first_letter(
+            format=LetterFormat.HTML, output_dir=PREVIEW_DIR, tables=document.results
+        )
+    else:
+        print("WARNING: dataset has no Letter 1 tables, Letter 1 isn't rendered")
+
+    if document.issues is not None:
+        gen_emails.generate_second_letter(
+            report_date=document.report_date,
+            format=LetterFormat.HTML,
+            output_dir=PREVIEW_DIR,
+            issues=document.issues,
+        )
+    else:
+        print("WARNING: dataset has no issues, Letter 2 isn't rendered")
+
+
+def render(name: str, document: WeeklyDocument):
+    renderers = {"report": render_report, "letters": render_letters}
+
+    start = time.perf_counter()
+    try:
+        renderers[name](document)
+    except Exception as e:
+        # template can be saved in the middle of editing, preview waits for the next save
+        print(f"ERROR: {name} preview failed: {e}")
+        return
+
+    print(
+        "[{time}] {name} preview rendered in {elapsed:.2f} s".format(
+            time=datetime.now().strftime("%H:%M:%S"),
+            name=name.capitalize(),
+            elapsed=time.perf_counter() - start,
+        )
+    )
+
+
+def watch(document: WeeklyDocument, interval: float = POLL_INTERVAL):
+    # templates of the documents: document name -> directory
+    watched = {"report": TEMPLATE_PATH, "letters": LETTERS_TEMPLATES_PATH}
+    mtimes = {name: get_mtimes(path) for name, path in watched.items()}
+
+    print(f"Watching '{TEMPLATE_PATH}' and '{LETTERS_TEMPLATES_PATH}' (Ctrl+C to stop)...")
+
+    while True:
+        time.sleep(interval)
+
+        for name, path in watched.items():
+            current = get_mtimes(path)
+            if current == mtimes[name]:
+                continue
+
+            # editors can write the file in several steps, it's rendered once they are finished
+            while True:
+                time.sleep(interval)
+                latest = get_mtimes(path)
+                if latest == current:
+                    break
+                current = latest
+
+            mtimes[name] = current
+            render(name, document)
+
+
+def main(collect: bool = False):
+    if collect:
+        document = gen_documents.collect_document(datetime.today(), gen_documents.RENDERERS)
+        gen_documents.save_dataset(document)
+    else:
+        document = gen_documents.load_dataset()
+
+    print(
+        "Dataset of {date} is loaded, previews are written to '{dir}'".format(
+            date=document.report_date.strftime("%Y-%m-%d"), dir=PREVIEW_DIR
+        )
+    )
+
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    render("report", document)
+    render("letters", document)
+
+    try:
+        watch(document)
+    except KeyboardInterrupt:
+        print("Preview stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render report and letters again each time their templates are saved"
+    )
+    parser.add_argument(
+        "--collect",
+        action="store_true",
+        help="collect the dataset first (the dataset of the last gen_documents.py run is used by default)",
+    )
+    args = parser.parse_args()
+
+    main(args.collect)
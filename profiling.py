@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+
+CPU_MODES = ["deterministic", "sampling"]
+
+# sampling interval of the sampling profiler (seconds)
+SAMPLING_INTERVAL = 0.005
+
+CPU_REPORT_LIMIT = 50
+MEMORY_REPORT_LIMIT = 30
+
+_output_dir: Optional[str] = None
+_cpu_mode = "deterministic"
+_phase_number = 0
+_active = False
+
+
+def enable(output_dir: str, cpu_mode: str = "deterministic"):
+    global _output_dir, _cpu_mode
+
+    if cpu_mode not in CPU_MODES:
+        raise ValueError(f"Unknown profiling mode '{cpu_mode}'")
+
+    os.makedirs(output_dir, exist_ok=True)
+    _output_dir = output_dir
+    _cpu_mode = cpu_mode
+
+
+def is_enabled() -> bool:
+    return _output_dir is not None
+
+
+class _Sampler(threading.Thread):
+    # samples stack of the profiled thread and counts functions on top of the stack
+    # (self time) and functions anywhere in the stack (total time)
+
+    def __init__(self, thread_id: int):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.self_samples = Counter()
+        self.total_samples = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(SAMPLING_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            self.samples += 1
+            self.self_samples[self._location(frame)] += 1
+
+            seen = set()
+            while frame is not None:
+                location = self._location(frame)
+                if location not in seen:
+                    seen.add(location)
+                    self.total_samples[location] += 1
+                frame = frame.f_back
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    @staticmethod
+    def _location(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+
+    def write_report(self, file, elapsed: float):
+        file.write(f"{self.samples} samples every {SAMPLING_INTERVAL * 1000:.0f} ms, {elapsed:.3f}s\n\n")
+
+        for title, samples in [("self", self.self_samples), ("total", self.total_samples)]:
+            file.write(f"Top functions by {title} samples:\n")
+            for location, count in samples.most_common(CPU_REPORT_LIMIT):
+                file.write(f"{count:>8} {count / max(self.samples, 1):>7.1%}  {location}\n")
+            file.write("\n")
+
+
+def _report_path(phase_name: str, suffix: str) -> str:
+    file_name = "{num:02d}_{name}.{suffix}".format(
+        num=_phase_number, name=phase_name.replace(" ", "_").replace("/", "_"), suffix=suffix
+    )
+    return os.path.join(_output_dir, file_name)
+
+
+def _write_memory_report(phase_name: str, before, after):
+    current, peak = tracemalloc.get_traced_memory()
+
+    with open(_report_path(phase_name, "memory.txt"), "w") as file:
+        file.write(f"Current: {current / 1024:.1f} KiB, peak: {peak / 1024:.1f} KiB\n\n")
+
+        file.write("Top allocations growth by line:\n")
+        for stat in after.compare_to(before, "lineno")[:MEMORY_REPORT_LIMIT]:
+            file.write(f"{stat}\n")
+
+        file.write("\nTop allocations held by line:\n")
+        for stat in after.statistics("lineno")[:MEMORY_REPORT_LIMIT]:
+            file.write(f"{stat}\n")
+
+
+@contextmanager
+def phase(name: str):
+    global _phase_number, _active
+
+    # nothing to do when profiling is disabled or phase is nested into another one
+    if _output_dir is None or _active:
+        yield
+        return
+
+    _active = True
+    _phase_number += 1
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    memory_before = tracemalloc.take_snapshot()
+
+    profiler = None
+    sampler = None
+    if _cpu_mode == "deterministic":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        sampler = _Sampler(threading.get_ident())
+        sampler.start()
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+
+        if profiler is not None:
+            profiler.disable()
+        else:
+            sampler.stop()
+
+        # snapshot is taken before reports writing to keep it out of the statistics
+        memory_after = tracemalloc.take_snapshot()
+        _write_memory_report(name, memory_before, memory_after)
+
+        if started_tracing:
+            tracemalloc.stop()
+
+        if profiler is not None:
+            profiler.dump_stats(_report_path(name, "prof"))
+
+            with open(_report_path(name, "cpu.txt"), "w") as file:
+                file.write(f"{elapsed:.3f}s\n\n")
+                stats = pstats.Stats(profiler, stream=file)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(CPU_REPORT_LIMIT)
+                stats.sort_stats(pstats.SortKey.TIME).print_stats(CPU_REPORT_LIMIT)
+        else:
+            with open(_report_path(name, "cpu.txt"), "w") as file:
+                sampler.write_report(file, elapsed)
+
+        _active = False
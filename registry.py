@@ -0,0 +1,143 @@
+import os
+import json
+from enum import Enum
+from typing import Dict, List
+
+# declarative description of all jobs and reports, every job/report table is built from it
+REGISTRY_PATH = os.getenv(
+    "REPORT_REGISTRY_PATH", os.path.join(os.path.dirname(__file__), "registry.json")
+)
+
+JOB_REQUIRED_KEYS = ["name", "id", "jenkins_name", "link_title", "link_id"]
+REPORT_REQUIRED_KEYS = ["name", "id", "jenkins_name"]
+# ids are stored in unsigned byte arrays of the collected summaries
+MAX_ID = 255
+
+
+def load_registry(file_path: str = REGISTRY_PATH) -> dict:
+    with open(file_path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def validate_registry(config: dict) -> List[str]:
+    # returns all problems of the registry at once
+    errors = []
+
+    def check_entries(kind: str, entries: list, required_keys: List[str]):
+        names, ids = set(), set()
+        for entry in entries:
+            missing = [key for key in required_keys if key not in entry]
+            if missing:
+                errors.append(f"{kind} {entry.get('name', entry)}: missing {', '.join(missing)}")
+                continue
+
+            if not entry["name"].isidentifier():
+                errors.append(f"{kind} {entry['name']}: name must be an identifier")
+            if entry["name"] in names:
+                errors.append(f"{kind} {entry['name']}: duplicated name")
+            if type(entry["id"]) is not int or not 0 <= entry["id"] <= MAX_ID:
+                errors.append(f"{kind} {entry['name']}: id must be an integer in 0..{MAX_ID}")
+            elif entry["id"] in ids:
+                errors.append(f"{kind} {entry['name']}: duplicated id {entry['id']}")
+            else:
+                ids.add(entry["id"])
+            names.add(entry["name"])
+
+        return names
+
+    check_entries("Job", config.get("jobs", []), JOB_REQUIRED_KEYS)
+    report_names = check_entries("Report", config.get("reports", []), REPORT_REQUIRED_KEYS)
+
+    if "summary" not in report_names:
+        errors.append("Report summary is missing")
+
+    template_ids = []
+    for job in config.get("jobs", []):
+        template_ids += [job.get("link_id"), job.get("skipped_or_observed_table_id")]
+
+        if "{num}" not in job.get("link_title", "{num}"):
+            errors.append(f"Job {job.get('name')}: link title has no {{num}} field")
+
+        for report in [job.get("representative_report")] + job.get("reports", []):
+            if report is not None and report not in report_names:
+                errors.append(f"Job {job.get('name')}: unknown report {report}")
+
+        if job.get("skipped_or_observed_table_id") and not job.get("representative_report"):
+            errors.append(f"Job {job.get('name')}: skipped/observed table needs representative report")
+
+    template_ids = [id for id in template_ids if id is not None]
+    for id in set(template_ids):
+        if template_ids.count(id) > 1:
+            errors.append(f"Template id {id} is used by several jobs")
+
+    for name in config.get("letter_jobs", []):
+        job = next((job for job in config.get("jobs", []) if job.get("name") == name), None)
+        if job is None:
+            errors.append(f"Letter job {name} is unknown")
+        elif "title" not in job or "client_part" not in job:
+            errors.append(f"Letter job {name}: title and client part are required")
+
+    return errors
+
+
+_config = load_registry()
+
+_errors = validate_registry(_config)
+if _errors:
+    for error in _errors:
+        print(f"ERROR: registry '{REGISTRY_PATH}': {error}")
+    exit(-1)
+
+# enums are created from the registry, members are pickled by name through this module
+Jobs = Enum(
+    "Jobs", [(job["name"], job["id"]) for job in _config["jobs"]], module=__name__
+)
+Reports = Enum(
+    "Reports",
+    [(report["name"], report["id"]) for report in _config["reports"]],
+    module=__name__,
+)
+
+_jobs = {Jobs[job["name"]]: job for job in _config["jobs"]}
+_reports = {Reports[report["name"]]: report for report in _config["reports"]}
+
+# jenkins_export
+jobs_names: Dict[Jobs, str] = {job: entry["jenkins_name"] for job, entry in _jobs.items()}
+reports_names: Dict[Reports, str] = {
+    report: entry["jenkins_name"] for report, entry in _reports.items()
+}
+jobs_representative_reports: Dict[Jobs, Reports] = {
+    job: Reports[entry["representative_report"]]
+    for job, entry in _jobs.items()
+    if entry.get("representative_report")
+}
+# reports requested for the job (all reports if they aren't listed)
+jobs_reports: Dict[Jobs, List[Reports]] = {
+    job: [Reports[name] for name in entry["reports"]]
+    if "reports" in entry
+    else [report for report in Reports if report is not Reports.summary]
+    for job, entry in _jobs.items()
+}
+
+# gen_report
+jobs_link_title: Dict[Jobs, str] = {job: entry["link_title"] for job, entry in _jobs.items()}
+
+# gen_emails
+jobs_titles: Dict[Jobs, str] = {
+    job: entry["title"] for job, entry in _jobs.items() if "title" in entry
+}
+client_parts: Dict[Jobs, str] = {
+    job: entry["client_part"] for job, entry in _jobs.items() if "client_part" in entry
+}
+reports_titles: Dict[Reports, str] = {
+    report: entry["title"] for report, entry in _reports.items() if "title" in entry
+}
+letter_jobs: List[Jobs] = [Jobs[name] for name in _config.get("letter_jobs", [])]
+
+# ids
+report_links: Dict[Jobs, str] = {job: entry["link_id"] for job, entry in _jobs.items()}
+skip_obs_cases_tables: Dict[Jobs, str] = {
+    job: entry["skipped_or_observed_table_id"]
+    for job, entry in _jobs.items()
+    if entry.get("skipped_or_observed_table_id")
+}
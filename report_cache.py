@@ -0,0 +1,177 @@
+import os
+import json
+from hashlib import sha1
+from typing import Any, Dict, List, Optional
+from lxml import etree
+
+import word
+from common import TEMPLATE_PATH
+
+# fingerprints of the sections' inputs and their rendered XML of the previous run
+REPORT_CACHE_DIR = "./.report_cache/"
+
+# relationship id attribute of hyperlinks and charts
+R_ID = etree.QName(word.R_NS, "id").text
+
+
+def fingerprint(inputs: Any) -> str:
+    return sha1(
+        json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def file_hash(file_path: str) -> Optional[str]:
+    if not os.path.exists(file_path):
+        return None
+
+    with open(file_path, "rb") as file:
+        return sha1(file.read()).hexdigest()
+
+
+def template_hash(template_path: str = TEMPLATE_PATH) -> str:
+    # hash of all template files (names and contents)
+    digest = sha1()
+
+    for root, dirs, files in os.walk(template_path):
+        dirs.sort()
+        for file_name in sorted(files):
+            file_path = os.path.join(root, file_name)
+            digest.update(os.path.relpath(file_path, template_path).encode("utf-8"))
+            with open(file_path, "rb") as file:
+                digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+def _state_path(report_file_path: str) -> str:
+    return os.path.join(
+        REPORT_CACHE_DIR, os.path.basename(report_file_path) + ".json"
+    )
+
+
+def load_state(report_file_path: str) -> dict:
+    # state of the previous run, it's valid only if the template and
+    # the generated report weren't changed since then
+    state_path = _state_path(report_file_path)
+    if not os.path.exists(state_path):
+        return {}
+
+    with open(state_path, "r") as file:
+        state = json.load(file)
+
+    if state.get("template") != template_hash():
+        return {}
+
+    if state.get("report") != file_hash(report_file_path):
+        return {}
+
+    return state
+
+
+def save_state(report_file_path: str, state: dict):
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+
+    state = dict(
+        state, template=template_hash(), report=file_hash(report_file_path)
+    )
+
+    with open(_state_path(report_file_path), "w") as file:
+        json.dump(state, file)
+
+
+def group_body(
+    body: etree.Element, originals: List[Optional[etree.Element]]
+) -> Dict[int, List[etree.Element]]:
+    # rendered body elements grouped by the template body elements:
+    # each group holds the template element (if it isn't removed)
+    # and elements inserted after it
+    positions = {
+        id(element): index
+        for index, element in enumerate(originals)
+        if element is not None
+    }
+    groups = {index: [] for index in range(len(originals))}
+
+    index = None
+    for element in body:
+        if id(element) in positions:
+            index = positions[id(element)]
+        if index is not None:
+            groups[index].append(element)
+
+    return groups
+
+
+def capture(
+    groups: Dict[int, List[etree.Element]], regions: List[int], rels: Dict[str, str]
+) -> dict:
+    # rendered XML of the section, targets of its hyperlinks (rel id -> url)
+    # and its chart parts (rel id -> chart part)
+    fragments = {
+        str(index): [
+            [
+                etree.tostring(element, encoding="ascii", with_tail=False).decode(
+                    "ascii"
+                ),
+                element.tail,
+            ]
+            for element in groups[index]
+        ]
+        for index in regions
+    }
+
+    links = {}
+    for index in regions:
+        for element in groups[index]:
+            for link in element.iter(etree.QName(word.W_NS, "hyperlink").text):
+                rel_id = link.get(R_ID)
+                if rel_id in rels:
+                    links[rel_id] = rels[rel_id]
+
+    charts = {}
+    for index in regions:
+        for element in groups[index]:
+            for chart in element.iter(etree.QName(word.C_NS, "chart").text):
+                rel_id = chart.get(R_ID)
+                if rel_id in rels:
+                    charts[rel_id] = rels[rel_id]
+
+    return {"fragments": fragments, "links": links, "charts": charts}
+
+
+def restore(originals: List[Optional[etree.Element]], section: dict):
+    # replaces template elements with the section's XML of the previous run
+    for index, fragments in section["fragments"].items():
+        index = int(index)
+        original = originals[index]
+
+        elements = []
+        for fragment, tail in fragments:
+            element = etree.fromstring(fragment)
+            element.tail = tail
+            elements.append(element)
+
+        for element in reversed(elements):
+            original.addnext(element)
+        word.remove_element(original)
+
+        originals[index] = elements[0] if elements else None
+
+    # template links keep their relationships with the previous targets,
+    # ids of created relationships are derived from the urls, so they are created again
+    rels = get_relationships()
+    for rel_id, url in section["links"].items():
+        if rel_id in rels:
+            word.update_relationship_target(rel_id, url)
+        else:
+            word.create_relationship(url)
+
+    # ids of chart relationships are derived from the chart parts
+    for target in section.get("charts", {}).values():
+        word.create_chart_relationship(target)
+
+
+def get_relationships() -> Dict[str, str]:
+    rels = word.get_relationships()
+
+    return {rel.get("Id"): rel.get("Target") for rel in rels.getroot()}
@@ -0,0 +1,422 @@
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from common import Jobs, Issue
+from jenkins_export import get_build_link, representative_machine
+from summaries import GroupMatrix, MachineSummary, WeekSummaries, collect_job_summaries
+from history import Trend, format_delta, get_group_flakiness, get_summary_deltas
+import instrumentation
+import registry
+
+# Format-neutral content of the weekly report and letters. It's built once from the
+# collected data and rendered by gen_report (docx), gen_emails (HTML/Outlook letters)
+# and wiki_export (Markdown and plain HTML), renderers only place the prepared text.
+
+ISSUES_COLUMNS = ["Key", "Summary", "Created", "Severity"]
+RESULTS_COLUMNS = ["Report", "Total", "Passed", "Failed", "Error", "Time taken", "Flaky groups"]
+# series of the results charts and their summary columns
+CHART_SERIES = {"Passed": "passed", "Failed": "failed", "Error": "error"}
+
+# cases of which machines are shown in the skipped/observed tables: the representative machine,
+# merged cases of all machines ("max" or "sum") or a column per machine
+SKIP_OBS_MODES = ["representative", "max", "sum", "columns"]
+SKIP_OBS_MACHINES = os.getenv("SKIP_OBS_MACHINES", "representative")
+if SKIP_OBS_MACHINES not in SKIP_OBS_MODES:
+    print(
+        "ERROR: unknown SKIP_OBS_MACHINES '{}', expected one of: {}".format(
+            SKIP_OBS_MACHINES, ", ".join(SKIP_OBS_MODES)
+        )
+    )
+    exit(-1)
+
+# groups whose flakiness score (see history.FLAKINESS_QUERY) reaches the threshold are flaky
+FLAKY_THRESHOLD = os.getenv("FLAKY_THRESHOLD", "0.3")
+try:
+    FLAKY_THRESHOLD = float(FLAKY_THRESHOLD)
+except ValueError:
+    print(f"ERROR: FLAKY_THRESHOLD must be a number from 0 to 1, got '{FLAKY_THRESHOLD}'")
+    exit(-1)
+
+
+@dataclass
+class Cell:
+    text: str
+    url: Optional[str] = None
+    # value needs attention (it's highlighted in the letters)
+    alert: bool = False
+
+
+@dataclass
+class ResultsTable:
+    # results of the job's reports on one machine
+    job: Jobs
+    machine: str
+    title: str
+    rows: List[List[Cell]]
+
+
+@dataclass
+class MachineColumns:
+    # server parts of the machines
+    machines: List[str]
+    # cases on each machine of every group ("3 (+1)")
+    rows: List[List[str]]
+
+
+@dataclass
+class Chart:
+    title: str
+    # machines of the job
+    categories: List[str]
+    # series name -> value of each category
+    series: Dict[str, List[int]]
+
+
+@dataclass
+class WeeklyDocument:
+    report_date: datetime
+    # report period in the footer
+    period: str
+    # latest run link of each job, None if the job has no runs
+    runs: Dict[Jobs, Optional[Cell]]
+    # content of the sections which aren't collected is None
+    summary_tasks: Optional[List[str]]
+    planned_tasks: Optional[List[str]]
+    # rows of the issues backlog (ISSUES_COLUMNS)
+    issues: Optional[List[List[Cell]]]
+    # skipped/observed groups of the jobs' representative reports (cases of the machines
+    # selected by SKIP_OBS_MACHINES), None if not collected
+    skipped_or_observed: Optional[Dict[Jobs, List[str]]]
+    # results tables of the letter jobs (RESULTS_COLUMNS), None if not collected
+    results: Optional[List[ResultsTable]] = None
+    # passed/failed/error charts of the letter jobs, None if not collected
+    charts: Optional[Dict[Jobs, Chart]] = None
+    # cases of the skipped/observed groups per machine (only in "columns" mode)
+    skipped_or_observed_columns: Optional[Dict[Jobs, MachineColumns]] = None
+    # flakiness of the skipped/observed groups ("40%"), None if not collected
+    skipped_or_observed_flakiness: Optional[Dict[Jobs, List[str]]] = None
+
+
+def build_period(report_date: datetime) -> str:
+    report_start_date = report_date - timedelta(weeks=1) + timedelta(days=1)
+
+    return "{from_date} — {to_date}".format(
+        from_date=report_start_date.strftime("%d-%B-%y"),
+        to_date=report_date.strftime("%d-%B-%y"),
+    )
+
+
+def build_runs(builds: Dict[Jobs, Optional[int]]) -> Dict[Jobs, Optional[Cell]]:
+    return {
+        job: Cell(
+            text=registry.jobs_link_title[job].format(num=build_number),
+            url=get_build_link(job, build_number),
+        )
+        if build_number is not None
+        else None
+        for job, build_number in builds.items()
+    }
+
+
+def build_issue_rows(issues: List[Issue]) -> List[List[Cell]]:
+    # old issues (created in 2021) and blocker/critical issues need attention
+    return [
+        [
+            Cell(issue.key, url=issue.url),
+            Cell(issue.summary),
+            Cell(
+                issue.created_at,
+                alert=datetime.strptime(issue.created_at, "%d/%b/%y").year == 2021,
+            ),
+            Cell(issue.severity, alert=issue.severity.lower() in ["blocker", "critical"]),
+        ]
+        for issue in issues
+    ]
+
+
+def build_skipped_or_observed_groups(
+    skip_or_obs_cases_per_group: Dict[str, int], deltas: Optional[Dict[str, int]] = None
+) -> List[str]:
+    # "group (N cases, +d since previous build)"
+    groups = []
+
+    for group, cases_number in skip_or_obs_cases_per_group.items():
+        cases = "{cases} cases".format(cases=cases_number)
+        if deltas and deltas.get(group):
+            cases += ", {delta:+} since previous build".format(delta=deltas[group])
+
+        groups.append("{group} ({cases})".format(group=group, cases=cases))
+
+    return groups
+
+
+def merge_skipped_or_observed(
+    matrix: GroupMatrix, deltas: Dict[str, Dict[str, int]], mode: str
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    # cases per group and their changes since the previous build in "representative",
+    # "max" or "sum" mode, `deltas` - changes per machine (machine -> group -> delta)
+    if not matrix.machines:
+        return {}, {}
+
+    if mode == "representative":
+        machine = representative_machine(matrix.machines)
+        return matrix.column(machine), deltas.get(machine, {})
+
+    merged = matrix.merge(mode)
+    previous = matrix.previous(deltas).merge(mode)
+
+    return merged, {
+        group: cases - previous.get(group, 0)
+        for group, cases in merged.items()
+        if cases != previous.get(group, 0)
+    }
+
+
+def merge_flakiness(
+    flakiness: Dict[str, Dict[str, float]], machines: List[str], mode: str
+) -> Dict[str, float]:
+    # flakiness scores of the groups on the representative machine or the highest score
+    # of all machines in other modes, `flakiness` - scores per machine (machine -> group -> score)
+    if not machines:
+        return {}
+
+    if mode == "representative":
+        return flakiness.get(representative_machine(machines), {})
+
+    merged = {}
+    for machine in machines:
+        for group, score in flakiness.get(machine, {}).items():
+            merged[group] = max(score, merged.get(group, 0))
+
+    return merged
+
+
+def format_flakiness(score: Optional[float]) -> str:
+    # "40%", groups without previous builds have no score
+    if score is None:
+        return "-"
+
+    return "{:.0%}".format(score)
+
+
+def build_skipped_or_observed_columns(
+    matrix: GroupMatrix, deltas: Dict[str, Dict[str, int]]
+) -> Tuple[List[str], MachineColumns]:
+    # groups with cases on any machine and their cases on each machine
+    groups = []
+    rows = []
+
+    for group_index, group in enumerate(matrix.groups):
+        row = matrix.row(group_index)
+        if not any(row):
+            continue
+
+        groups.append(group)
+        rows.append(
+            [
+                format_delta(cases, deltas.get(machine, {}).get(group))
+                for machine, cases in zip(matrix.machines, row)
+            ]
+        )
+
+    return groups, MachineColumns(
+        machines=[build_server_part(machine) for machine in matrix.machines], rows=rows
+    )
+
+
+def format_execution_time(seconds: float) -> str:
+    # "1h 2m 3s", hours are omitted if there are none
+    timestamp = []
+    h, m, s = [int(x) for x in str(timedelta(seconds=int(seconds))).split(":")]
+    if h > 0:
+        timestamp.append("{}h".format(int(h)))
+    timestamp.append("{}m".format(int(m)))
+    timestamp.append("{}s".format(int(s)))
+
+    return " ".join(timestamp)
+
+
+def format_passed(passed: int, delta: int, pass_rate_delta: Optional[float]) -> str:
+    # "95 (+2, +1.5%)", the pass rate change is shown if it's at least 0.1%
+    changes = []
+    if delta:
+        changes.append("{:+}".format(delta))
+    if pass_rate_delta is not None and round(pass_rate_delta * 100, 1):
+        changes.append("{:+.1f}%".format(pass_rate_delta * 100))
+
+    if not changes:
+        return str(passed)
+
+    return "{passed} ({changes})".format(passed=passed, changes=", ".join(changes))
+
+
+def format_execution_time_delta(seconds: float, delta: Optional[float]) -> str:
+    # "1h 2m 3s (+4m 5s)", time only if it didn't change by a second
+    if delta is None or int(delta) == 0:
+        return format_execution_time(seconds)
+
+    return "{time} ({sign}{delta})".format(
+        time=format_execution_time(seconds),
+        sign="+" if delta > 0 else "-",
+        delta=format_execution_time(abs(delta)),
+    )
+
+
+def count_flaky_groups(scores: Optional[Dict[str, float]]) -> Optional[int]:
+    # groups of the machine with scores above FLAKY_THRESHOLD, None if there are no scores
+    if not scores:
+        return None
+
+    return sum(1 for score in scores.values() if score >= FLAKY_THRESHOLD)
+
+
+def build_results_row(
+    summary: MachineSummary, trend: Optional[Trend] = None, flaky_groups: Optional[int] = None
+) -> List[Cell]:
+    # changes since the previous build are shown next to the values
+    # (pass rate change next to the passed cases), flaky groups of the report need attention
+    if trend is None:
+        trend = Trend(0, 0, 0, 0, None, 0)
+
+    return [
+        Cell(registry.reports_titles[summary.report], url=summary.url),
+        Cell(format_delta(summary.executed, trend.executed)),
+        Cell(format_passed(summary.passed, trend.passed, trend.pass_rate)),
+        Cell(format_delta(summary.failed, trend.failed)),
+        Cell(format_delta(summary.error, trend.error)),
+        Cell(format_execution_time_delta(summary.execution_time, trend.execution_time)),
+        Cell(
+            str(flaky_groups) if flaky_groups is not None else "-",
+            alert=bool(flaky_groups),
+        ),
+    ]
+
+
+def build_server_part(machine_name: str) -> str:
+    return (
+        machine_name.replace("AMD Radeon ", "")
+        .replace("Android", "Windows 10 (64 bit)")
+        .replace("10(", "10 (")
+    )
+
+
+def build_results_title(job: Jobs, machine_name: str) -> str:
+    return "{report_name} Server part — {server_part}, Client part — {client_part}:".format(
+        report_name=registry.jobs_titles[job],
+        server_part=build_server_part(machine_name),
+        client_part=registry.client_parts[job],
+    )
+
+
+def build_results_charts(week: WeekSummaries, jobs: Iterable[Jobs]) -> Dict[Jobs, Chart]:
+    # cases of all reports of the job per machine, jobs without reports have no chart
+    charts = {}
+
+    for job in jobs:
+        machines = week.machines(job)
+        if not machines:
+            continue
+
+        series = {name: [] for name in CHART_SERIES}
+        for machine_name in machines:
+            indexes = week.indexes(job, machine_name)
+            for name, column in CHART_SERIES.items():
+                values = getattr(week, column)
+                series[name].append(sum(values[index] for index in indexes))
+
+        charts[job] = Chart(
+            title="{job}: {client_part}".format(
+                job=registry.jobs_names[job], client_part=registry.client_parts[job]
+            ),
+            categories=[build_server_part(machine_name) for machine_name in machines],
+            series=series,
+        )
+
+    return charts
+
+
+def build_results_tables(
+    week: WeekSummaries,
+    jobs: Iterable[Jobs],
+    newer_than: Optional[datetime] = None,
+    at: Optional[datetime] = None,
+) -> Iterator[ResultsTable]:
+    # reports are collected job by job into `week` summaries,
+    # tables of the job are yielded as soon as its reports are collected
+    for job in jobs:
+        with instrumentation.span("letter 1: collect reports", job=job.name):
+            collect_job_summaries(week, job, newer_than=newer_than, at=at)
+
+        # collected builds are ingested into the history
+        trends = get_summary_deltas(job)
+        # flakiness of the groups at each report's build: (report, build) -> machine -> group -> score
+        flakiness = {}
+        for summary in week.rows(job):
+            key = (summary.report, summary.build)
+            if key not in flakiness:
+                flakiness[key] = get_group_flakiness(job, summary.report, summary.build)
+
+        for machine_name in week.machines(job):
+            yield ResultsTable(
+                job=job,
+                machine=machine_name,
+                title=build_results_title(job, machine_name),
+                rows=[
+                    build_results_row(
+                        summary,
+                        trends.get((summary.report, summary.machine, summary.build)),
+                        count_flaky_groups(
+                            flakiness[(summary.report, summary.build)].get(summary.machine)
+                        ),
+                    )
+                    for summary in week.rows(job, machine_name)
+                ],
+            )
+
+
+def build_document(data, results: Optional[List[ResultsTable]] = None) -> WeeklyDocument:
+    # `data` - gen_report.ReportData, charts are built from its collected summaries
+    skipped_or_observed, skipped_or_observed_columns = None, None
+    skipped_or_observed_flakiness = None
+    if data.skipped_or_observed is not None:
+        skipped_or_observed, skipped_or_observed_flakiness = {}, {}
+        if SKIP_OBS_MACHINES == "columns":
+            skipped_or_observed_columns = {}
+
+        for job, matrix in data.skipped_or_observed.items():
+            if SKIP_OBS_MACHINES == "columns":
+                groups, skipped_or_observed_columns[job] = build_skipped_or_observed_columns(
+                    matrix, data.skipped_or_observed_deltas[job]
+                )
+                skipped_or_observed[job] = groups
+            else:
+                cases, deltas = merge_skipped_or_observed(
+                    matrix, data.skipped_or_observed_deltas[job], SKIP_OBS_MACHINES
+                )
+                groups = list(cases)
+                skipped_or_observed[job] = build_skipped_or_observed_groups(cases, deltas)
+
+            scores = merge_flakiness(
+                data.skipped_or_observed_flakiness[job], matrix.machines, SKIP_OBS_MACHINES
+            )
+            skipped_or_observed_flakiness[job] = [
+                format_flakiness(scores.get(group)) for group in groups
+            ]
+
+    return WeeklyDocument(
+        report_date=data.report_date,
+        period=build_period(data.report_date),
+        runs=build_runs(data.builds),
+        summary_tasks=data.summary,
+        planned_tasks=data.planned,
+        issues=build_issue_rows(data.issues) if data.issues is not None else None,
+        skipped_or_observed=skipped_or_observed,
+        results=results,
+        charts=build_results_charts(data.summaries, registry.letter_jobs)
+        if data.summaries is not None
+        else None,
+        skipped_or_observed_columns=skipped_or_observed_columns,
+        skipped_or_observed_flakiness=skipped_or_observed_flakiness,
+    )
@@ -0,0 +1,102 @@
+import os
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# where downloaded reports are decoded and reduced:
+# - inline: in the calling thread, reports are requested one by one
+# - thread: in the I/O threads which download the reports
+# - process: in the process pool, I/O threads only download the reports
+EXECUTORS = ["inline", "thread", "process"]
+
+REPORT_EXECUTOR = os.getenv("REPORT_EXECUTOR", "thread")
+PROCESS_WORKERS = os.cpu_count() or 1
+
+SUMMARY_FIELDS = ["total", "passed", "failed", "error", "skipped", "observed", "execution_time"]
+GROUP_FIELDS = ["passed", "failed", "error", "skipped", "observed"]
+
+_executor = REPORT_EXECUTOR
+_process_pool = None
+_lock = threading.Lock()
+
+
+def set_executor(executor: str):
+    global _executor
+
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTORS}")
+
+    _executor = executor
+
+
+def get_executor() -> str:
+    return _executor
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+
+    with _lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+
+    return _process_pool
+
+
+def shutdown():
+    global _process_pool
+
+    with _lock:
+        if _process_pool is not None:
+            _process_pool.shutdown()
+            _process_pool = None
+
+
+def reduce_report(json_report: dict) -> dict:
+    # keeps only the data used by the reports (in the same structure):
+    # machine summaries, results (GROUP_FIELDS) and reporting dates of groups,
+    # the latest reporting date of each machine is added as "reporting_date" (ISO format)
+    reduced = {}
+
+    for machine_name, machine_report in json_report.items():
+        results = {}
+        reporting_dates = []
+
+        for group_name, group in machine_report["results"].items():
+            group_summary = group[""]
+            reduced_summary = {field: group_summary[field] for field in GROUP_FIELDS}
+
+            machine_info = group_summary.get("machine_info")
+            if machine_info:
+                reporting_date = machine_info["reporting_date"]
+                reduced_summary["machine_info"] = {"reporting_date": reporting_date}
+                reporting_dates.append(
+                    datetime.strptime(reporting_date, "%m/%d/%Y %H:%M:%S")
+                )
+
+            results[group_name] = {"": reduced_summary}
+
+        reduced[machine_name] = {
+            "summary": {
+                field: machine_report["summary"][field] for field in SUMMARY_FIELDS
+            },
+            "results": results,
+            "reporting_date": max(reporting_dates).isoformat()
+            if reporting_dates
+            else None,
+        }
+
+    return reduced
+
+
+def decode_report(content: bytes) -> dict:
+    return reduce_report(json.loads(content))
+
+
+def parse_report(content: bytes) -> dict:
+    # decodes downloaded JSON report with the selected executor
+    if _executor == "process":
+        return _get_process_pool().submit(decode_report, content).result()
+
+    return decode_report(content)
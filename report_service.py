@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from common import Jobs
+import jenkins_export
+import registry
+import confluence_export
+import jira_export
+import gen_report
+import gen_emails
+import report_model
+import instrumentation
+
+SERVICE_HOST = os.getenv("REPORT_SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("REPORT_SERVICE_PORT", "8080"))
+SERVICE_OUTPUT_DIR = "./service_output/"
+
+# Jenkins is polled for new builds with this interval (seconds),
+# it's shorter than jenkins_export.LATEST_BUILD_TTL to keep latest build numbers always warm
+POLL_INTERVAL = 30
+# Jira issues and Confluence status page are refreshed with this interval (seconds)
+REFRESH_INTERVAL = 300
+
+DOCUMENTS = {
+    "/report.docx": (
+        "report.docx",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ),
+    "/letter1.html": ("Letter_1.html", "text/html; charset=ascii"),
+    "/letter2.html": ("Letter_2.html", "text/html; charset=ascii"),
+}
+
+
+class ReportService:
+    def __init__(self, output_dir: str = SERVICE_OUTPUT_DIR):
+        self.output_dir = os.path.abspath(output_dir)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.latest_builds = {}
+        self.last_poll = None
+        self.last_refresh = None
+
+        # data generation is increased on every change of the prefetched data,
+        # rendered documents are reused until the generation is changed
+        self.generation = 0
+        self.rendered = {}
+
+        # documents are rendered one at a time
+        self.render_lock = threading.Lock()
+        self.state_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def _data_changed(self):
+        with self.state_lock:
+            self.generation += 1
+
+    def poll_jenkins(self):
+        with instrumentation.span("service: poll jenkins"):
+            for job in Jobs:
+                build_number = jenkins_export.get_latest_build_number.cache_refresh(job)
+                if build_number is None:
+                    continue
+
+                if self.latest_builds.get(job) != build_number:
+                    print(f"New build of {jenkins_export.jobs_names[job]}: #{build_number}")
+                    self.latest_builds[job] = build_number
+                    self._data_changed()
+
+                self.prefetch_reports(job, build_number)
+
+        self.last_poll = datetime.now()
+
+    def prefetch_reports(self, job: Jobs, build_number: int):
+        # reports of the latest build appear while the build is running,
+        # so missing ones are requested again on every poll
+        for report in registry.jobs_reports[job]:
+            try:
+                if jenkins_export._fetch_report(job, build_number, report) is not None:
+                    continue
+
+                if jenkins_export._fetch_report.cache_refresh(job, build_number, report) is not None:
+                    self._data_changed()
+            except jenkins_export.ReportRequestError as e:
+                # failed requests aren't cached, the report is requested again by the next poll
+                print(f"WARNING: {e}")
+
+    def refresh_issues_and_tasks(self):
+        with instrumentation.span("service: refresh jira and confluence"):
+            previous_issues = jira_export.get_issues()
+            if jira_export.get_issues.cache_refresh() != previous_issues:
+                self._data_changed()
+
+            previous_status = confluence_export.get_project_status(datetime.today())
+            confluence_export._request_status_pages.cache_clear()
+            if confluence_export.get_project_status(datetime.today()) != previous_status:
+                self._data_changed()
+
+        self.last_refresh = time.monotonic()
+
+    def run_poller(self):
+        while not self.stopped.wait(POLL_INTERVAL):
+            try:
+                if time.monotonic() - self.last_refresh > REFRESH_INTERVAL:
+                    self.refresh_issues_and_tasks()
+
+                self.poll_jenkins()
+            except Exception as e:
+                print(f"ERROR: prefetch failed: {e}")
+            except SystemExit:
+                # exporters exit on invalid tokens (the error is printed by them), the poller
+                # keeps running and requests the data again by the next poll
+                print("ERROR: prefetch failed, it's repeated by the next poll")
+
+    def render(self, path: str) -> str:
+        file_name, _ = DOCUMENTS[path]
+        file_path = os.path.join(self.output_dir, file_name)
+
+        with self.render_lock:
+            with self.state_lock:
+                generation = self.generation
+
+            if self.rendered.get(path) == generation and os.path.exists(file_path):
+                instrumentation.record_cache("rendered documents", hit=True)
+                return file_path
+
+            instrumentation.record_cache("rendered documents", hit=False)
+
+            with instrumentation.span("service: render", path=path):
+                if path == "/report.docx":
+                    data = gen_report.collect_report_data(datetime.today())
+                    gen_report.render_report(report_model.build_document(data), file_path)
+                elif path == "/letter1.html":
+                    gen_emails.generate_first_letter(
+                        format=gen_emails.LetterFormat.HTML, output_dir=self.output_dir
+                    )
+                elif path == "/letter2.html":
+                    gen_emails.generate_second_letter(
+                        report_date=datetime.today(),
+                        format=gen_emails.LetterFormat.HTML,
+                        output_dir=self.output_dir,
+                    )
+
+            self.rendered[path] = generation
+
+        return file_path
+
+    def status(self) -> dict:
+        return {
+            "latest_builds": {
+                jenkins_export.jobs_names[job]: number
+                for job, number in self.latest_builds.items()
+            },
+            "last_poll": self.last_poll.isoformat() if self.last_poll else None,
+            "generation": self.generation,
+            "http": instrumentation.http_stats(),
+            "caches": instrumentation.cache_stats(),
+        }
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    service: ReportService = None
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+
+        if path == "/status":
+            self._send(
+                HTTPStatus.OK,
+                json.dumps(self.service.status(), indent=4, default=str).encode(),
+                "application/json",
+            )
+            return
+
+        if path not in DOCUMENTS:
+            self._send(HTTPStatus.NOT_FOUND, b"Not found", "text/plain")
+            return
+
+        try:
+            file_path = self.service.render(path)
+        except Exception as e:
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, str(e).encode(), "text/plain")
+            return
+
+        with open(file_path, "rb") as file:
+            self._send(HTTPStatus.OK, file.read(), DOCUMENTS[path][1])
+
+    def _send(self, status: HTTPStatus, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT):
+    gen_report.check_template()
+
+    service = ReportService()
+
+    print("Prefetching data...")
+    service.refresh_issues_and_tasks()
+    service.poll_jenkins()
+
+    poller = threading.Thread(target=service.run_poller, daemon=True)
+    poller.start()
+
+    RequestHandler.service = service
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+
+    print(f"Report service is listening on http://{host}:{port}/")
+    print("Documents: " + ", ".join(DOCUMENTS))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stopped.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve weekly report documents rendered from prefetched data"
+    )
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+
+    serve(args.host, args.port)
@@ -0,0 +1,298 @@
+import sys
+import urllib.parse
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from common import Jobs, Reports
+from jenkins_export import get_latest_report, get_report_link
+import instrumentation
+import registry
+
+# integer columns of the machine summary in JSON reports
+COUNTERS = ("total", "passed", "failed", "error", "skipped", "observed")
+
+
+class MachineSummary:
+    # results of one report on one machine
+
+    __slots__ = (
+        "machine",
+        "job",
+        "report",
+        "build",
+        "total",
+        "passed",
+        "failed",
+        "error",
+        "skipped",
+        "observed",
+        "execution_time",
+        "url",
+    )
+
+    def __init__(
+        self,
+        machine: str,
+        job: Jobs,
+        report: Reports,
+        build: int,
+        total: int,
+        passed: int,
+        failed: int,
+        error: int,
+        skipped: int,
+        observed: int,
+        execution_time: float,
+        url: str,
+    ):
+        self.machine = machine
+        self.job = job
+        self.report = report
+        self.build = build
+        self.total = total
+        self.passed = passed
+        self.failed = failed
+        self.error = error
+        self.skipped = skipped
+        self.observed = observed
+        self.execution_time = execution_time
+        self.url = url
+
+    @property
+    def executed(self) -> int:
+        return self.total - self.skipped - self.observed
+
+    def __repr__(self) -> str:
+        return "MachineSummary({})".format(
+            ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        )
+
+
+class WeekSummaries:
+    # machine summaries of all jobs and reports of the week stored by columns:
+    # counters are kept in typed arrays, machine names are interned and
+    # report links are stored once per report (machine anchor is added on access)
+
+    def __init__(self):
+        self.machine: List[str] = []
+        self.job = array("B")
+        self.report = array("B")
+        self.build = array("l")
+        for column in COUNTERS:
+            setattr(self, column, array("l"))
+        self.execution_time = array("d")
+
+        self._links: List[str] = []
+        self._link = array("H")
+
+    def __len__(self) -> int:
+        return len(self.machine)
+
+    def __iter__(self) -> Iterator[MachineSummary]:
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def add_report(
+        self,
+        job: Jobs,
+        report: Reports,
+        build_number: int,
+        json_report: dict,
+        report_url: str,
+    ):
+        # appends summaries of all machines of the JSON report
+        self._links.append(report_url)
+        link = len(self._links) - 1
+
+        for machine_name, machine_report in json_report.items():
+            summary = machine_report["summary"]
+
+            self.machine.append(sys.intern(machine_name))
+            self.job.append(job.value)
+            self.report.append(report.value)
+            self.build.append(build_number)
+            for column in COUNTERS:
+                getattr(self, column).append(int(summary[column]))
+            self.execution_time.append(float(summary["execution_time"]))
+            self._link.append(link)
+
+    def url(self, index: int) -> str:
+        return self._links[self._link[index]] + "#" + urllib.parse.quote(
+            self.machine[index]
+        )
+
+    def row(self, index: int) -> MachineSummary:
+        return MachineSummary(
+            machine=self.machine[index],
+            job=Jobs(self.job[index]),
+            report=Reports(self.report[index]),
+            build=self.build[index],
+            total=self.total[index],
+            passed=self.passed[index],
+            failed=self.failed[index],
+            error=self.error[index],
+            skipped=self.skipped[index],
+            observed=self.observed[index],
+            execution_time=self.execution_time[index],
+            url=self.url(index),
+        )
+
+    def indexes(
+        self, job: Optional[Jobs] = None, machine: Optional[str] = None
+    ) -> List[int]:
+        job_value = job.value if job is not None else None
+
+        return [
+            index
+            for index in range(len(self))
+            if (job_value is None or self.job[index] == job_value)
+            and (machine is None or self.machine[index] == machine)
+        ]
+
+    def rows(
+        self, job: Optional[Jobs] = None, machine: Optional[str] = None
+    ) -> List[MachineSummary]:
+        return [self.row(index) for index in self.indexes(job, machine)]
+
+    def machines(self, job: Optional[Jobs] = None) -> List[str]:
+        # machine names in order of appearance
+        return list(dict.fromkeys(self.machine[index] for index in self.indexes(job)))
+
+    def sum(self, column: str, job: Optional[Jobs] = None) -> float:
+        values = getattr(self, column)
+
+        if job is None:
+            return sum(values)
+
+        return sum(values[index] for index in self.indexes(job))
+
+    def sorted(self, column: str, reverse: bool = False) -> List[int]:
+        # row indexes ordered by the column values
+        values = getattr(self, column)
+
+        return sorted(range(len(self)), key=values.__getitem__, reverse=reverse)
+
+
+class GroupMatrix:
+    # skipped + observed cases of each group on each machine of the report:
+    # group x machine counts are stored row by row in one typed array
+
+    def __init__(
+        self,
+        groups: List[str],
+        machines: List[str],
+        counts: array,
+        orders: Optional[List[array]] = None,
+    ):
+        self.groups = groups
+        self.machines = machines
+        self.counts = counts
+        # group indexes of each machine in order of the machine's own records
+        # (groups are in the order they were first seen on any machine)
+        if orders is None:
+            orders = [array("l", range(len(groups))) for _ in machines]
+        self.orders = orders
+
+    @classmethod
+    def from_report(cls, json_report: dict) -> "GroupMatrix":
+        # one pass over all machines and groups collects (group, machine, cases) records,
+        # they are placed into the matrix at once
+        groups: Dict[str, int] = {}
+        group_indexes = array("l")
+        machine_indexes = array("l")
+        cases = array("l")
+
+        for machine_index, machine_report in enumerate(json_report.values()):
+            for group_name, group in machine_report["results"].items():
+                group_indexes.append(groups.setdefault(group_name, len(groups)))
+                machine_indexes.append(machine_index)
+                cases.append(group[""]["observed"] + group[""]["skipped"])
+
+        machines = [sys.intern(machine_name) for machine_name in json_report]
+        counts = array("l", [0]) * (len(groups) * len(machines))
+        orders = [array("l") for _ in machines]
+        for group_index, machine_index, value in zip(group_indexes, machine_indexes, cases):
+            counts[group_index * len(machines) + machine_index] = value
+            orders[machine_index].append(group_index)
+
+        return cls(list(groups), machines, counts, orders)
+
+    def row(self, group_index: int) -> array:
+        width = len(self.machines)
+
+        return self.counts[group_index * width : (group_index + 1) * width]
+
+    def column(self, machine: str) -> Dict[str, int]:
+        # groups with cases on the machine in the machine's own order
+        machine_index = self.machines.index(machine)
+        width = len(self.machines)
+
+        return {
+            self.groups[group_index]: self.counts[group_index * width + machine_index]
+            for group_index in self.orders[machine_index]
+            if self.counts[group_index * width + machine_index] > 0
+        }
+
+    def merge(self, mode: str) -> Dict[str, int]:
+        # groups with cases on any machine, cases of all machines are merged by "max" or "sum"
+        merge = max if mode == "max" else sum
+
+        merged = {
+            group: merge(self.row(group_index)) if self.machines else 0
+            for group_index, group in enumerate(self.groups)
+        }
+
+        return {group: cases for group, cases in merged.items() if cases > 0}
+
+    def previous(self, deltas: Dict[str, Dict[str, int]]) -> "GroupMatrix":
+        # matrix of the previous build from changes per machine (machine -> group -> delta),
+        # cells without a change or without the previous value are taken as they are
+        counts = array("l", self.counts)
+        width = len(self.machines)
+
+        for machine_index, machine in enumerate(self.machines):
+            machine_deltas = deltas.get(machine, {})
+            for group_index, group in enumerate(self.groups):
+                if group in machine_deltas:
+                    counts[group_index * width + machine_index] -= machine_deltas[group]
+
+        return GroupMatrix(self.groups, self.machines, counts, self.orders)
+
+
+def collect_job_summaries(
+    week: WeekSummaries,
+    job: Jobs,
+    newer_than: Optional[datetime] = None,
+    at: Optional[datetime] = None,
+):
+    # adds latest reports of the job to the week summaries
+    with instrumentation.span("collect summaries", job=job.name):
+        for report in registry.jobs_reports[job]:
+            latest_report = get_latest_report(job, report, newer_than=newer_than, at=at)
+
+            if latest_report is None:
+                continue
+
+            report_url = get_report_link(
+                job, latest_report["version"], report, json=False
+            )
+
+            week.add_report(
+                job, report, latest_report["version"], latest_report["report"], report_url
+            )
+
+
+def collect_group_matrix(
+    job: Jobs, report: Optional[Reports] = None, at: Optional[datetime] = None
+) -> GroupMatrix:
+    # skipped/observed cases of all machines in the job's latest (representative by default) report
+    if report is None:
+        report = registry.jobs_representative_reports[job]
+
+    latest_report = get_latest_report(job, report, at=at)
+
+    if latest_report is None:
+        return GroupMatrix([], [], array("l"))
+
+    return GroupMatrix.from_report(latest_report["report"])
@@ -0,0 +1,226 @@
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from lxml import etree
+
+import ids
+import instrumentation
+import word
+from common import TEMPLATE_PATH
+from report_cache import REPORT_CACHE_DIR, fingerprint, template_hash
+
+# Compiled template: edited parts, paths of the anchored elements and validation result.
+# It's built once per template content (hash of all template files), searched ids and
+# snapshot format and loaded from
+# ./.report_cache/ by the next runs, so the template isn't parsed to find the ids again.
+# In the lazy mode (default) only the body elements of document.xml containing the ids are
+# parsed by the runs, other body elements are written to the report as raw bytes.
+# TEMPLATE_PARSING=full parses the whole document.xml.
+
+DOCUMENT_PART = "word/document.xml"
+FOOTER_PART = "word/footer1.xml"
+RELS_PART = "word/_rels/document.xml.rels"
+CONTENT_TYPES_PART = "[Content_Types].xml"
+
+# ids of each edited part
+PART_IDS = {
+    DOCUMENT_PART: ids.IDS,
+    FOOTER_PART: [ids.REPORT_PERIOD_FIELD_ID],
+}
+
+# version of the snapshot format, it's changed with TemplateSnapshot fields or compilation
+SNAPSHOT_VERSION = 2
+
+TEMPLATE_PARSING_MODES = ["lazy", "full"]
+TEMPLATE_PARSING = os.getenv("TEMPLATE_PARSING", "lazy")
+if TEMPLATE_PARSING not in TEMPLATE_PARSING_MODES:
+    print(
+        "ERROR: unknown TEMPLATE_PARSING '{}', expected one of: {}".format(
+            TEMPLATE_PARSING, ", ".join(TEMPLATE_PARSING_MODES)
+        )
+    )
+    exit(-1)
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+@dataclass
+class TemplateSnapshot:
+    # snapshot key (see snapshot_hash)
+    hash: str
+    # XML of the edited parts: part name -> bytes
+    parts: Dict[str, bytes]
+    # positions of the anchored elements: part name -> {id: child indexes from the root}
+    anchors: Dict[str, Dict[str, List[int]]]
+    # ids which aren't found in the template
+    missing: List[str]
+    mode: str = "full"
+    # not parsed body elements of the lazy parts: part name -> raw bytes (see word.split_body)
+    raw_spans: Optional[Dict[str, List[bytes]]] = None
+
+    def parse(self, part: str) -> etree._ElementTree:
+        return etree.fromstring(self.parts[part]).getroottree()
+
+    def get_raw_spans(self, part: str) -> Optional[List[bytes]]:
+        # raw body elements which must be written with the parsed part
+        return (self.raw_spans or {}).get(part)
+
+    def find_anchors(self, tree: etree._ElementTree, part: str) -> Dict[str, etree.Element]:
+        # anchored elements of the parsed part, it must be called before the tree is changed
+        anchors = {}
+
+        for id, path in self.anchors[part].items():
+            element = tree.getroot()
+            for index in path:
+                element = element[index]
+            anchors[id] = element
+
+        return anchors
+
+    def body_regions(self, anchor_ids: List[str]) -> List[int]:
+        # indexes of the document body elements containing the anchors
+        return sorted(
+            {
+                self.anchors[DOCUMENT_PART][id][1]
+                for id in anchor_ids
+                if id in self.anchors[DOCUMENT_PART]
+            }
+        )
+
+
+def snapshot_hash(template_path: str = TEMPLATE_PATH) -> str:
+    # anchors depend on the ids of the registry as well as on the template files
+    return fingerprint(
+        {
+            "template": template_hash(template_path),
+            "ids": PART_IDS,
+            "version": SNAPSHOT_VERSION,
+        }
+    )
+
+
+def _element_path(element: etree.Element) -> List[int]:
+    path = []
+
+    parent = element.getparent()
+    while parent is not None:
+        path.append(parent.index(element))
+        element, parent = parent, parent.getparent()
+
+    return list(reversed(path))
+
+
+def compile_template(
+    template_path: str = TEMPLATE_PATH, mode: str = TEMPLATE_PARSING
+) -> TemplateSnapshot:
+    parts = {}
+    anchors = {}
+    missing = []
+    raw_spans = {}
+
+    for part in [DOCUMENT_PART, FOOTER_PART, RELS_PART, CONTENT_TYPES_PART]:
+        with open(os.path.join(template_path, part), "rb") as file:
+            parts[part] = file.read()
+
+    if mode == "lazy":
+        # body elements without ids are cut out of the document (it must be in UTF-8
+        # to write raw bytes back as they are), the found anchors are the same
+        declaration = parts[DOCUMENT_PART][:100].lower()
+        if b"encoding=" not in declaration or b'encoding="utf-8"' in declaration:
+            split = word.split_body(parts[DOCUMENT_PART], set(PART_IDS[DOCUMENT_PART]))
+            if split is not None:
+                parts[DOCUMENT_PART], raw_spans[DOCUMENT_PART] = split
+
+    for part, part_ids in PART_IDS.items():
+        root = etree.fromstring(parts[part])
+        # the first element with the id is the anchor (as in word.find_by_id)
+        elements = {}
+        for element in root.iter():
+            if element.get("id"):
+                elements.setdefault(element.get("id"), element)
+
+        anchors[part] = {}
+        for id in part_ids:
+            if id in elements:
+                anchors[part][id] = _element_path(elements[id])
+            else:
+                missing.append(id)
+
+    return TemplateSnapshot(
+        hash=snapshot_hash(template_path),
+        parts=parts,
+        anchors=anchors,
+        missing=missing,
+        mode=mode,
+        raw_spans=raw_spans,
+    )
+
+
+def _snapshot_path(hash: str, mode: str = TEMPLATE_PARSING) -> str:
+    return os.path.join(REPORT_CACHE_DIR, f"template_{hash}_{mode}.pickle")
+
+
+def load_snapshot(template_path: str = TEMPLATE_PATH) -> TemplateSnapshot:
+    # snapshot of the current template, compiled again if the template or the ids were changed
+    global _snapshot
+
+    hash = snapshot_hash(template_path)
+
+    with _lock:
+        if _snapshot is not None and _snapshot.hash == hash and _snapshot.mode == TEMPLATE_PARSING:
+            instrumentation.record_cache("template snapshot", hit=True)
+            return _snapshot
+
+        snapshot = _load(hash)
+        instrumentation.record_cache("template snapshot", hit=snapshot is not None)
+
+        if snapshot is None:
+            with instrumentation.span("compile template"):
+                snapshot = compile_template(template_path)
+            _save(snapshot)
+
+        _snapshot = snapshot
+
+    return snapshot
+
+
+def _load(hash: str) -> Optional[TemplateSnapshot]:
+    snapshot_path = _snapshot_path(hash)
+    if not os.path.exists(snapshot_path):
+        return None
+
+    with open(snapshot_path, "rb") as file:
+        return pickle.load(file)
+
+
+def _save(snapshot: TemplateSnapshot):
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+
+    # snapshots of the previous templates aren't needed anymore
+    for file_name in os.listdir(REPORT_CACHE_DIR):
+        if file_name.startswith("template_") and file_name.endswith(".pickle"):
+            os.remove(os.path.join(REPORT_CACHE_DIR, file_name))
+
+    tmp_path = f"{_snapshot_path(snapshot.hash, snapshot.mode)}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(snapshot, file)
+    os.replace(tmp_path, _snapshot_path(snapshot.hash, snapshot.mode))
+
+
+if __name__ == "__main__":
+    snapshot = load_snapshot()
+
+    print(f"Template snapshot '{_snapshot_path(snapshot.hash)}':")
+    for part, part_anchors in snapshot.anchors.items():
+        print(f"  {part}: {len(part_anchors)} anchors")
+    for part, spans in (snapshot.raw_spans or {}).items():
+        print(
+            "  {part}: {count} body elements ({size} bytes) aren't parsed".format(
+                part=part, count=len(spans), size=sum(len(span) for span in spans)
+            )
+        )
+    if snapshot.missing:
+        print("  missing ids: " + ", ".join(snapshot.missing))
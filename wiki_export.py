@@ -0,0 +1,193 @@
+from typing import List, Optional
+
+import lxml.html as lh
+from lxml.html import builder as E
+
+from report_model import Cell, MachineColumns, WeeklyDocument, ISSUES_COLUMNS, RESULTS_COLUMNS
+import registry
+
+# lightweight pages of the weekly report for the wiki
+WIKI_MARKDOWN_PATH = "./report.md"
+WIKI_HTML_PATH = "./report.html"
+
+ALERT_STYLE = "color:#C00000"
+
+
+def get_title(document: WeeklyDocument) -> str:
+    return "Streaming SDK weekly report ({period})".format(period=document.period)
+
+
+def get_skipped_or_observed_title(job) -> str:
+    return "Skipped or observed cases: {name}".format(name=registry.jobs_names[job])
+
+
+def get_skipped_or_observed_table(
+    groups: List[str],
+    columns: Optional[MachineColumns] = None,
+    flakiness: Optional[List[str]] = None,
+):
+    # columns and rows of the groups with cases per machine and flakiness of the groups
+    header = ["Test group"]
+    rows = [[Cell(group)] for group in groups]
+
+    if columns is not None:
+        header += columns.machines
+        for row, cases in zip(rows, columns.rows):
+            row += [Cell(text) for text in cases]
+
+    if flakiness is not None:
+        header.append("Flakiness")
+        for row, score in zip(rows, flakiness):
+            row.append(Cell(score))
+
+    return header, rows
+
+
+##################################################################
+# Markdown
+
+
+def markdown_text(text: str) -> str:
+    # text can't break the table or the link
+    return text.replace("|", "\\|").replace("[", "\\[").replace("]", "\\]")
+
+
+def markdown_cell(cell: Cell) -> str:
+    text = markdown_text(cell.text)
+
+    if cell.url:
+        text = "[{text}]({url})".format(text=text, url=cell.url)
+    if cell.alert:
+        text = "**{text}**".format(text=text)
+
+    return text
+
+
+def markdown_table(columns: List[str], rows: List[List[Cell]]) -> List[str]:
+    lines = [
+        "| " + " | ".join(columns) + " |",
+        "|" + "---|" * len(columns),
+    ]
+    for row in rows:
+        lines.append("| " + " | ".join(markdown_cell(cell) for cell in row) + " |")
+
+    return lines
+
+
+def render_markdown(document: WeeklyDocument) -> str:
+    lines = ["# " + get_title(document), ""]
+
+    lines += ["## Latest builds", ""]
+    lines += ["- " + markdown_cell(run) for run in document.runs.values() if run]
+
+    for title, tasks in [
+        ("Summary", document.summary_tasks),
+        ("Planned activities", document.planned_tasks),
+    ]:
+        lines += ["", "## " + title, ""]
+        lines += ["- " + markdown_text(task) for task in tasks]
+
+    lines += ["", "## Issues backlog", ""]
+    lines += markdown_table(ISSUES_COLUMNS, document.issues)
+
+    columns = document.skipped_or_observed_columns or {}
+    flakiness = document.skipped_or_observed_flakiness or {}
+    for job, groups in (document.skipped_or_observed or {}).items():
+        lines += ["", "## " + get_skipped_or_observed_title(job), ""]
+        if job in columns or job in flakiness:
+            lines += markdown_table(
+                *get_skipped_or_observed_table(groups, columns.get(job), flakiness.get(job))
+            )
+        else:
+            lines += ["- " + markdown_text(group) for group in groups]
+
+    if document.results:
+        lines += ["", "## Results"]
+        for table in document.results:
+            lines += ["", "### " + markdown_text(table.title), ""]
+            lines += markdown_table(RESULTS_COLUMNS, table.rows)
+
+    return "\n".join(lines) + "\n"
+
+
+##################################################################
+# plain HTML
+
+
+def html_cell(cell: Cell):
+    content = E.A(cell.text, href=cell.url) if cell.url else cell.text
+
+    if cell.alert:
+        return E.TD(content, style=ALERT_STYLE)
+
+    return E.TD(content)
+
+
+def html_table(columns: List[str], rows: List[List[Cell]]):
+    return E.TABLE(
+        E.THEAD(E.TR(*[E.TH(column) for column in columns])),
+        E.TBODY(*[E.TR(*[html_cell(cell) for cell in row]) for row in rows]),
+        border="1",
+    )
+
+
+def html_list(items: List) -> lh.HtmlElement:
+    return E.UL(*[E.LI(item) for item in items])
+
+
+def render_html(document: WeeklyDocument) -> str:
+    body = E.BODY(E.H1(get_title(document)))
+
+    body.append(E.H2("Latest builds"))
+    body.append(
+        html_list([E.A(run.text, href=run.url) for run in document.runs.values() if run])
+    )
+
+    for title, tasks in [
+        ("Summary", document.summary_tasks),
+        ("Planned activities", document.planned_tasks),
+    ]:
+        body.append(E.H2(title))
+        body.append(html_list(tasks))
+
+    body.append(E.H2("Issues backlog"))
+    body.append(html_table(ISSUES_COLUMNS, document.issues))
+
+    columns = document.skipped_or_observed_columns or {}
+    flakiness = document.skipped_or_observed_flakiness or {}
+    for job, groups in (document.skipped_or_observed or {}).items():
+        body.append(E.H2(get_skipped_or_observed_title(job)))
+        if job in columns or job in flakiness:
+            body.append(
+                html_table(
+                    *get_skipped_or_observed_table(groups, columns.get(job), flakiness.get(job))
+                )
+            )
+        else:
+            body.append(html_list(groups))
+
+    if document.results:
+        body.append(E.H2("Results"))
+        for table in document.results:
+            body.append(E.H3(table.title))
+            body.append(html_table(RESULTS_COLUMNS, table.rows))
+
+    html = E.HTML(E.HEAD(E.META(charset="utf-8"), E.TITLE(get_title(document))), body)
+
+    return lh.tostring(
+        html, doctype="<!DOCTYPE html>", encoding="unicode", pretty_print=True
+    )
+
+
+def write_markdown(document: WeeklyDocument, file_path: str = WIKI_MARKDOWN_PATH):
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(render_markdown(document))
+
+    print(f"Wiki page '{file_path}' generated!")
+
+
+def write_html(document: WeeklyDocument, file_path: str = WIKI_HTML_PATH):
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(render_html(document))
+
+    print(f"Wiki page '{file_path}' generated!")
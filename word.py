@@ -1,7 +1,11 @@
 import os
+import re
+import zipfile
+import threading
+import xml.parsers.expat
 from lxml import etree
 from hashlib import sha1
-from typing import Any
+from typing import Any, Collection, Iterable, List, Optional, Sequence, Tuple
 from copy import deepcopy
 from dataclasses import dataclass
 
@@ -10,12 +14,32 @@ from common import WORKING_DIR_PATH
 W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
 R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
 XML_NS = "http://www.w3.org/XML/1998/namespace"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+C_NS = "http://schemas.openxmlformats.org/drawingml/2006/chart"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
 etree.register_namespace("w", W_NS)
 etree.register_namespace("r", R_NS)
 etree.register_namespace("xml", XML_NS)
 
 R_EMBED = etree.QName(R_NS, "embed")
 
+CHART_RELATIONSHIP = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/chart"
+# size of the inline chart in EMU (6 x 3.5 inches)
+CHART_WIDTH = 5486400
+CHART_HEIGHT = 3200400
+
+# bullets without content: (list id, level) -> paragraph
+_bullet_prototypes = {}
+
+# not parsed body elements are replaced with this processing instruction (with the span number)
+RAW_SPAN_TARGET = "report-raw-span"
+RAW_SPAN_PATTERN = re.compile(rb"<\?report-raw-span (\d+)\?>")
+
+# relationships of the rendered document are edited in memory and written with the other parts,
+# each thread renders own document
+_state = threading.local()
+
 
 DOCX_CONTENT_PATH = os.path.join(WORKING_DIR_PATH, "word/")
 DOCUMENT_PATH = os.path.join(DOCX_CONTENT_PATH, "document.xml")
@@ -71,11 +95,137 @@ def write_xml(tree, file_path: str):
     tree.write(file_path, xml_declaration=True, encoding="ascii")
 
 
-def create_relationship(url: str):
-    # load rels file
-    tree = load_xml(RELS_PATH)
+class _RawSpanWriter:
+    # file-like target of the tree serialization which replaces placeholders of the
+    # not parsed elements with their raw spans chunk by chunk
+
+    def __init__(self, stream, raw_spans: List[bytes]):
+        self.stream = stream
+        self.raw_spans = raw_spans
+        # unfinished tag at the end of the previous chunk (it can be a placeholder)
+        self.pending = b""
+
+    def write(self, data: bytes):
+        data = self.pending + data
+
+        position = 0
+        for match in RAW_SPAN_PATTERN.finditer(data):
+            self.stream.write(data[position : match.start()])
+            self.stream.write(self.raw_spans[int(match.group(1))])
+            position = match.end()
+
+        # "<" is always escaped in the text, so "<" without ">" after it starts a split tag
+        tag_start = data.rfind(b"<", position)
+        if tag_start != -1 and data.find(b">", tag_start) == -1:
+            self.stream.write(data[position:tag_start])
+            self.pending = data[tag_start:]
+        else:
+            self.stream.write(data[position:])
+            self.pending = b""
+
+    def flush(self):
+        self.stream.write(self.pending)
+        self.pending = b""
+
+
+def write_part(
+    archive: zipfile.ZipFile, name: str, tree, raw_spans: Optional[List[bytes]] = None
+):
+    # serializes the tree as UTF-8 straight into the compressed zip entry,
+    # placeholders of the not parsed elements are replaced with their `raw_spans`
+    with archive.open(name, "w") as stream:
+        target = stream if raw_spans is None else _RawSpanWriter(stream, raw_spans)
+
+        tree.write(
+            target,
+            xml_declaration=True,
+            encoding="UTF-8",
+            standalone=tree.docinfo.standalone,
+        )
+
+        if raw_spans is not None:
+            target.flush()
+
+
+def split_body(content: bytes, ids: Collection[str]) -> Optional[Tuple[bytes, List[bytes]]]:
+    # Scans UTF-8 document part without building the tree and keeps only the body elements
+    # containing any of `ids`. Other body elements (with the whitespace after them) are cut out
+    # as raw byte spans and replaced with numbered processing instructions, so the remaining
+    # document has the same body children and can be written back with `write_part`.
+    # Returns None if the part can't be split (it's parsed as a whole then).
+    parser = xml.parsers.expat.ParserCreate(namespace_separator=" ")
+    body_tag = W_NS + " body"
+
+    starts = []
+    anchored = set()
+    body_depth = None
+    body_end = None
+    depth = 0
+
+    def start_child():
+        if body_depth is not None and depth == body_depth and body_end is None:
+            starts.append(parser.CurrentByteIndex)
+
+    def start_element(name, attributes):
+        nonlocal depth, body_depth
+
+        start_child()
+        depth += 1
+
+        if name == body_tag and body_depth is None:
+            body_depth = depth
+        elif body_depth is not None and body_end is None and attributes.get("id") in ids:
+            anchored.add(len(starts) - 1)
+
+    def end_element(name):
+        nonlocal depth, body_end
+
+        if depth == body_depth and body_end is None:
+            body_end = parser.CurrentByteIndex
+        depth -= 1
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    # comments and processing instructions are body children too
+    parser.CommentHandler = lambda data: start_child()
+    parser.ProcessingInstructionHandler = lambda target, data: start_child()
+
+    parser.Parse(content, True)
+
+    if body_end is None or not starts:
+        return None
+
+    bounds = starts + [body_end]
+    sparse = [content[: starts[0]]]
+    raw_spans = []
 
-    rels = tree.getroot()
+    for index in range(len(starts)):
+        span = content[bounds[index] : bounds[index + 1]]
+        if index in anchored:
+            sparse.append(span)
+        else:
+            sparse.append(b"<?%s %d?>" % (RAW_SPAN_TARGET.encode("ascii"), len(raw_spans)))
+            raw_spans.append(span)
+
+    sparse.append(content[body_end:])
+
+    return b"".join(sparse), raw_spans
+
+
+def open_relationships(tree=None):
+    # starts editing relationships of the document (rels file of the working directory by default)
+    _state.relationships = tree if tree is not None else load_xml(RELS_PATH)
+
+
+def get_relationships():
+    if getattr(_state, "relationships", None) is None:
+        open_relationships()
+
+    return _state.relationships
+
+
+def create_relationship(url: str):
+    rels = get_relationships().getroot()
 
     # generate uniq id for relationship
     rel_id = "rId" + sha1(bytearray(map(ord, url))).digest().hex()
@@ -93,33 +243,100 @@ def create_relationship(url: str):
         },
     )
 
-    # save resulting xml
-    write_xml(tree, RELS_PATH)
+    return rel_id
+
+
+def create_chart_relationship(target: str):
+    # relationship with the chart part (`target` relative to word/), id is derived from the target
+    rel_id = "rId" + sha1(target.encode("utf-8")).digest().hex()
+
+    if find_relationship(rel_id) is None:
+        etree.SubElement(
+            get_relationships().getroot(),
+            "Relationship",
+            {"Id": rel_id, "Type": CHART_RELATIONSHIP, "Target": target},
+        )
 
     return rel_id
 
 
+def get_chart_targets() -> List[str]:
+    # chart parts of the document
+    return [
+        rel.get("Target")
+        for rel in get_relationships().getroot()
+        if rel.get("Type") == CHART_RELATIONSHIP
+    ]
+
+
+def create_chart(rel_id: str, drawing_id: int, name: str) -> etree.Element:
+    # <w:p><w:r><w:drawing>
+    #   <wp:inline>
+    #     <wp:extent cx="..." cy="..."/>
+    #     <wp:docPr id="..." name="..."/>
+    #     <a:graphic><a:graphicData uri=".../chart"><c:chart r:id="rId..."/></a:graphicData></a:graphic>
+    #   </wp:inline>
+    # </w:drawing></w:r></w:p>
+    paragraph = etree.Element(etree.QName(W_NS, "p"))
+    record = etree.SubElement(paragraph, etree.QName(W_NS, "r"))
+    drawing = etree.SubElement(record, etree.QName(W_NS, "drawing"))
+
+    inline = etree.SubElement(
+        drawing,
+        etree.QName(WP_NS, "inline"),
+        {"distT": "0", "distB": "0", "distL": "0", "distR": "0"},
+        nsmap={"wp": WP_NS},
+    )
+    etree.SubElement(
+        inline,
+        etree.QName(WP_NS, "extent"),
+        {"cx": str(CHART_WIDTH), "cy": str(CHART_HEIGHT)},
+    )
+    etree.SubElement(
+        inline, etree.QName(WP_NS, "effectExtent"), {"l": "0", "t": "0", "r": "0", "b": "0"}
+    )
+    etree.SubElement(
+        inline, etree.QName(WP_NS, "docPr"), {"id": str(drawing_id), "name": name}
+    )
+    etree.SubElement(inline, etree.QName(WP_NS, "cNvGraphicFramePr"))
+
+    graphic = etree.SubElement(inline, etree.QName(A_NS, "graphic"), nsmap={"a": A_NS})
+    graphic_data = etree.SubElement(
+        graphic, etree.QName(A_NS, "graphicData"), {"uri": C_NS}
+    )
+    etree.SubElement(
+        graphic_data,
+        etree.QName(C_NS, "chart"),
+        {etree.QName(R_NS, "id"): rel_id},
+        nsmap={"c": C_NS},
+    )
+
+    return paragraph
+
+
+def add_content_type(content_types, part_name: str, content_type: str):
+    # registers the new part in [Content_Types].xml
+    types = content_types.getroot()
+    if types.find("./{*}Override[@PartName='%s']" % part_name) is None:
+        etree.SubElement(
+            types,
+            etree.QName(CT_NS, "Override"),
+            {"PartName": part_name, "ContentType": content_type},
+        )
+
+
 def remove_element(el: etree.Element):
     el.getparent().remove(el)
 
 
 def update_relationship_target(rel_id: str, url: str):
-    # load rels file
-    tree = load_xml(RELS_PATH)
-
-    rel = tree.find("//*[@Id='{id}']".format(id=rel_id))
+    rel = find_relationship(rel_id)
 
     rel.attrib["Target"] = url
 
-    # save resulting xml
-    write_xml(tree, RELS_PATH)
-
 
 def find_relationship(rel_id):
-    # load rels file
-    tree = load_xml(RELS_PATH)
-
-    return tree.find("//*[@Id='{id}']".format(id=rel_id))
+    return get_relationships().getroot().find("./*[@Id='{id}']".format(id=rel_id))
 
 
 def get_image_file_location(image: etree.Element):
@@ -273,6 +490,29 @@ def create_bullet(list_id: int, lvl: int, content: Any):
     return paragraph
 
 
+def create_bullets(list_id: int, lvl: int, contents: Iterable[Any]) -> List[etree.Element]:
+    # bullets are copied from the bullet without content, which is created once per list and level
+    prototype = _bullet_prototypes.get((list_id, lvl))
+    if prototype is None:
+        prototype = create_bullet(list_id=list_id, lvl=lvl, content=[])
+        _bullet_prototypes[(list_id, lvl)] = prototype
+
+    bullets = []
+    for content in contents:
+        bullet = deepcopy(prototype)
+        append_content(bullet, content)
+        bullets.append(bullet)
+
+    return bullets
+
+
+def append_elements_after(new_elements: Sequence[etree.Element], after: etree.Element):
+    # inserts all elements after the specified one at once (its position is looked up once)
+    parent = after.getparent()
+    position = parent.index(after) + 1
+    parent[position:position] = new_elements
+
+
 def append_element_after(new_el: etree.Element, after: etree.Element):
     parent = after.getparent()
     parent.insert(parent.index(after) + 1, new_el)
@@ -284,8 +524,10 @@ def append_element_before(new_el: etree.Element, before: etree.Element):
 
 
 def update_link(tree: etree.Element, link_id: str, url: str, text: str):
-    link = find_by_id(tree, link_id)
+    update_link_element(find_by_id(tree, link_id), url=url, text=text)
+
 
+def update_link_element(link: etree.Element, url: str, text: str):
     # update link text
     bugs_desc = link.find(".//{*}t")
     bugs_desc.text = text
@@ -321,6 +563,36 @@ def clear_table_cell(cell: etree.Element):
             remove_element(element)
 
 
+def table_insert_columns(table: etree.Element, index: int, count: int, share: float):
+    # inserts `count` copies of the column `index` after it (with their content),
+    # new columns take `share` of the last column width equally
+    if count <= 0:
+        return
+
+    def resize(element: etree.Element, last: etree.Element):
+        if element is None or last is None:
+            return
+
+        width = int(last.get(etree.QName(W_NS, "w")))
+        column_width = int(width * share / count)
+
+        last.set(etree.QName(W_NS, "w"), str(width - column_width * count))
+        element.set(etree.QName(W_NS, "w"), str(column_width))
+
+    grid_columns = table.findall("./{*}tblGrid/{*}gridCol")
+    grid_column = deepcopy(grid_columns[index])
+    resize(grid_column, grid_columns[-1])
+    for _ in range(count):
+        grid_columns[index].addnext(deepcopy(grid_column))
+
+    for row in table.findall("./{*}tr"):
+        cells = row.findall("./{*}tc")
+        cell = deepcopy(cells[index])
+        resize(cell.find("./{*}tcPr/{*}tcW"), cells[-1].find("./{*}tcPr/{*}tcW"))
+        for _ in range(count):
+            cells[index].addnext(deepcopy(cell))
+
+
 def table_add_rows(table: etree.Element, count: int):
     # find last row in the table
     last_row = table.find("./{*}tr[last()]")